@@ -14,6 +14,9 @@ const userDeviceSchema = new mongoose.Schema({
         type: String,  // 改为String类型以存储MAC地址
         required: true
     },
+    localToken: {
+        type: String  // 绑定时生成，App在局域网内直连设备时使用
+    },
     createdAt: {
         type: Date,
         default: Date.now
@@ -40,6 +43,7 @@ userDeviceSchema.set('toJSON', { virtuals: true });
  * @typedef {Object} UserDevice
  * @property {mongoose.Types.ObjectId} userId - 用户ID
  * @property {string} deviceId - 设备ID(MAC地址)
+ * @property {string} localToken - 局域网直连控制的共享密钥
  * @property {Date} createdAt - 关联创建时间
  * @property {Device} device - 关联的设备信息（虚拟字段）
  */
@@ -90,7 +90,8 @@ router.post('/bind', asyncHandler(async (req, res) => {
         code: 200,
         data: {  // 确保data是对象
             isBound: true,
-            isNew: result.isNew
+            isNew: result.isNew,
+            localToken: result.localToken  // 局域网直连控制使用
         },
         message: result.isNew ? '绑定成功' : '设备已绑定'
     });
@@ -121,7 +122,8 @@ router.get('/list', asyncHandler(async (req, res) => {
     // 构造响应数据
     const responseData = devices.map(d => ({
         ...d.device.toObject(),
-        isOnline: d.device.status === 'online'
+        isOnline: d.device.status === 'online',
+        localToken: d.localToken
     }));
 
     // 打印最终返回结构
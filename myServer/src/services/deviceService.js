@@ -1,3 +1,4 @@
+const crypto = require('crypto');
 const Device = require('../models/Device');
 const UserDevice = require('../models/UserDevice');
 //const WsService = require('./wsService');
@@ -18,6 +19,7 @@ class DeviceService {
      * @returns {boolean} return.isNew - 是否为新绑定
      * @returns {string} return.deviceId - 设备ID
      * @returns {mongoose.Types.ObjectId} return.userId - 用户ID
+     * @returns {string} return.localToken - 局域网直连控制的共享密钥
      * @throws {Error} 设备未注册或已被其他用户绑定时抛出异常
      */
     static async checkAndBindDevice(userId, deviceId) {
@@ -35,41 +37,63 @@ class DeviceService {
             { isBound: true }
         );
 
+        // 局域网直连的共享密钥，重复绑定时沿用原来的
+        const localToken = existingBinding?.localToken || crypto.randomBytes(16).toString('hex');
         const result = await UserDevice.findOneAndUpdate(
             { deviceId },
-            { userId },
+            { userId, localToken },
             { upsert: true, new: true }
         );
 
+        // 设备在等待绑定时已连上WebSocket，直接推送绑定完成，不必等它轮询
+        const WsService = require('./wsService');
+        WsService.notify(deviceId, {
+            type: 'BIND_STATUS',
+            data: { isBound: true, localToken }
+        });
+
         return {
             isNew: !existingBinding,
             deviceId,
-            userId
+            userId,
+            localToken
         };
     }
 
+    /**
+     * 获取设备局域网直连控制的共享密钥
+     * @static
+     * @async
+     * @param {string} deviceId - 设备ID(MAC地址)
+     * @returns {Promise<string|undefined>} 未绑定时返回undefined
+     */
+    static async getLocalToken(deviceId) {
+        const binding = await UserDevice.findOne({ deviceId });
+        return binding?.localToken;
+    }
+
     /**
      * 树莓派设备注册
      * @static
      * @async
      * @param {string} mac - 设备MAC地址
      * @param {string} ip - 设备IP地址
+     * @param {string} [mode] - 设备当前运行的模式（设备重启后会恢复上次的模式）；
+     *   设备熄灯或没有运行的模式时为空，此时保留已记录的模式，新设备记为 'solid'
+     * @param {Object} [modeParams] - 当前模式参数
      * @returns {Promise<mongoose.Document>} 设备文档
      * @throws {Error} MAC地址格式无效时抛出异常
      */
-    static async registerPiDevice(mac, ip) {
+    static async registerPiDevice(mac, ip, mode, modeParams) {
         if (!this._validateMac(mac)) throw new Error('无效的MAC地址格式');
 
+        const reported = mode ? { mode, modeParams: modeParams || {} } : {};
         let device = await Device.findOne({ deviceId: mac });
         if (device) {
             return this._updateDevice(device, {
                 ip:ip,
                 status: 'online',
-                mode: 'solid',
-                modeParams: {
-                    color: '#FFFFFF',
-                    brightness: 1.0
-                }
+                ...reported
             });
         } else {
             return Device.create({
@@ -77,10 +101,8 @@ class DeviceService {
                 ip:ip,
                 status: 'online',
                 mode: 'solid',
-                modeParams: {
-                    color: '#FFFFFF',
-                    brightness: 1.0
-                }
+                modeParams: { color: '#FFFFFF', brightness: 1.0 },
+                ...reported
             });
         }
     }
@@ -45,11 +45,21 @@ class WsService {
                 }
 
                 if (msg.type === 'INITIAL_STATUS') {
-                    await DeviceService.registerPiDevice(
+                    const device = await DeviceService.registerPiDevice(
                         deviceId,
                         msg.data.ip,
-                        msg.data.mode
+                        msg.data.mode,
+                        msg.data.params
                     );
+                    // 连接建立时告知当前绑定状态，未绑定的设备据此等待绑定推送
+                    const isBound = !!device?.isBound;
+                    this.notify(deviceId, {
+                        type: 'BIND_STATUS',
+                        data: {
+                            isBound,
+                            localToken: isBound ? await DeviceService.getLocalToken(deviceId) : undefined
+                        }
+                    });
                 } else if (msg.type === 'HEARTBEAT') {
                     //console.log(`接收到树莓派 ${deviceId} 的心跳请求`);
                     console.log(`[HEARTBEAT] 处理心跳`, msg.data);
@@ -105,6 +115,19 @@ class WsService {
         }, interval);
     }
 
+    /**
+     * 向设备推送一条不需要确认的消息
+     * @param {string} deviceId - 设备ID
+     * @param {Object} message - 消息对象
+     * @returns {boolean} 设备在线并已发送时返回true
+     */
+    notify(deviceId, message) {
+        const ws = this.clients.get(deviceId);
+        if (!ws) return false;
+        ws.send(JSON.stringify(message));
+        return true;
+    }
+
     /**
      * 发送命令并等待确认
      * @async
@@ -1,59 +1,80 @@
-import sys
-import os
-import board
-import neopixel
 import time
 import math
 import threading
+import numpy as np
+from colors import hex_to_rgb
+from strip import get_strip
+from effect import Effect, run_effect
+from frame_cache import get_frame_cache, period_frames
+from device_log import get_logger
 
-# --- 自动申请sudo权限 ---
-if os.geteuid() != 0:
-    print("正在自动请求sudo权限...")
-    os.execvp("sudo", ["sudo", sys.executable] + sys.argv)
+log = get_logger('MODE')
 
-NUM_PIXELS = 60
-pixels = neopixel.NeoPixel(board.D18, NUM_PIXELS, brightness=1.0, auto_write=False)
+FRAME_TIME = 0.03  # 原始每帧步进对应的时长，用于把步进换算为每秒速率
 
 # 定义颜色
 # color = (0, 255, 0)  # 绿色的RGB值
 
-def hex_to_rgb(hex_color, brightness=1.0):
-    """将 #FFFFFF 转为 (r,g,b) 元组并应用亮度"""
-    hex_color = hex_color.lstrip('#')
-    r = int(hex_color[0:2], 16) * brightness
-    g = int(hex_color[2:4], 16) * brightness
-    b = int(hex_color[4:6], 16) * brightness
-    return (int(r), int(g), int(b))
+def wave_frame(rgb_color, phase, density_factor, num_pixels):
+    """向量化计算一帧波动效果，返回 (num_pixels, 3) 的 uint8 数组"""
+    wave = (np.sin(np.arange(num_pixels) / density_factor + phase) + 1) / 2
+    return (wave[:, None] * np.asarray(rgb_color, dtype=np.float64)).astype(np.uint8)
 
-# 炫酷绿色波动效果
-def WaveLight(stop_event, color='#FFFFFF', wave_speed=0.5, wave_density=3, brightness=1.0):
+def wave_frame_reference(rgb_color, phase, density_factor, num_pixels):
+    """逐像素计算的参考实现，用于核对 wave_frame 的输出"""
+    frame = []
+    for i in range(num_pixels):
+        # 使用正弦波创建波动效果
+        wave = (math.sin((i/density_factor) + phase) + 1) / 2
+        frame.append(tuple(int(c * wave) for c in rgb_color))
+    return frame
+
+class WaveEffect(Effect):
     """波动灯光效果
     wave_speed: 0-1 值越大波动越快
     wave_density: 1-5 值越大波峰越密集
     """
 
-    rgb_color = hex_to_rgb(color, brightness)
-    print(f"启动波动模式 颜色:{color} 速度:{wave_speed:.1f} 密度:{wave_density} 亮度:{brightness:.1f}")
-
-    # 参数转换
-    speed_factor = 0.2 * wave_speed  # 控制波动速度
-    density_factor = wave_density * 2  # 控制波峰数量
-
-    t = 0
-    try:
-        while not stop_event.is_set():  # 检查是否需要停止
-            for i in range(NUM_PIXELS):
-                # 使用正弦波创建波动效果
-                wave = (math.sin((i/density_factor) + t) + 1) / 2
-                pixels[i] = tuple(int(c * wave) for c in rgb_color)
-
-            pixels.show()
-            t += speed_factor
-            time.sleep(0.03)
-    except KeyboardInterrupt:
-        print("\n退出中，关闭灯光...")
-        pixels.fill((0, 0, 0))
-        pixels.show()
+    def __init__(self, num_pixels, color='#FFFFFF', wave_speed=0.5, wave_density=3, brightness=1.0):
+        super().__init__(num_pixels)
+        log.info("启动波动模式 颜色:%s 速度:%.1f 密度:%s 亮度:%.1f", color, wave_speed, wave_density, brightness)
+        self.phase = 0.0
+        self.cache = get_frame_cache()
+        self.update(color, wave_speed, wave_density, brightness)
+
+    def update(self, color='#FFFFFF', wave_speed=0.5, wave_density=3, brightness=1.0):
+        self.rgb_color = hex_to_rgb(color, brightness)
+
+        # 参数转换
+        self.speed_factor = 0.2 * wave_speed  # 控制波动速度
+        self.density_factor = wave_density * 2  # 控制波峰数量
+
+        # 相位每前进 2π 画面重复一次，可以整周期缓存后回放
+        self.cache_key = ('wave', self.rgb_color, self.speed_factor, self.density_factor, self.num_pixels)
+        rate = self.speed_factor / FRAME_TIME  # 每秒相位增量
+        self.period = period = period_frames(2 * math.pi / rate, self.fps) if rate > 0 else None
+        # 后台生成缓存时参数可能已被修改，这里按当前参数固定下来
+        rgb_color, density_factor, num_pixels = self.rgb_color, self.density_factor, self.num_pixels
+        self._render_cached = lambda k: wave_frame(rgb_color, 2 * math.pi * k / period, density_factor, num_pixels)
+        # 速度为 0 时画面静止，第一帧之后即可空闲
+        self.static = self.speed_factor == 0
+        return True
+
+    def render(self, frame, t, dt):
+        # 按实际帧间隔推进相位，动画速度与帧率无关
+        self.phase += self.speed_factor * dt / FRAME_TIME
+        frames = self.cache.lookup(self.cache_key, self.period, self.num_pixels, self._render_cached)
+        if frames is not None:
+            frame[:] = frames[int(round(self.phase / (2 * math.pi) * self.period)) % self.period]
+        else:
+            # 整帧一次计算并批量写入灯带缓冲
+            frame[:] = wave_frame(self.rgb_color, self.phase, self.density_factor, self.num_pixels)
+        return True
+
+# 炫酷绿色波动效果
+def WaveLight(stop_event, color='#FFFFFF', wave_speed=0.5, wave_density=3, brightness=1.0):
+    """在当前线程运行波动效果直到 stop_event 被置位"""
+    run_effect(stop_event, WaveEffect(get_strip().num_pixels, color, wave_speed, wave_density, brightness))
 
 # 启动模式的线程
 def start_light_mode(mode_function):
@@ -63,6 +84,8 @@ def start_light_mode(mode_function):
     return stop_event, mode_thread
 
 if __name__ == "__main__":
+    get_strip().open()  # 硬件后端需要root时会自动申请sudo
+
     stop_event, mode_thread = start_light_mode(WaveLight)
     
     # 等待 10 秒钟模拟模式切换（你可以修改这个部分进行手动切换）
@@ -71,7 +94,7 @@ if __name__ == "__main__":
     # 停止当前模式
     stop_event.set()
     mode_thread.join()  # 等待当前模式线程退出
-    print("模式已停止")
+    log.info("模式已停止")
     
     # 你可以在此处切换到其他模式
     # 例如：start_light_mode(anotherModeFunction)
@@ -1,39 +1,35 @@
-import sys
-import os
-import board
-import neopixel
 import time
-import math
 import threading
+import numpy as np
+from effect import Effect, run_effect
+from strip import get_strip
+from device_log import get_logger
 
-# --- 自动申请sudo权限 ---
-if os.geteuid() != 0:
-    print("正在自动请求sudo权限...")
-    os.execvp("sudo", ["sudo", sys.executable] + sys.argv)
+log = get_logger('MODE')
 
-NUM_PIXELS = 60
-pixels = neopixel.NeoPixel(board.D18, NUM_PIXELS, brightness=1.0, auto_write=False)
+FRAME_TIME = 0.03  # 原始每帧步进对应的时长
 
 # 定义颜色
 color = (0, 255, 0)  # 绿色的RGB值
 
 # 炫酷绿色波动效果
+class GreenWaveEffect(Effect):
+
+    def __init__(self, num_pixels):
+        super().__init__(num_pixels)
+        log.info("模式一：炫酷绿色波动（Ctrl+C 可退出）")
+        self.phase = 0.0
+        self.pixel_index = np.arange(num_pixels)
+
+    def render(self, frame, t, dt):
+        self.phase += 0.15 * dt / FRAME_TIME
+        brightness = (np.sin(self.pixel_index / 4.0 + self.phase) + 1) / 2
+        frame[:] = color
+        frame[:, 1] = (brightness * 255).astype(np.uint8)
+        return True
+
 def greenWaveLight(stop_event):
-    print("模式一：炫酷绿色波动（Ctrl+C 可退出）")
-    t = 0
-    try:
-        while not stop_event.is_set():  # 检查是否需要停止
-            for i in range(NUM_PIXELS):
-                brightness = (math.sin((i / 4.0) + t) + 1) / 2
-                g = int(brightness * 255)
-                pixels[i] = (color[0], g, color[2])
-            pixels.show()
-            t += 0.15
-            time.sleep(0.03)
-    except KeyboardInterrupt:
-        print("\n退出中，关闭灯光...")
-        pixels.fill((0, 0, 0))
-        pixels.show()
+    run_effect(stop_event, GreenWaveEffect(get_strip().num_pixels))
 
 # 启动模式的线程
 def start_light_mode(mode_function):
@@ -43,6 +39,8 @@ def start_light_mode(mode_function):
     return stop_event, mode_thread
 
 if __name__ == "__main__":
+    get_strip().open()  # 硬件后端需要root时会自动申请sudo
+
     stop_event, mode_thread = start_light_mode(greenWaveLight)
     
     # 等待 10 秒钟模拟模式切换（你可以修改这个部分进行手动切换）
@@ -51,7 +49,7 @@ if __name__ == "__main__":
     # 停止当前模式
     stop_event.set()
     mode_thread.join()  # 等待当前模式线程退出
-    print("模式已停止")
+    log.info("模式已停止")
     
     # 你可以在此处切换到其他模式
     # 例如：start_light_mode(anotherModeFunction)
@@ -1,58 +1,38 @@
-import sys
-import os
-import board
-import neopixel
-import time
 import threading
-import colorsys
+from colors import hex_to_rgb
+from strip import get_strip
+from effect import Effect, run_effect
+from device_log import get_logger
 
-# --- 自动申请sudo权限 ---
-if os.geteuid() != 0:
-    print("正在自动请求sudo权限...")
-    os.execvp("sudo", ["sudo", sys.executable] + sys.argv)
+log = get_logger('MODE')
 
-# LED 数量
-NUM_PIXELS = 60
 
-# 初始化灯带
-pixels = neopixel.NeoPixel(board.D18, NUM_PIXELS, brightness=1.0, auto_write=False)
+class SolidEffect(Effect):
+    """支持十六进制颜色和亮度控制的常亮模式"""
 
-def hex_to_rgb(hex_color, brightness=1.0):
-    """将 #FFFFFF 格式转为 (r,g,b) 元组，并应用亮度"""
-    hex_color = hex_color.lstrip('#')
-    r = int(hex_color[0:2], 16) * brightness
-    g = int(hex_color[2:4], 16) * brightness
-    b = int(hex_color[4:6], 16) * brightness
-    return (int(r), int(g), int(b))
+    # 画面不随时间变化，画完第一帧后不再重复写灯带
+    static = True
 
-def constantColor(stop_event, color='#FFFFFF', brightness=1.0):
-    """支持十六进制颜色和亮度控制的常亮模式"""
-    rgb_color = hex_to_rgb(color, brightness)
-    print(f"启动常亮模式 颜色:{color} 亮度:{brightness} => RGB:{rgb_color}")
+    def __init__(self, num_pixels, color='#FFFFFF', brightness=1.0):
+        super().__init__(num_pixels)
+        self.update(color, brightness)
+        log.info("启动常亮模式 颜色:%s 亮度:%s => RGB:%s", color, brightness, self.rgb_color)
 
-    try:
-        pixels.fill(rgb_color)
-        pixels.show()
+    def update(self, color='#FFFFFF', brightness=1.0):
+        self.rgb_color = hex_to_rgb(color, brightness)
+        return True
 
-        while not stop_event.is_set():
-            time.sleep(1)
+    def render(self, frame, t, dt):
+        frame[:] = self.rgb_color
+        return True
 
-    except KeyboardInterrupt:
-        pixels.fill((0, 0, 0))
-        pixels.show()
+def constantColor(stop_event, color='#FFFFFF', brightness=1.0):
+    """在当前线程运行常亮模式直到 stop_event 被置位"""
+    run_effect(stop_event, SolidEffect(get_strip().num_pixels, color, brightness))
 
 def light(color='#FFFFFF', brightness=1.0):  # 确保顺序正确
-    """启动常亮模式的主入口函数"""
-    stop_event, mode_thread = start_light_mode(constantColor, color=color, brightness=brightness)
-
-    try:
-        while True:  # 保持主线程运行
-            time.sleep(1)
-    except KeyboardInterrupt:
-        stop_event.set()
-        mode_thread.join()
-        pixels.fill((0, 0, 0))
-        pixels.show()
+    """启动常亮模式的主入口函数，直接在当前线程运行，Ctrl+C 退出并熄灯"""
+    constantColor(threading.Event(), color=color, brightness=brightness)
 
 def start_light_mode(mode_function, color='#FFFFFF', brightness=1.0):
     stop_event = threading.Event()
@@ -66,6 +46,8 @@ def start_light_mode(mode_function, color='#FFFFFF', brightness=1.0):
     return stop_event, mode_thread
 
 if __name__ == "__main__":
+    get_strip().open()  # 硬件后端需要root时会自动申请sudo
+
     # 调用light函数，启动常亮模式
     light(color='#00FF00', brightness=0.8)  # 示例：绿色常亮模式
     
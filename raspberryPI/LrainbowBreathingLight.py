@@ -1,68 +1,88 @@
-import sys
-import os
-import board
-import neopixel
 import time
 import math
 import threading
+import numpy as np
+from colors import wheel, wheel_palette
+from strip import get_strip
+from effect import Effect, run_effect
+from frame_cache import get_frame_cache, MAX_PERIOD_FRAMES
+from device_log import get_logger
 
-# --- 自动申请sudo权限 ---
-if os.geteuid() != 0:
-    print("正在自动请求sudo权限...")
-    os.execvp("sudo", ["sudo", sys.executable] + sys.argv)
-
-NUM_PIXELS = 60
-pixels = neopixel.NeoPixel(board.D18, NUM_PIXELS, brightness=1.0, auto_write=False)
-
-# 生成彩虹色的一个函数
-def wheel(pos):
-    """输入0~255，输出彩虹颜色"""
-    if pos < 85:
-        return (255 - pos * 3, pos * 3, 0)
-    elif pos < 170:
-        pos -= 85
-        return (0, 255 - pos * 3, pos * 3)
-    else:
-        pos -= 170
-        return (pos * 3, 0, 255 - pos * 3)
+log = get_logger('MODE')
+
+
+def breathing_frame(brightness, offset, num_pixels):
+    """向量化计算一帧彩虹呼吸效果，返回 (num_pixels, 3) 的 uint8 数组"""
+    pos = (np.arange(num_pixels) * 256 // num_pixels + offset) % 256
+    # 呼吸曲线的亮度级数有限，按亮度缓存缩放好的彩虹表后直接查表
+    return wheel_palette(brightness)[pos]
+
+def breathing_frame_reference(brightness, offset, num_pixels):
+    """逐像素计算的参考实现，用于核对 breathing_frame 的输出"""
+    frame = []
+    for j in range(num_pixels):
+        # 加上偏移产生旋转/流动效果
+        pos = (j * 256 // num_pixels + offset) % 256
+        color = wheel(pos)
+        # 应用亮度
+        r = min(255, max(0, int(color[0] * brightness)))
+        g = min(255, max(0, int(color[1] * brightness)))
+        b = min(255, max(0, int(color[2] * brightness)))
+        frame.append((r, g, b))
+    return frame
+
+class BreathingEffect(Effect):
+    """彩虹流动+呼吸效果"""
+
+    def __init__(self, num_pixels, cycle_duration=3, steps=60, spin_speed=2):
+        super().__init__(num_pixels)
+        log.info("启动动态彩虹呼吸灯...")
+        self.position = 0.0  # 累计走过的步数，修改节奏时从当前位置接着走
+        self.cache = get_frame_cache()
+        self.update(cycle_duration, steps, spin_speed)
+
+    def update(self, cycle_duration=3, steps=60, spin_speed=2):
+        steps = steps + 100
+        self.step_time = cycle_duration / steps  # 每一步所需的时长
+
+        def render_step(step):
+            i = step % steps
+            offset = int(step * spin_speed) % 256  # 控制颜色流动偏移量
+            # 呼吸亮度曲线（0~1）
+            brightness = (math.sin(math.pi * i / steps)) ** 2
+            return breathing_frame(brightness, offset, self.num_pixels)
+        self.render_step = render_step
+
+        # 步数和旋转速度都是整数时，呼吸若干次后偏移回到 0，整个画面严格循环
+        self.cache_key = ('breathing_rainbow', steps, spin_speed, self.num_pixels)
+        self.period = None
+        if float(steps).is_integer() and float(spin_speed).is_integer():
+            cycles = 256 // math.gcd(256, int(steps * spin_speed) % 256)
+            self.period = int(steps) * cycles
+            if self.period > MAX_PERIOD_FRAMES:
+                self.period = None
+        self.last_step = None  # 参数变了，下一帧必须重画
+        return True
+
+    def render(self, frame, t, dt):
+        # 按经过的时间累计步数，呼吸节奏不受帧率影响
+        self.position += dt / self.step_time
+        step = int(self.position)
+        if step == self.last_step:
+            return False  # 还没走到下一步，画面不变，不必重算
+        self.last_step = step
+        frames = self.cache.lookup(self.cache_key, self.period, self.num_pixels, self.render_step)
+        if frames is not None:
+            frame[:] = frames[step % self.period]
+        else:
+            # 整帧一次计算并批量写入灯带缓冲
+            frame[:] = self.render_step(step)
+        return True
 
 # 彩虹流动+呼吸效果
 def rainbowBreathingLight(stop_event, cycle_duration=3, steps=60, spin_speed=2):
-    """彩虹流动+呼吸效果"""
-    print("启动动态彩虹呼吸灯...")
-
-    steps = steps + 100
-    offset = 0  # 控制颜色流动偏移量
-
-    try:
-        while not stop_event.is_set():
-            for i in range(steps):
-                if stop_event.is_set():
-                    break
-
-                # 呼吸亮度曲线（0~1）
-                brightness = (math.sin(math.pi * i / steps)) ** 2
-                for j in range(NUM_PIXELS):
-                    # 加上偏移产生旋转/流动效果
-                    pos = (j * 256 // NUM_PIXELS + offset) % 256
-                    color = wheel(pos)
-                    # 应用亮度
-                    r = min(255, max(0, int(color[0] * brightness)))
-                    g = min(255, max(0, int(color[1] * brightness)))
-                    b = min(255, max(0, int(color[2] * brightness)))
-                    pixels[j] = (r, g, b)
-                pixels.show()
-                time.sleep(cycle_duration / steps)
-                offset = (offset + spin_speed) % 256  # 增加偏移，实现颜色流动
-    except Exception as e:
-        print(f"[ERROR] 彩虹灯异常: {e}")
-    except KeyboardInterrupt:
-        print("\n退出中，关闭灯光...")
-        pixels.fill((0, 0, 0))
-        pixels.show()
-    finally:
-        pixels.fill((0, 0, 0))
-        pixels.show()
+    """在当前线程运行彩虹呼吸效果直到 stop_event 被置位"""
+    run_effect(stop_event, BreathingEffect(get_strip().num_pixels, cycle_duration, steps, spin_speed))
 
 
 # 启动模式的线程
@@ -73,6 +93,8 @@ def start_light_mode(mode_function, *args):
     return stop_event, mode_thread
 
 if __name__ == "__main__":
+    get_strip().open()  # 硬件后端需要root时会自动申请sudo
+
     stop_event, mode_thread = start_light_mode(rainbowBreathingLight, 4, 140, 2)
 
     # 模拟等待 10 秒后切换模式（你可以根据需求修改时间）
@@ -81,7 +103,7 @@ if __name__ == "__main__":
     # 停止当前模式
     stop_event.set()
     mode_thread.join()  # 等待当前模式线程退出
-    print("彩虹流动+呼吸模式已停止")
+    log.info("彩虹流动+呼吸模式已停止")
 
     # 切换到另一个模式
     # 例如：start_light_mode(anotherModeFunction)
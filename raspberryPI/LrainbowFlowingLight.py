@@ -1,68 +1,83 @@
-import sys
-import os
-import board
-import neopixel
 import time
 import threading
+import numpy as np
+from effect import Effect, run_effect
+from frame_cache import get_frame_cache, MAX_PERIOD_FRAMES
+from colors import WHEEL_TABLE
+from strip import get_strip
+from device_log import get_logger
 
-# --- 自动申请sudo权限 ---
-if os.geteuid() != 0:
-    print("正在自动请求sudo权限...")
-    os.execvp("sudo", ["sudo", sys.executable] + sys.argv)
-
-NUM_PIXELS = 60
-pixels = neopixel.NeoPixel(board.D18, NUM_PIXELS, brightness=1.0, auto_write=False)
-
-# 生成彩虹色的一个函数
-def wheel(pos):
-    """输入0~255，输出彩虹颜色"""
-    pos = pos % 256
-    if pos < 85:
-        return (255 - pos * 3, pos * 3, 0)
-    elif pos < 170:
-        pos -= 85
-        return (0, 255 - pos * 3, pos * 3)
-    else:
-        pos -= 170
-        return (pos * 3, 0, 255 - pos * 3)
+log = get_logger('MODE')
 
-# 彩虹流动效果
-def rainbowFlowingLight(stop_event, speed=0.5, tail_length=9, brightness=1.0):
+
+def flowing_frame(offset, tail_index, tail_brightness, num_pixels, out=None):
+    """计算一帧彩虹流动拖尾，写入 out（缺省时新建）并返回"""
+    frame = np.zeros((num_pixels, 3), dtype=np.uint8) if out is None else out
+    frame[:] = 0
+    # 彩虹色查表后乘以亮度系数，拖尾绕回时靠后的像素覆盖靠前的
+    pos = (offset - tail_index) % num_pixels
+    frame[pos] = (WHEEL_TABLE[(pos * 256 // num_pixels) & 255] * tail_brightness).astype(np.uint8)
+    return frame
+
+class FlowingEffect(Effect):
     """彩虹流动效果
     speed: 0-1 值越大流动越快
     tail_length: 拖尾长度 (1-20)
     brightness: 整体亮度 (0-1)
     """
-    print(f"启动彩虹流动 speed={speed:.1f} tail={tail_length} brightness={brightness:.1f}")
 
-    # 确保tail_length为整数
-    tail_length = int(round(tail_length))
+    def __init__(self, num_pixels, speed=0.5, tail_length=9, brightness=1.0):
+        super().__init__(num_pixels)
+        log.info("启动彩虹流动 speed=%.1f tail=%s brightness=%.1f", speed, tail_length, brightness)
+        # 累计走过的步数和当前偏移，修改速度时从当前位置接着流动
+        self.position = 0.0
+        self.offset = 0
+        self.cache = get_frame_cache()
+        self.update(speed, tail_length, brightness)
 
-    # 参数转换
-    delay_time = 0.05 * (1 - speed)  # speed=1最快(0s), speed=0最慢(0.05s)
-    color_step = max(1, int(10 * speed))  # 控制颜色变化步长
+    def update(self, speed=0.5, tail_length=9, brightness=1.0):
+        # 确保tail_length为整数
+        tail_length = int(round(tail_length))
+        num_pixels = self.num_pixels
 
-    try:
-        offset = 0
-        while not stop_event.is_set():
-            # 清空灯带
-            pixels.fill((0, 0, 0))
+        # 参数转换
+        delay_time = 0.05 * (1 - speed)  # speed=1最快(0s), speed=0最慢(0.05s)
+        self.color_step = max(1, int(10 * speed))  # 控制颜色变化步长
+        self.step_time = max(0.001, delay_time)  # 每前进一步所需的时长
 
-            # 绘制拖尾
-            for i in range(tail_length):
-                pos = (offset - i) % NUM_PIXELS
-                pixel_brightness = brightness * (1 - (i / tail_length))
-                color = wheel((pos * 256 // NUM_PIXELS) & 255)
-                pixels[pos] = tuple(int(c * pixel_brightness) for c in color)
+        # 拖尾各位置的亮度系数与参数有关，与帧无关，提前算好
+        tail_index = np.arange(tail_length)
+        tail_brightness = (brightness * (1 - tail_index / tail_length))[:, None]
+        self.tail_index, self.tail_brightness = tail_index, tail_brightness
 
-            pixels.show()
-            offset = (offset + color_step) % NUM_PIXELS  # 用color_step来增加偏移
-            time.sleep(max(0.001, delay_time))
+        # 画面只取决于偏移，偏移共 num_pixels 种，按偏移缓存后与速度无关
+        self.cache_key = ('flowing_rainbow', tail_length, brightness, num_pixels)
+        self.period = num_pixels if num_pixels <= MAX_PERIOD_FRAMES else None
+        self._render_cached = lambda k: flowing_frame(k, tail_index, tail_brightness, num_pixels)
+        self.last_step = None  # 参数变了，下一帧必须重画
+        return True
 
-    except KeyboardInterrupt:
-        print("\n退出中，关闭灯光...")
-        pixels.fill((0, 0, 0))
-        pixels.show()
+    def render(self, frame, t, dt):
+        # 按经过的时间累计步数，流动速度不受帧率影响
+        self.position += dt / self.step_time
+        step = int(self.position)
+        if step == self.last_step:
+            return False  # 还没走到下一步，画面不变，不必重算
+        if self.last_step is not None:
+            self.offset = (self.offset + (step - self.last_step) * self.color_step) % self.num_pixels
+        self.last_step = step
+        frames = self.cache.lookup(self.cache_key, self.period, self.num_pixels, self._render_cached)
+        if frames is not None:
+            frame[:] = frames[self.offset]
+        else:
+            # 绘制拖尾
+            flowing_frame(self.offset, self.tail_index, self.tail_brightness, self.num_pixels, out=frame)
+        return True
+
+# 彩虹流动效果
+def rainbowFlowingLight(stop_event, speed=0.5, tail_length=9, brightness=1.0):
+    """在当前线程运行彩虹流动效果直到 stop_event 被置位"""
+    run_effect(stop_event, FlowingEffect(get_strip().num_pixels, speed, tail_length, brightness))
 
 # 启动模式的线程
 def start_light_mode(mode_function, *args, **kwargs):
@@ -72,6 +87,8 @@ def start_light_mode(mode_function, *args, **kwargs):
     return stop_event, mode_thread
 
 if __name__ == "__main__":
+    get_strip().open()  # 硬件后端需要root时会自动申请sudo
+
     stop_event, mode_thread = start_light_mode(rainbowFlowingLight, speed=0.5, tail_length=0.2, brightness=1.0)
 
     # 模拟等待 10 秒后切换模式（你可以根据需求修改时间）
@@ -80,7 +97,7 @@ if __name__ == "__main__":
     # 停止当前模式
     stop_event.set()
     mode_thread.join()  # 等待当前模式线程退出
-    print("彩虹流动灯模式已停止")
+    log.info("彩虹流动灯模式已停止")
 
     # 切换到另一个模式
     # 例如：start_light_mode(anotherModeFunction)
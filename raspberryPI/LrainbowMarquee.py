@@ -1,83 +1,69 @@
-import sys
-import os
-import board
-import neopixel
 import time
-import colorsys
 import threading
+import numpy as np
+from effect import Effect, run_effect
+from colors import HSV_TABLE, HSV_HUES, value_level
+from strip import get_strip
+from device_log import get_logger
 
-# --- 自动申请sudo权限 ---
-if os.geteuid() != 0:
-    print("正在自动请求sudo权限...")
-    os.execvp("sudo", ["sudo", sys.executable] + sys.argv)
+log = get_logger('MODE')
 
-# LED 数量
-NUM_PIXELS = 60
+# 整体亮度（原先由灯带对象的 brightness=0.5 统一缩放，现在并入明度）
+BRIGHTNESS = 0.5
 
-# 初始化灯带
-pixels = neopixel.NeoPixel(board.D18, NUM_PIXELS, brightness=0.5, auto_write=False)
-
-def hsv_to_rgb(h, s, v):
-    """将 HSV 转为 RGB，输出为 0-255 的整数元组"""
-    r, g, b = colorsys.hsv_to_rgb(h, s, v)
-    return (int(r * 255), int(g * 255), int(b * 255))
-
-def rainbowMarquee(stop_event, speed=0.5, tail_length=9):
+class MarqueeEffect(Effect):
     """彩虹拖尾跑马灯
     speed: 0-1 浮点数，越大变化越快
     tail_length: 拖尾长度
     """
-    # 处理tail_length必须是整数，且至少为1
-    tail_length = max(1, int(tail_length))
-    print(f"启动彩虹拖尾跑马灯 speed={speed:.2f} tail_length={tail_length}")
-
-    # 将0-1的速度值转换为实际的延迟时间（0.1-0.001秒）
-    delay_time = 0.1 * (1 - speed) + 0.001
-
-    hue_offset = 0  # 用于彩虹变化
-
-    try:
-        while not stop_event.is_set():
-            # 从左到右
-            for head in range(NUM_PIXELS + tail_length):
-                if stop_event.is_set():
-                    break
-                pixels.fill((0, 0, 0))  # 清空
-                for i in range(tail_length):
-                    pos = head - i
-                    if 0 <= pos < NUM_PIXELS:
-                        brightness = 1.0 - (i / tail_length)  # 越靠后越暗
-                        hue = ((pos + hue_offset) % 360) / 360.0  # 彩虹色循环
-                        color = hsv_to_rgb(hue, 1.0, brightness)
-                        pixels[pos] = color
-                pixels.show()
-                time.sleep(delay_time)
-                hue_offset = (hue_offset + 2) % 360  # 彩虹色慢慢滚动
-
-            # 从右到左
-            for head in reversed(range(NUM_PIXELS + tail_length)):
-                if stop_event.is_set():
-                    break
-                pixels.fill((0, 0, 0))
-                for i in range(tail_length):
-                    pos = head - i
-                    if 0 <= pos < NUM_PIXELS:
-                        brightness = 1.0 - (i / tail_length)
-                        hue = ((pos + hue_offset) % 360) / 360.0
-                        color = hsv_to_rgb(hue, 1.0, brightness)
-                        pixels[pos] = color
-                pixels.show()
-                time.sleep(delay_time)
-                hue_offset = (hue_offset + 2) % 360
-
-    except KeyboardInterrupt:
-        print("\n中断，关闭灯光")
-        pixels.fill((0, 0, 0))
-        pixels.show()
-    finally:
-        # 退出时确保灯带熄灭
-        pixels.fill((0, 0, 0))
-        pixels.show()
+
+    def __init__(self, num_pixels, speed=0.5, tail_length=9):
+        super().__init__(num_pixels)
+        log.info("启动彩虹拖尾跑马灯 speed=%.2f tail_length=%s", speed, max(1, int(tail_length)))
+        self.position = 0.0  # 累计走过的步数，修改速度时从当前位置接着走
+        self.update(speed, tail_length)
+
+    def update(self, speed=0.5, tail_length=9):
+        # 处理tail_length必须是整数，且至少为1
+        tail_length = max(1, int(tail_length))
+
+        # 将0-1的速度值转换为实际的延迟时间（0.1-0.001秒）
+        self.delay_time = 0.1 * (1 - speed) + 0.001
+        self.span = self.num_pixels + tail_length  # 单程的步数
+
+        # 拖尾越靠后越暗，各位置的明度级别提前算好，循环内只查 HSV 表
+        self.tail_index = np.arange(tail_length)
+        self.tail_levels = np.array([value_level(BRIGHTNESS * (1.0 - (i / tail_length))) for i in range(tail_length)])
+        self.last_step = None  # 参数变了，下一帧必须重画
+        return True
+
+    def render(self, frame, t, dt):
+        # 按经过的时间累计步数，一个来回共 2*span 步
+        self.position += dt / self.delay_time
+        step = int(self.position)
+        if step == self.last_step:
+            return False  # 还没走到下一步，画面不变，不必重算
+        self.last_step = step
+        span = self.span
+        pos_in_cycle = step % (2 * span)
+        if pos_in_cycle < span:
+            head = pos_in_cycle  # 从左到右
+        else:
+            head = 2 * span - 1 - pos_in_cycle  # 从右到左
+        hue_offset = (step * 2) % 360  # 彩虹色慢慢滚动
+
+        pos = head - self.tail_index
+        visible = (pos >= 0) & (pos < self.num_pixels)
+        pos = pos[visible]
+        hue = (pos + hue_offset) % HSV_HUES  # 彩虹色循环
+
+        frame[:] = 0  # 清空
+        frame[pos] = HSV_TABLE[hue, self.tail_levels[visible]]
+        return True
+
+def rainbowMarquee(stop_event, speed=0.5, tail_length=9):
+    """在当前线程运行彩虹跑马灯直到 stop_event 被置位"""
+    run_effect(stop_event, MarqueeEffect(get_strip().num_pixels, speed, tail_length))
 
 # 启动模式的线程
 def start_light_mode(mode_function, *args):
@@ -87,6 +73,8 @@ def start_light_mode(mode_function, *args):
     return stop_event, mode_thread
 
 if __name__ == "__main__":
+    get_strip().open()  # 硬件后端需要root时会自动申请sudo
+
     stop_event, mode_thread = start_light_mode(rainbowMarquee)
 
     # 模拟等待 10 秒后切换模式（你可以根据需求修改时间）
@@ -95,4 +83,4 @@ if __name__ == "__main__":
     # 停止当前模式
     stop_event.set()
     mode_thread.join()  # 等待当前模式线程退出
-    print("彩虹拖尾跑马灯模式已停止")
+    log.info("彩虹拖尾跑马灯模式已停止")
@@ -1,67 +1,63 @@
-import sys
-import os
-import board
-import neopixel
 import time
-import math
-import random
 import threading
+import numpy as np
+from effect import Effect, run_effect
+from colors import hex_to_rgb
+from strip import get_strip
+from device_log import get_logger
 
-# --- 自动申请sudo权限 ---
-if os.geteuid() != 0:
-    print("正在自动请求sudo权限...")
-    os.execvp("sudo", ["sudo", sys.executable] + sys.argv)
+log = get_logger('MODE')
 
-# LED 数量
-num_pixels = 60
-
-# 初始化灯带
-pixels = neopixel.NeoPixel(board.D18, num_pixels, brightness=0.5, auto_write=False)
-
-def hex_to_rgb(hex_color):
-    """将 #FFFFFF 转为 (r,g,b) 元组"""
-    hex_color = hex_color.lstrip('#')
-    return tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
+# 整体亮度（原先由灯带对象的 brightness=0.5 统一缩放，现在并入颜色）
+BRIGHTNESS = 0.5
+FPS = 20  # 闪烁每帧重新随机，保持原有的 20 帧/秒节奏
 
 def interpolate(color1, color2, factor):
     """线性插值函数：颜色之间渐变"""
     return tuple(int(color1[i] + (color2[i] - color1[i]) * factor) for i in range(3))
 
-def starTwinklingLight(stop_event, color1='#FFFFFF', color2='#FFFF00', frequency=0.1, speed=0.1, cycle_time=3):
+class TwinkleEffect(Effect):
     """星星闪烁渐变效果
     frequency: 0-1 值越大闪烁越频繁
     speed: 闪烁速度
     cycle_time: 控制颜色渐变周期的秒数
     """
-    print(f"启动闪烁模式 颜色1:{color1} 颜色2:{color2} 频率:{frequency:.2f} 速度:{speed:.2f}")
 
-    rgb_color1 = hex_to_rgb(color1)
-    rgb_color2 = hex_to_rgb(color2)
+    fps = FPS
 
-    start_time = time.time()  # ➔ 这里补上定义
-    try:
-        while not stop_event.is_set():
-            current_time = time.time() - start_time
-            cycle_progress = (current_time % cycle_time) / cycle_time
+    def __init__(self, num_pixels, color1='#FFFFFF', color2='#FFFF00', frequency=0.1, speed=0.1, cycle_time=3):
+        super().__init__(num_pixels)
+        log.info("启动闪烁模式 颜色1:%s 颜色2:%s 频率:%.2f 速度:%.2f", color1, color2, frequency, speed)
+        self.pixel_index = np.arange(num_pixels)
+        # 渐变进度和闪烁相位按帧累加，修改速度或周期时画面不会跳变
+        self.cycle_progress = 0.0
+        self.spin = 0.0
+        self.update(color1, color2, frequency, speed, cycle_time)
 
-            for i in range(num_pixels):
-                if random.random() < frequency:
-                    base_color = interpolate(rgb_color1, rgb_color2, cycle_progress)
-                    pixel_offset = math.sin(i/10 + current_time*speed) * 0.5 + 0.5
-                    final_color = tuple(int(c * pixel_offset) for c in base_color)
-                    pixels[i] = final_color
-                else:
-                    pixels[i] = (0, 0, 0)
+    def update(self, color1='#FFFFFF', color2='#FFFF00', frequency=0.1, speed=0.1, cycle_time=3):
+        self.rgb_color1 = hex_to_rgb(color1, BRIGHTNESS)
+        self.rgb_color2 = hex_to_rgb(color2, BRIGHTNESS)
+        self.frequency = frequency
+        self.speed = speed
+        self.cycle_time = cycle_time
+        return True
 
-            pixels.show()
-            time.sleep(0.05)
+    def render(self, frame, current_time, dt):
+        self.cycle_progress = (self.cycle_progress + dt / self.cycle_time) % 1.0
+        self.spin += dt * self.speed
+        # 同一帧内所有像素的基色相同，只需插值一次
+        base_color = interpolate(self.rgb_color1, self.rgb_color2, self.cycle_progress)
 
-    except KeyboardInterrupt:
-        print("\n中断，关闭灯光")
-    finally:
-        # 确保退出时灯带熄灭
-        pixels.fill((0, 0, 0))
-        pixels.show()
+        # 整帧一次随机出亮起的像素，长灯带上也不需要逐像素循环
+        lit = np.random.random(self.num_pixels) < self.frequency
+        pixel_offset = np.sin(self.pixel_index / 10 + self.spin) * 0.5 + 0.5
+        frame[:] = (pixel_offset[:, None] * base_color).astype(np.uint8)
+        frame[~lit] = 0
+        return True
+
+def starTwinklingLight(stop_event, color1='#FFFFFF', color2='#FFFF00', frequency=0.1, speed=0.1, cycle_time=3):
+    """在当前线程运行星星闪烁效果直到 stop_event 被置位"""
+    run_effect(stop_event, TwinkleEffect(get_strip().num_pixels, color1, color2, frequency, speed, cycle_time))
 
 # 启动模式的线程
 def start_light_mode(mode_function, *args):
@@ -71,10 +67,12 @@ def start_light_mode(mode_function, *args):
     return stop_event, mode_thread
 
 if __name__ == "__main__":
+    get_strip().open()  # 硬件后端需要root时会自动申请sudo
+
     stop_event, mode_thread = start_light_mode(starTwinklingLight)
 
     time.sleep(10)  # 等10秒
 
     stop_event.set()
     mode_thread.join()
-    print("渐变闪烁效果模式已停止")
+    log.info("渐变闪烁效果模式已停止")
@@ -1,64 +1,81 @@
 # -*- coding: utf-8 -*-
-import sys
-import os
-import board
-import neopixel
 import time
 import math
 import threading
-
-# --- 自动申请sudo权限 ---
-if os.geteuid() != 0:
-    print("正在自动请求sudo权限...")
-    os.execvp("sudo", ["sudo", sys.executable] + sys.argv)
-
-# LED 数量
-NUM_PIXELS = 60
-
-# 初始化灯带
-pixels = neopixel.NeoPixel(board.D18, NUM_PIXELS, brightness=1.0, auto_write=False)
-
-def hex_to_rgb(hex_color, brightness=1.0):
-    """将 #FFFFFF 转为 (r,g,b) 元组并应用亮度"""
-    hex_color = hex_color.lstrip('#')
-    r = int(hex_color[0:2], 16) * brightness
-    g = int(hex_color[2:4], 16) * brightness
-    b = int(hex_color[4:6], 16) * brightness
-    return (int(r), int(g), int(b))
-
-def waterRippleLamp(stop_event, color='#FFFFFF', speed=0.5, wave_length=5):
+import numpy as np
+from colors import hex_to_rgb
+from strip import get_strip
+from effect import Effect, run_effect
+from frame_cache import get_frame_cache, period_frames
+from device_log import get_logger
+
+log = get_logger('MODE')
+
+FRAME_TIME = 0.05  # 原始每帧步进对应的时长，用于把步进换算为每秒速率
+
+def ripple_frame(rgb_color, phase, wave_factor, num_pixels):
+    """向量化计算一帧水波纹效果，返回 (num_pixels, 3) 的 uint8 数组"""
+    distance = np.abs(np.arange(num_pixels) - num_pixels // 2)
+    brightness = (np.sin((phase - distance / wave_factor) * np.pi) + 1) / 2
+    np.clip(brightness, 0, 1, out=brightness)
+    return (brightness[:, None] * np.asarray(rgb_color, dtype=np.float64)).astype(np.uint8)
+
+def ripple_frame_reference(rgb_color, phase, wave_factor, num_pixels):
+    """逐像素计算的参考实现，用于核对 ripple_frame 的输出"""
+    center = num_pixels // 2
+    frame = []
+    for i in range(num_pixels):
+        distance = abs(i - center)
+        # 每个像素根据距中心的距离有一个延迟，相当于“跳动波向外扩展”
+        brightness = (math.sin((phase - distance/wave_factor) * math.pi) + 1) / 2
+        brightness = max(0, min(1, brightness))  # 钳制在0-1范围
+        frame.append(tuple(int(c * brightness) for c in rgb_color))
+    return frame
+
+class RippleEffect(Effect):
     """水波纹效果
     speed: 0-1 值越大波纹扩散越快
     wave_length: 1-10 波纹波长（值越大波纹越宽）
     """
-    rgb_color = hex_to_rgb(color)
-    print(f"启动水波纹 颜色:{color} 速度:{speed:.1f} 波长:{wave_length}")
 
-    # 参数转换
-    speed_factor = 0.5 * speed  # 控制波纹扩散速度
-    wave_factor = 10 / wave_length  # 控制波纹宽度
+    def __init__(self, num_pixels, color='#FFFFFF', speed=0.5, wave_length=5):
+        super().__init__(num_pixels)
+        log.info("启动水波纹 颜色:%s 速度:%.1f 波长:%s", color, speed, wave_length)
+        self.phase = 0.0
+        self.cache = get_frame_cache()
+        self.update(color, speed, wave_length)
+
+    def update(self, color='#FFFFFF', speed=0.5, wave_length=5):
+        self.rgb_color = hex_to_rgb(color)
+
+        # 参数转换
+        self.speed_factor = 0.5 * speed  # 控制波纹扩散速度
+        self.wave_factor = 10 / wave_length  # 控制波纹宽度
+
+        # 相位每前进 2 画面重复一次，可以整周期缓存后回放
+        self.cache_key = ('ripple', self.rgb_color, self.speed_factor, self.wave_factor, self.num_pixels)
+        rate = self.speed_factor / FRAME_TIME  # 每秒相位增量
+        self.period = period = period_frames(2 / rate, self.fps) if rate > 0 else None
+        # 后台生成缓存时参数可能已被修改，这里按当前参数固定下来
+        rgb_color, wave_factor, num_pixels = self.rgb_color, self.wave_factor, self.num_pixels
+        self._render_cached = lambda k: ripple_frame(rgb_color, 2 * k / period, wave_factor, num_pixels)
+        # 速度为 0 时画面静止，第一帧之后即可空闲
+        self.static = self.speed_factor == 0
+        return True
+
+    def render(self, frame, t, dt):
+        self.phase += self.speed_factor * dt / FRAME_TIME
+        frames = self.cache.lookup(self.cache_key, self.period, self.num_pixels, self._render_cached)
+        if frames is not None:
+            frame[:] = frames[int(round(self.phase / 2 * self.period)) % self.period]
+        else:
+            # 整帧一次计算并批量写入灯带缓冲
+            frame[:] = ripple_frame(self.rgb_color, self.phase, self.wave_factor, self.num_pixels)
+        return True
 
-    center = NUM_PIXELS // 2
-    phase = 0
-
-    try:
-        while not stop_event.is_set():
-            for i in range(NUM_PIXELS):
-                distance = abs(i - center)
-                # 每个像素根据距中心的距离有一个延迟，相当于“跳动波向外扩展”
-                brightness = (math.sin((phase - distance/wave_factor) * math.pi) + 1) / 2
-                brightness = max(0, min(1, brightness))  # 钳制在0-1范围
-
-                pixels[i] = tuple(int(c * brightness) for c in rgb_color)
-
-            pixels.show()
-            phase += speed_factor
-            time.sleep(0.05)
-
-    except KeyboardInterrupt:
-        print("\n中断，关闭灯光")
-        pixels.fill((0, 0, 0))
-        pixels.show()
+def waterRippleLamp(stop_event, color='#FFFFFF', speed=0.5, wave_length=5):
+    """在当前线程运行水波纹效果直到 stop_event 被置位"""
+    run_effect(stop_event, RippleEffect(get_strip().num_pixels, color, speed, wave_length))
 
 # 启动模式的线程
 def start_light_mode(mode_function, *args):
@@ -68,6 +85,8 @@ def start_light_mode(mode_function, *args):
     return stop_event, mode_thread
 
 if __name__ == "__main__":
+    get_strip().open()  # 硬件后端需要root时会自动申请sudo
+
     stop_event, mode_thread = start_light_mode(waterRippleLamp, color=(255, 100, 255), speed=0.08, wave_length=7)
 
     # 模拟等待 10 秒后切换模式（你可以根据需求修改时间）
@@ -76,7 +95,7 @@ if __name__ == "__main__":
     # 停止当前模式
     stop_event.set()
     mode_thread.join()  # 等待当前模式线程退出
-    print("音符跳动灯效果模式已停止")
+    log.info("音符跳动灯效果模式已停止")
 
     # 切换到另一个模式
     # 例如：start_light_mode(anotherModeFunction)
@@ -0,0 +1,186 @@
+import fcntl
+import selectors
+import socket
+import struct
+import threading
+import time
+
+from device_log import get_logger
+
+log = get_logger('NET')
+
+# netlink 组播组：网卡状态、IPv4 地址、IPv4 路由变化
+RTMGRP_LINK = 0x1
+RTMGRP_IPV4_IFADDR = 0x10
+RTMGRP_IPV4_ROUTE = 0x40
+SIOCGIFADDR = 0x8915
+RTF_UP = 0x1
+
+POLL_INTERVAL = 5.0  # 没有 netlink 时轮询路由表的间隔（秒）
+SETTLE_TIME = 0.2  # 收到事件后等一会儿，把一次变化产生的一串消息合并成一次刷新
+
+
+def default_interface(route_path='/proc/net/route'):
+    """从路由表找出默认路由所在的网卡（有多条时取 metric 最小的）"""
+    best = None
+    with open(route_path) as f:
+        next(f, None)  # 表头
+        for line in f:
+            fields = line.split()
+            if len(fields) < 7 or fields[1] != '00000000' or not int(fields[3], 16) & RTF_UP:
+                continue
+            metric = int(fields[6])
+            if best is None or metric < best[1]:
+                best = (fields[0], metric)
+    return best[0] if best else None
+
+
+def interface_address(iface):
+    """读取网卡的 IPv4 地址，网卡没有地址时返回 None"""
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        try:
+            packed = fcntl.ioctl(s.fileno(), SIOCGIFADDR, struct.pack('256s', iface[:15].encode()))
+        except OSError:
+            return None
+    return socket.inet_ntoa(packed[20:24])
+
+
+def probe_address():
+    """原先的做法：UDP connect 到公网地址后读取本端地址（不会真正发包），读不到路由表时兜底"""
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        s.connect(('8.8.8.8', 80))
+        return s.getsockname()[0]
+    except OSError:
+        return None
+    finally:
+        s.close()
+
+
+def read_address():
+    """当前默认路由网卡的 IPv4 地址"""
+    try:
+        iface = default_interface()
+    except OSError:
+        return probe_address()
+    return interface_address(iface) if iface else None
+
+
+class AddressMonitor:
+    """网络地址跟踪
+    缓存本机地址，只在地址或路由真正变化时重新读取：优先订阅 netlink 的地址/路由事件，
+    监视线程阻塞在 netlink 套接字上，没有事件时不会醒来，stop() 通过 socketpair 唤醒它；
+    不支持 netlink 时退回定期读取 /proc/net/route。地址变化时依次调用订阅者 callback(新地址)
+    """
+
+    def __init__(self, poll_interval=POLL_INTERVAL):
+        self.poll_interval = poll_interval
+        self.address = None
+        self.source = None  # 'netlink' 或 'poll'
+        self.changes = 0
+        self._callbacks = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wakeup = None  # (监视线程读的一端, stop() 写的一端)
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self.refresh()
+            self._wakeup = socket.socketpair()
+            self._thread = threading.Thread(target=self._run, name='address-monitor', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._wakeup is not None:
+            try:
+                self._wakeup[1].send(b'\0')
+            except OSError:
+                pass
+
+    def subscribe(self, callback):
+        """地址变化时调用 callback(address)，在监视线程中执行，不要在回调里阻塞"""
+        self._callbacks.append(callback)
+
+    def refresh(self):
+        """重新读取地址，有变化时通知订阅者，返回当前地址"""
+        address = read_address()
+        with self._lock:
+            if address == self.address:
+                return address
+            old, self.address = self.address, address
+            self.changes += 1
+        if old is not None:
+            log.info("本机地址变化: %s -> %s", old, address)
+        for callback in list(self._callbacks):
+            try:
+                callback(address)
+            except Exception as e:
+                log.error("地址变化回调异常: %s", e)
+        return address
+
+    def _run(self):
+        try:
+            sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, socket.NETLINK_ROUTE)
+            sock.bind((0, RTMGRP_LINK | RTMGRP_IPV4_IFADDR | RTMGRP_IPV4_ROUTE))
+        except (AttributeError, OSError) as e:
+            log.warning("netlink 不可用（%s），改为每 %.0f 秒读取路由表", e, self.poll_interval)
+            for end in self._wakeup:
+                end.close()
+            self._poll()
+            return
+        self.source = 'netlink'
+        sock.setblocking(False)
+        wakeup, notifier = self._wakeup
+        with selectors.DefaultSelector() as selector, sock, wakeup, notifier:
+            selector.register(sock, selectors.EVENT_READ)
+            selector.register(wakeup, selectors.EVENT_READ)
+            while not self._stop.is_set():
+                # 没有超时：只有网络变化或 stop() 才会唤醒
+                if any(key.fileobj is wakeup for key, _ in selector.select()):
+                    return
+                if not self._drain(sock, selector, wakeup):
+                    return
+                self.refresh()
+
+    def _drain(self, sock, selector, wakeup):
+        """读掉已到的事件，再等一小段时间读掉同一次变化产生的后续事件；被 stop() 唤醒时返回 False"""
+        deadline = time.monotonic() + SETTLE_TIME
+        while True:
+            try:
+                while True:
+                    sock.recv(65536)
+            except BlockingIOError:
+                pass
+            except OSError:
+                # 缓冲溢出（ENOBUFS）等情况丢了事件，之后照常重新读一次地址
+                pass
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return True
+            ready = selector.select(remaining)
+            if not ready:
+                return True
+            if any(key.fileobj is wakeup for key, _ in ready):
+                return False
+
+    def _poll(self):
+        self.source = 'poll'
+        while not self._stop.wait(self.poll_interval):
+            self.refresh()
+
+
+_monitor = None
+_monitor_lock = threading.Lock()
+
+
+def get_address_monitor():
+    """获取全局地址监视器，首次调用时读取地址并开始监视"""
+    global _monitor
+    if _monitor is None:
+        with _monitor_lock:
+            if _monitor is None:
+                _monitor = AddressMonitor()
+                _monitor.start()
+    return _monitor
@@ -1,5 +1,9 @@
-import requests
+from http_session import get_session
 import time
+from device_log import get_logger
+
+log = get_logger('BIND')
+
 
 class DeviceBinding:
     def __init__(self, api_base):
@@ -9,16 +13,16 @@ class DeviceBinding:
     def check_binding(self, device_id):
         """检查设备绑定状态"""
         try:
-            resp = requests.post(
+            resp = get_session().post(
                 f"{self.api_base}/api/device/check-registered",
                 json={'deviceId': device_id},
                 timeout = 3
             )
-            print(f"绑定检查响应: {resp.status_code}, {resp.text}")
+            log.debug("绑定检查响应: %s, %s", resp.status_code, resp.text)
 
             if resp.status_code == 200:
                 return resp.json().get('data', {}).get('isBound', False)
             return False
         except Exception as e:
-            print(f"绑定检查失败: {e}")
+            log.error("绑定检查失败: %s", e)
             return False
@@ -0,0 +1,80 @@
+import colorsys
+from functools import lru_cache
+
+import numpy as np
+
+# HSV 查表精度：色相按 1 度，明度按 256 级
+HSV_HUES = 360
+HSV_LEVELS = 256
+
+
+def _build_wheel_table():
+    """生成 256 色彩虹表：0~255 依次经过 红->绿->蓝->红"""
+    table = np.zeros((256, 3), dtype=np.uint8)
+    for pos in range(256):
+        if pos < 85:
+            table[pos] = (255 - pos * 3, pos * 3, 0)
+        elif pos < 170:
+            p = pos - 85
+            table[pos] = (0, 255 - p * 3, p * 3)
+        else:
+            p = pos - 170
+            table[pos] = (p * 3, 0, 255 - p * 3)
+    return table
+
+
+def _build_hsv_table():
+    """生成饱和度为 1 的 HSV 表，索引为 [色相(度), 明度级别]
+    s=1 时 hsv_to_rgb(h, 1, v) 恰好等于 v * hsv_to_rgb(h, 1, 1)，
+    只需对 360 个色相调用一次 colorsys，其余用向量运算展开
+    """
+    base = np.array([colorsys.hsv_to_rgb(h / HSV_HUES, 1.0, 1.0) for h in range(HSV_HUES)])
+    values = np.arange(HSV_LEVELS) / (HSV_LEVELS - 1)
+    return ((values[None, :, None] * base[:, None, :]) * 255).astype(np.uint8)
+
+
+WHEEL_TABLE = _build_wheel_table()
+HSV_TABLE = _build_hsv_table()
+
+
+def wheel(pos):
+    """输入0~255，输出彩虹颜色"""
+    return tuple(int(c) for c in WHEEL_TABLE[pos % 256])
+
+
+def value_level(v):
+    """把 0~1 的明度换算成 HSV 表中的级别"""
+    return min(HSV_LEVELS - 1, max(0, int(round(v * (HSV_LEVELS - 1)))))
+
+
+def hsv_to_rgb(h, s, v):
+    """将 HSV 转为 RGB，输出为 0-255 的整数元组
+    饱和度为 1 时直接查表，其余情况回退到 colorsys
+    """
+    if s == 1.0:
+        return tuple(int(c) for c in HSV_TABLE[int(round(h * HSV_HUES)) % HSV_HUES, value_level(v)])
+    r, g, b = colorsys.hsv_to_rgb(h, s, v)
+    return (int(r * 255), int(g * 255), int(b * 255))
+
+
+@lru_cache(maxsize=256)
+def hex_to_rgb(hex_color, brightness=1.0):
+    """将 #FFFFFF 格式（或 (r,g,b) 元组）转为 (r,g,b) 元组，并应用亮度
+    结果按 (颜色, 亮度) 缓存
+    """
+    if isinstance(hex_color, str):
+        hex_color = hex_color.lstrip('#')
+        rgb = (int(hex_color[0:2], 16), int(hex_color[2:4], 16), int(hex_color[4:6], 16))
+    else:
+        rgb = tuple(hex_color)
+    return tuple(int(c * brightness) for c in rgb)
+
+
+@lru_cache(maxsize=256)
+def wheel_palette(brightness=1.0):
+    """按亮度缩放后的彩虹表 (256, 3) uint8，按亮度缓存
+    返回的数组为只读，调用方不要原地修改
+    """
+    palette = np.clip((WHEEL_TABLE * brightness).astype(np.int64), 0, 255).astype(np.uint8)
+    palette.flags.writeable = False
+    return palette
@@ -0,0 +1,59 @@
+import os
+
+FIRMWARE_VERSION = '1.2.0'
+
+# --- 灯带配置（可通过环境变量覆盖） ---
+# LED 数量
+NUM_PIXELS = int(os.environ.get('LIGHT_NUM_PIXELS', 60))
+# 输出后端：auto / ws281x / spi / blinka / sim / null
+STRIP_BACKEND = os.environ.get('LIGHT_STRIP_BACKEND', 'auto')
+# 数据引脚（board 模块中的引脚名）
+LED_PIN = os.environ.get('LIGHT_LED_PIN', 'D18')
+# 灯珠的颜色字节顺序，WS2812B 为 GRB
+COLOR_ORDER = os.environ.get('LIGHT_COLOR_ORDER', 'GRB')
+
+# --- 分段布局 ---
+# 逗号分隔的 "名称:LED数[@通道号]"，如 "left:300@0,right:300@1"；为空时整条灯带一个分段
+SEGMENTS = os.environ.get('LIGHT_SEGMENTS', '')
+# 分号分隔的输出通道，每个为 "后端 选项=值 ..."，如 "ws281x;spi bus=0;spi bus=1"
+# 为空时只有一个通道，使用 STRIP_BACKEND。rpi_ws281x 只能占用一个 PWM 通道，其余长灯带建议走 SPI
+CHANNELS = os.environ.get('LIGHT_CHANNELS', '')
+
+# --- rpi_ws281x 后端 ---
+LED_GPIO = int(LED_PIN.lstrip('D'))  # BCM 编号，D18 -> 18
+LED_FREQ_HZ = 800000
+LED_DMA = int(os.environ.get('LIGHT_LED_DMA', 10))
+LED_CHANNEL = 1 if LED_GPIO in (13, 19, 41, 45, 53) else 0  # PWM1 引脚使用通道 1
+
+# --- SPI 后端 ---
+SPI_BUS = int(os.environ.get('LIGHT_SPI_BUS', 0))
+SPI_DEVICE = int(os.environ.get('LIGHT_SPI_DEVICE', 0))
+
+# --- 模拟后端 ---
+SIM_HISTORY = int(os.environ.get('LIGHT_SIM_HISTORY', 600))  # 保留的历史帧数
+
+# --- 周期帧缓存（0 表示不启用） ---
+FRAME_CACHE_MB = float(os.environ.get('LIGHT_FRAME_CACHE_MB', 0))
+
+# --- 本地数据目录（持久化的灯光状态、注册绑定缓存等） ---
+DATA_DIR = os.path.expanduser(os.environ.get('LIGHT_DATA_DIR', '~/.lightingsystem'))
+# 注册/绑定状态本地缓存的有效期（秒），有效期内且已绑定时开机直接连接 WebSocket
+STATUS_TTL = float(os.environ.get('LIGHT_STATUS_TTL', 7 * 24 * 3600))
+
+# --- 局域网设备发现 ---
+# 绑定完成后是否继续响应发现请求（供局域网直连控制时查找设备）
+DISCOVERY_AFTER_BIND = os.environ.get('LIGHT_DISCOVERY_AFTER_BIND', '0') == '1'
+
+# --- 局域网直连控制 ---
+# 绑定后在该端口接受局域网内 App 的直连控制（ws://设备IP:端口/local），0 表示不开放
+LOCAL_CONTROL_PORT = int(os.environ.get('LIGHT_LOCAL_PORT', 8899))
+
+# --- 日志 ---
+# 级别：DEBUG / INFO / WARNING / ERROR；DEBUG 以下的日志在调用处直接跳过，不做格式化
+LOG_LEVEL = os.environ.get('LIGHT_LOG_LEVEL', 'INFO').upper()
+# 控制台输出格式：text 或 json（每行一条，便于 journald 之外的采集）
+LOG_FORMAT = os.environ.get('LIGHT_LOG_FORMAT', 'text')
+
+# --- 语音 ---
+# 录音采样率，0 表示与声卡协商（优先用声卡的默认采样率），录到的音频在本机重采样到识别服务的采样率
+VOICE_RATE = int(os.environ.get('LIGHT_VOICE_RATE', 0))
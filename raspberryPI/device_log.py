@@ -0,0 +1,164 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+from collections import deque
+
+import config
+
+ROOT = 'light'
+QUEUE_SIZE = 10000  # 待写出的日志条数上限，写出线程跟不上时丢弃新日志而不是阻塞调用方
+RING_SIZE = 500  # 内存中保留的最近日志条数，供 LOG_DUMP 查询
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """只把日志记录放进队列：不在调用线程格式化消息，积压超过上限时丢弃并计数，从不阻塞
+    SimpleQueue 的 put 可重入，信号处理函数里记日志也不会与被打断的线程争锁
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        if self.queue.qsize() >= QUEUE_SIZE:
+            self.dropped += 1
+            return
+        self.queue.put_nowait(record)
+
+
+def _level_value(level):
+    """级别名（不区分大小写）或数值转为数值，未知的级别抛出 ValueError"""
+    if isinstance(level, int) and not isinstance(level, bool):
+        return level
+    if isinstance(level, str):
+        # getLevelName 对未知名称返回 "Level xxx" 字符串
+        value = logging.getLevelName(level.upper())
+        if isinstance(value, int):
+            return value
+    raise ValueError(f"未知的日志级别: {level!r}")
+
+
+class RingBufferHandler(logging.Handler):
+    """最近的日志事件，保存为结构化的字典"""
+
+    def __init__(self, size=RING_SIZE):
+        super().__init__()
+        self.events = deque(maxlen=size)
+
+    def emit(self, record):
+        event = {
+            'ts': round(record.created, 3),
+            'level': record.levelname,
+            'tag': record.name.rpartition('.')[2],
+            'msg': record.getMessage(),
+        }
+        if record.exc_info:
+            event['exc'] = logging.Formatter().formatException(record.exc_info)
+        self.events.append(event)
+
+    def dump(self, level=None, limit=None):
+        """按级别过滤，返回最近 limit 条（旧的在前）
+        参数来自远程请求：级别未知、limit 不是整数或为负数时抛出 ValueError；
+        limit 为 0 时返回空列表，超过缓冲大小时按缓冲大小
+        """
+        threshold = _level_value(level) if level else 0
+        if limit is not None:
+            try:
+                limit = int(limit)
+            except (TypeError, ValueError):
+                raise ValueError(f"limit 不是整数: {limit!r}") from None
+            if limit < 0:
+                raise ValueError(f"limit 不能为负数: {limit}")
+            limit = min(limit, self.events.maxlen)
+        events = [e for e in list(self.events) if _level_value(e['level']) >= threshold]
+        if limit is None:
+            return events
+        return events[-limit:] if limit else []
+
+
+class _TextFormatter(logging.Formatter):
+    def format(self, record):
+        record.tag = record.name.rpartition('.')[2]
+        return super().format(record)
+
+
+class _JsonFormatter(logging.Formatter):
+    def format(self, record):
+        event = {
+            'ts': round(record.created, 3),
+            'level': record.levelname,
+            'tag': record.name.rpartition('.')[2],
+            'msg': record.getMessage(),
+        }
+        if record.exc_info:
+            event['exc'] = self.formatException(record.exc_info)
+        return json.dumps(event, ensure_ascii=False)
+
+
+class _Logging:
+    """日志层：各模块的日志经队列交给后台线程，由它写控制台并存入环形缓冲"""
+
+    def __init__(self, level=config.LOG_LEVEL, fmt=config.LOG_FORMAT):
+        self.queue = queue.SimpleQueue()
+        self.handler = _QueueHandler(self.queue)
+        self.ring = RingBufferHandler()
+
+        console = logging.StreamHandler(sys.stdout)
+        if fmt == 'json':
+            console.setFormatter(_JsonFormatter())
+        else:
+            console.setFormatter(_TextFormatter('%(asctime)s %(levelname)s [%(tag)s] %(message)s'))
+
+        root = logging.getLogger(ROOT)
+        root.setLevel(level)
+        root.addHandler(self.handler)
+        root.propagate = False
+        self.root = root
+
+        self.listener = logging.handlers.QueueListener(self.queue, console, self.ring)
+        self.listener.start()
+        # 正常退出时写完队列中剩余的日志
+        atexit.register(self.listener.stop)
+
+    def stats(self):
+        return {
+            'level': logging.getLevelName(self.root.level),
+            'queued': self.queue.qsize(),
+            'dropped': self.handler.dropped,
+            'buffered': len(self.ring.events),
+        }
+
+
+_logging = None
+_logging_lock = threading.Lock()
+
+
+def _get_logging():
+    global _logging
+    if _logging is None:
+        with _logging_lock:
+            if _logging is None:
+                _logging = _Logging()
+    return _logging
+
+
+def get_logger(tag):
+    """按模块标签获取日志器，如 get_logger('NET')；消息参数用 % 占位，级别关闭时不会格式化"""
+    _get_logging()
+    return logging.getLogger(f"{ROOT}.{tag}")
+
+
+def dump_logs(level=None, limit=None):
+    """最近的日志事件，供 LOG_DUMP 返回"""
+    return _get_logging().ring.dump(level, limit)
+
+
+def log_stats():
+    return _get_logging().stats()
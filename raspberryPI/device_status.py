@@ -0,0 +1,68 @@
+import json
+import os
+import threading
+import time
+
+import config
+from http_session import get_session
+from state_store import atomic_write
+from device_log import get_logger
+
+log = get_logger('STATUS')
+
+
+def fetch_status(api_base, device_id, timeout=5):
+    """一次请求同时取回注册和绑定状态，返回 {'registered', 'bound'}，请求失败时返回 None"""
+    try:
+        resp = get_session().post(
+            f"{api_base}/api/device/check-registered",
+            json={'deviceId': device_id},
+            timeout=timeout
+        )
+        resp.raise_for_status()
+        data = resp.json().get('data', {})
+        log.debug("状态检查响应: %s, 内容: %s", resp.status_code, resp.text)
+        return {'registered': bool(data.get('isRegistered')), 'bound': bool(data.get('isBound'))}
+    except Exception as e:
+        log.error("状态检查失败: %s", e)
+        return None
+
+
+class StatusCache:
+    """注册/绑定状态的本地缓存，超过 ttl 秒或设备 ID 不符时视为没有缓存
+    clock 返回当前的墙上时间（秒），缓存要跨重启比较，不能用单调时钟
+    """
+
+    def __init__(self, path=None, ttl=config.STATUS_TTL, clock=time.time):
+        self.path = path or os.path.join(config.DATA_DIR, 'device_status.json')
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+
+    def load(self, device_id):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                status = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            log.warning("读取状态缓存失败: %s", e)
+            return None
+        if status.get('deviceId') != device_id or self._clock() - status.get('checked', 0) > self.ttl:
+            return None
+        return status
+
+    def save(self, device_id, status):
+        data = json.dumps({**status, 'deviceId': device_id, 'checked': self._clock()})
+        with self._lock:
+            try:
+                atomic_write(self.path, data)
+            except OSError as e:
+                log.warning("保存状态缓存失败: %s", e)
+
+    def clear(self):
+        with self._lock:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
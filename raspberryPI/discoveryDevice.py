@@ -1,52 +1,139 @@
+import json
+import selectors
 import socket
-import uuid
-import time
-import threading
 import struct
+import threading
+import time
+import uuid
+
+import config
+from modes import available_modes
+from strip import get_strip
+from device_log import get_logger
+
+log = get_logger('DISCOVERY')
+
+MULTICAST_GROUP = '224.0.0.114'
+DISCOVERY_PORT = 8888
+REQUEST = b"DISCOVER_DEVICES_REQUEST"
+REPLY_INTERVAL = 0.5  # 同一来源地址两次应答的最小间隔（秒）
+MAX_TRACKED = 256  # 记录的来源地址数上限，超出时清理过期的记录
+
 
 class DeviceDiscovery:
-    def __init__(self, device_name="智能灯光"):
+    """局域网设备发现应答
+    在组播组上监听发现请求，由 selector 驱动，没有请求时线程一直阻塞，不做超时轮询。
+    应答内容启动时生成一次：DISCOVER_DEVICES_RESPONSE|名称|MAC|能力JSON，
+    旧版 App 只解析前三段，能力中包含 LED 数、支持的模式和固件版本。
+    同一来源地址的重复请求在 REPLY_INTERVAL 内只应答一次
+    """
+
+    def __init__(self, device_name="智能灯光", capabilities=None):
         self.device_name = device_name
+        self.capabilities = capabilities or {}
         self._running = False
         self._thread = None
+        self._wakeup = None
+        self._lock = threading.Lock()  # 主线程和配网线程都可能启停
+        self._last_reply = {}  # 来源 IP -> 最近应答时间
+
+        self.requests = 0
+        self.replies = 0
+        self.throttled = 0
 
     def get_mac_address(self):
         mac = uuid.getnode()
         return ':'.join(("%012X" % mac)[i:i+2] for i in range(0, 12, 2))
 
-    def _respond_to_discovery(self):
-        multicast_group = '224.0.0.114'
-        server_port = 8888
-        
-        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
-            sock.settimeout(0.2)
-            sock.bind(('', server_port))
-            
-            group = socket.inet_aton(multicast_group)
-            mreq = struct.pack('4sL', group, socket.INADDR_ANY)
-            sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
-            
-            print("树莓派设备发现服务已启动...")
+    def _build_response(self):
+        strip = get_strip()
+        capabilities = {
+            'leds': strip.num_pixels,  # 分段布局下为所有分段之和
+            'segments': [seg.name for seg in strip.layout.segments],
+            'modes': available_modes(),
+            'fw': config.FIRMWARE_VERSION,
+            **self.capabilities,
+        }
+        return '|'.join((
+            "DISCOVER_DEVICES_RESPONSE",
+            self.device_name,
+            self.get_mac_address(),
+            json.dumps(capabilities, ensure_ascii=False, separators=(',', ':')),
+        )).encode()
+
+    def _open_socket(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind(('', DISCOVERY_PORT))
+        mreq = struct.pack('4sL', socket.inet_aton(MULTICAST_GROUP), socket.INADDR_ANY)
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, mreq)
+        sock.setblocking(False)
+        return sock
+
+    def _respond_to_discovery(self, sock, wakeup):
+        response = self._build_response()
+        with selectors.DefaultSelector() as selector, sock, wakeup:
+            selector.register(sock, selectors.EVENT_READ)
+            selector.register(wakeup, selectors.EVENT_READ)
+            log.info("设备发现服务已启动")
             while self._running:
-                try:
-                    data, address = sock.recvfrom(1024)
-                    if data.decode() == "DISCOVER_DEVICES_REQUEST":
-                        response = f"DISCOVER_DEVICES_RESPONSE|{self.device_name}|{self.get_mac_address()}"
-                        sock.sendto(response.encode(), address)
-                        print(f"已响应设备发现请求来自: {address}")
-                except socket.timeout:
-                    continue
-                except Exception as e:
-                    print(f"设备发现服务错误: {e}")
-                    break
+                for key, _ in selector.select():
+                    if key.fileobj is wakeup:
+                        return
+                    self._handle_requests(sock, response)
+
+    def _handle_requests(self, sock, response):
+        """读完当前排队的全部数据报"""
+        while True:
+            try:
+                data, address = sock.recvfrom(1024)
+            except BlockingIOError:
+                return
+            except OSError as e:
+                log.warning("设备发现服务错误: %s", e)
+                return
+            if data != REQUEST:
+                continue
+            self.requests += 1
+            now = time.monotonic()
+            if now - self._last_reply.get(address[0], -REPLY_INTERVAL) < REPLY_INTERVAL:
+                self.throttled += 1
+                continue
+            if len(self._last_reply) >= MAX_TRACKED:
+                self._last_reply = {ip: t for ip, t in self._last_reply.items() if now - t < REPLY_INTERVAL}
+            self._last_reply[address[0]] = now
+            try:
+                sock.sendto(response, address)
+            except OSError as e:
+                log.warning("设备发现应答失败 %s: %s", address, e)
+                continue
+            self.replies += 1
+            log.debug("已响应设备发现请求来自: %s", address)
 
     def start(self):
-        if not self._running:
+        with self._lock:
+            if self._running:
+                return
+            try:
+                sock = self._open_socket()
+            except OSError as e:
+                log.error("设备发现服务启动失败: %s", e)
+                return
             self._running = True
-            self._thread = threading.Thread(target=self._respond_to_discovery, daemon=True)
+            self._wakeup, wakeup = socket.socketpair()
+            self._thread = threading.Thread(target=self._respond_to_discovery, args=(sock, wakeup),
+                                            name='discovery', daemon=True)
             self._thread.start()
 
     def stop(self):
-        self._running = False
-        if self._thread:
+        with self._lock:
+            if not self._running:
+                return
+            self._running = False
+            self._wakeup.send(b'\0')
             self._thread.join(timeout=1)
+            self._wakeup.close()
+
+    def stats(self):
+        return {'running': self._running, 'requests': self.requests,
+                'replies': self.replies, 'throttled': self.throttled}
@@ -0,0 +1,47 @@
+from frame_clock import FrameClock, TARGET_FPS
+from strip import get_strip
+from device_log import get_logger
+
+log = get_logger('MODE')
+
+
+class Effect:
+    """灯光效果基类
+    构造时完成与帧无关的准备工作，render() 只负责把一帧画进 frame，
+    update() 在不重置动画的前提下修改参数。
+    效果本身不持有线程和灯带，由渲染线程按帧调用，模式切换只是换一个效果对象
+    """
+
+    fps = TARGET_FPS  # 效果期望的帧率，渲染线程据此调度
+    static = False  # 为 True 时画面在参数变化前不会再变，渲染线程画完当前帧后空闲
+
+    def __init__(self, num_pixels):
+        self.num_pixels = num_pixels
+
+    def update(self, **params):
+        """原地修改参数，保留相位、步数等运行状态，下一帧生效
+        返回 False 表示该效果不支持热更新，渲染线程会用新参数重新创建效果
+        """
+        return False
+
+    def render(self, frame, t, dt):
+        """把时刻 t 的画面写入 frame（(num_pixels, 3) uint8）
+        返回 False 表示画面与上一帧相同、frame 未写入，本帧不必输出
+        """
+        raise NotImplementedError
+
+
+def run_effect(stop_event, effect, strip=None):
+    """在当前线程逐帧运行一个效果直到 stop_event 被置位（单独调试效果时使用）"""
+    strip = strip or get_strip()
+    clock = FrameClock(effect.fps)
+    try:
+        for t, dt in clock.frames(stop_event):
+            if effect.render(strip.frame, t, dt):
+                strip.show()
+            clock.static = effect.static
+    except KeyboardInterrupt:
+        log.info("退出中，关闭灯光...")
+    finally:
+        strip.blank()
+
@@ -0,0 +1,217 @@
+"""设备协议的机群压力模拟
+
+在一个进程里用 asyncio 同时运行成千上万个模拟设备，每个设备都是真实的 DeviceNetwork
+（INITIAL_STATUS、HEARTBEAT、MODE_UPDATE/ACK、合并、重连逻辑都走原来的代码），
+灯带使用 null 后端，所有设备共用一个渲染线程。对端是同进程内的替身服务器，
+行为与 Node 服务器的设备通道一致：收到 INITIAL_STATUS 后下发 BIND_STATUS，统计心跳，
+按给定速率随机向设备下发 MODE_UPDATE 并记录到收到 ACK 的延迟。
+
+统计：连接速率、心跳吞吐、命令到 ACK 的延迟分位数、每个模拟设备的内存（RSS 增量，
+包含替身服务器一侧的连接开销，作为上限参考）。
+
+用法：
+    python fleet_sim.py --devices 2000 --ramp 500 --rate 200 --duration 20 --heartbeat 5
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+
+# 模拟设备不驱动硬件、不写真实的数据目录、不开放局域网控制端口，须在导入设备模块之前设置
+os.environ.setdefault('LIGHT_STRIP_BACKEND', 'null')
+os.environ.setdefault('LIGHT_DATA_DIR', tempfile.mkdtemp(prefix='fleet_sim_'))
+os.environ['LIGHT_LOCAL_PORT'] = '0'
+os.environ.setdefault('LIGHT_LOG_LEVEL', 'WARNING')  # 成千上万个设备的日志会淹没统计输出
+
+import numpy as np
+from websockets.asyncio.server import serve
+
+import network
+from network import DeviceNetwork
+from device_log import ROOT
+
+
+def rss_kb():
+    """当前进程的常驻内存（KB）"""
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+    return 0
+
+
+def fake_mac(index):
+    return ':'.join(f"{b:02X}" for b in (0x02, 0x00) + tuple(index.to_bytes(4, 'big')))
+
+
+def raise_fd_limit():
+    """每个模拟设备占用客户端和服务器两个套接字"""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    return hard
+
+
+class StandInServer:
+    """替身服务器：只实现设备 WebSocket 通道，记录协议层面的统计"""
+
+    def __init__(self):
+        self.clients = {}  # 设备 ID -> 连接
+        self.connect_times = []  # 收到 INITIAL_STATUS 的时刻
+        self.heartbeats = 0
+        self.commands_sent = 0
+        self.latencies = []  # 命令下发到收到 ACK（秒）
+        self.failed_acks = 0
+        self._sent = {}  # 设备 ID -> 未答复命令的下发时刻
+
+    async def handler(self, ws):
+        device_id = ws.request.path.partition('deviceId=')[2]
+        self.clients[device_id] = ws
+        try:
+            async for message in ws:
+                msg = json.loads(message)
+                kind = msg.get('type')
+                if kind == 'INITIAL_STATUS':
+                    self.connect_times.append(time.monotonic())
+                    await ws.send(json.dumps({'type': 'BIND_STATUS', 'data': {'isBound': True}}))
+                elif kind == 'HEARTBEAT':
+                    self.heartbeats += 1
+                elif kind == 'MODE_UPDATE_ACK':
+                    sent = self._sent.pop(device_id, None)
+                    if sent is not None:
+                        self.latencies.append(time.monotonic() - sent)
+                    if not msg.get('data', {}).get('success'):
+                        self.failed_acks += 1
+        finally:
+            self.clients.pop(device_id, None)
+            self._sent.pop(device_id, None)
+
+    async def command_loop(self, rate, duration):
+        """按 rate 条/秒随机挑选在线且没有未答复命令的设备下发 MODE_UPDATE"""
+        interval = 1.0 / rate
+        deadline = time.monotonic() + duration
+        next_send = time.monotonic()
+        while time.monotonic() < deadline:
+            idle = [device_id for device_id in random.sample(list(self.clients), min(8, len(self.clients)))
+                    if device_id not in self._sent]
+            if idle:
+                device_id = idle[0]
+                self._sent[device_id] = time.monotonic()
+                self.commands_sent += 1
+                color = f"#{random.randrange(0x1000000):06X}"
+                await self.clients[device_id].send(json.dumps({
+                    'type': 'MODE_UPDATE',
+                    'data': {'mode': 'solid', 'params': {'color': color, 'brightness': 1.0}}
+                }))
+            next_send += interval
+            await asyncio.sleep(max(0.0, next_send - time.monotonic()))
+
+
+async def simulate(args):
+    server = StandInServer()
+    async with serve(server.handler, '127.0.0.1', 0, compression=None) as ws_server:
+        port = ws_server.sockets[0].getsockname()[1]
+        url = f"ws://127.0.0.1:{port}"
+        base_rss = rss_kb()
+
+        # 1. 按 ramp 速率逐个启动设备，直到全部上报 INITIAL_STATUS
+        devices, tasks = [], []
+        started = time.monotonic()
+        for i in range(args.devices):
+            net = DeviceNetwork(url)
+            net.device_id = fake_mac(i)
+            devices.append(net)
+            tasks.append(asyncio.create_task(net._run()))
+            if args.ramp:
+                await asyncio.sleep(max(0.0, started + (i + 1) / args.ramp - time.monotonic()))
+        deadline = time.monotonic() + args.connect_timeout
+        while len(server.connect_times) < args.devices and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        connected = len(server.connect_times)
+        connect_elapsed = (max(server.connect_times) - started) if connected else None
+        connected_rss = rss_kb()
+
+        # 2. 稳态：心跳照常发送，同时按速率下发命令
+        heartbeats_before = server.heartbeats
+        steady_started = time.monotonic()
+        await server.command_loop(args.rate, args.duration)
+        await asyncio.sleep(0.5)  # 等最后几条 ACK
+        steady_elapsed = time.monotonic() - steady_started
+        heartbeats = server.heartbeats - heartbeats_before
+
+        for net in devices:
+            net.close()
+        await asyncio.wait(tasks, timeout=10)
+
+    latencies = np.array(server.latencies) * 1000
+    p50, p90, p99, top = np.percentile(latencies, (50, 90, 99, 100)) if len(latencies) else [None] * 4
+    return {
+        'devices': args.devices,
+        'connected': connected,
+        'connect_s': None if connect_elapsed is None else round(connect_elapsed, 2),
+        'connect_rate': None if not connect_elapsed else round(connected / connect_elapsed, 1),
+        'heartbeat_rate': round(heartbeats / steady_elapsed, 1),
+        'commands': server.commands_sent,
+        'acks': len(latencies),
+        'failed_acks': server.failed_acks,
+        'ack_ms': {name: None if value is None else round(float(value), 2)
+                   for name, value in zip(('p50', 'p90', 'p99', 'max'), (p50, p90, p99, top))},
+        'rss_mb': round(connected_rss / 1024, 1),
+        'kb_per_device': round((connected_rss - base_rss) / max(connected, 1), 1),
+    }
+
+
+def positive_int(text):
+    value = int(text)
+    if value <= 0:
+        raise argparse.ArgumentTypeError(f"须为正整数: {text}")
+    return value
+
+
+def positive_float(text):
+    value = float(text)
+    if not value > 0:
+        raise argparse.ArgumentTypeError(f"须为正数: {text}")
+    return value
+
+
+def non_negative_float(text):
+    value = float(text)
+    if not value >= 0:
+        raise argparse.ArgumentTypeError(f"须为非负数: {text}")
+    return value
+
+
+def main():
+    parser = argparse.ArgumentParser(description='设备协议机群压力模拟')
+    parser.add_argument('--devices', type=positive_int, default=1000, help='模拟设备数')
+    parser.add_argument('--ramp', type=non_negative_float, default=500, help='每秒启动的设备数，0 为同时启动')
+    parser.add_argument('--rate', type=positive_float, default=100, help='稳态阶段每秒下发的 MODE_UPDATE 数')
+    parser.add_argument('--duration', type=positive_float, default=10, help='稳态阶段时长（秒）')
+    parser.add_argument('--heartbeat', type=positive_float, default=network.HEARTBEAT_INTERVAL, help='心跳间隔（秒）')
+    parser.add_argument('--connect-timeout', type=positive_float, default=60, help='等待全部设备连上的最长时间（秒）')
+    parser.add_argument('--verbose', action='store_true', help='保留模拟设备的日志输出')
+    args = parser.parse_args()
+
+    limit = raise_fd_limit()
+    if args.devices * 2 + 64 > limit:
+        print(f"[SIM] 文件描述符上限 {limit} 不足以支撑 {args.devices} 个设备")
+        return 1
+    network.HEARTBEAT_INTERVAL = args.heartbeat
+
+    print(f"[SIM] 启动 {args.devices} 个模拟设备...")
+    if args.verbose:
+        logging.getLogger(ROOT).setLevel(logging.INFO)
+    result = asyncio.run(simulate(args))
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,117 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+import config
+from device_log import get_logger
+
+log = get_logger('CACHE')
+
+# 单个周期最多缓存的帧数，超过则不缓存（如速度接近 0 时周期趋于无穷）
+MAX_PERIOD_FRAMES = 4096
+
+
+def period_frames(period_seconds, fps):
+    """一个周期对应的帧数；周期无效或过长时返回 None"""
+    if period_seconds <= 0 or period_seconds == float('inf'):
+        return None
+    frames = int(round(period_seconds * fps))
+    if frames < 1 or frames > MAX_PERIOD_FRAMES:
+        return None
+    return frames
+
+
+class FrameCache:
+    """周期性效果的帧缓存
+    对输入严格周期的效果，把一个周期渲染成 (帧数, LED数, 3) 的 uint8 数组后循环回放。
+    以 模式+参数 为键，按 LRU 淘汰并限制总内存；缺失时在后台线程生成，
+    生成期间效果照常实时计算
+    """
+
+    def __init__(self, max_bytes=0):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> np.ndarray
+        self._building = set()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def lookup(self, key, frame_count, num_pixels, render_frame):
+        """查找缓存的周期帧；未命中时安排后台生成并返回 None
+        render_frame(k) 返回周期内第 k 帧 (num_pixels, 3)
+        """
+        if not self.enabled or frame_count is None:
+            return None
+        with self._lock:
+            frames = self._entries.get(key)
+            if frames is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return frames
+            self.misses += 1
+            size = frame_count * num_pixels * 3
+            if key in self._building or size > self.max_bytes:
+                return None
+            self._building.add(key)
+
+        threading.Thread(
+            target=self._build,
+            args=(key, frame_count, num_pixels, render_frame),
+            daemon=True
+        ).start()
+        return None
+
+    def _build(self, key, frame_count, num_pixels, render_frame):
+        try:
+            frames = np.empty((frame_count, num_pixels, 3), dtype=np.uint8)
+            for k in range(frame_count):
+                frames[k] = render_frame(k)
+                time.sleep(0)  # 每帧让出 GIL，不拖慢实时渲染
+            frames.flags.writeable = False
+        except Exception as e:
+            log.error("帧缓存生成失败 %s: %s", key[0], e)
+            with self._lock:
+                self._building.discard(key)
+            return
+
+        with self._lock:
+            self._building.discard(key)
+            self._entries[key] = frames
+            self._bytes += frames.nbytes
+            # 超出内存上限时淘汰最久未使用的周期
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, old = self._entries.popitem(last=False)
+                self._bytes -= old.nbytes
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+_cache = FrameCache(int(config.FRAME_CACHE_MB * 1024 * 1024))
+
+
+def get_frame_cache():
+    """获取全局帧缓存（LIGHT_FRAME_CACHE_MB 为 0 时不启用）"""
+    return _cache
@@ -0,0 +1,100 @@
+import time
+
+# 默认目标帧率
+TARGET_FPS = 60
+
+
+class FrameClock:
+    """固定步长帧时钟
+    以单调时钟为基准按目标帧率调度每一帧，计算和 show() 的耗时不会累积成漂移；
+    同时统计迟到帧（错过截止时间）和丢弃帧（整帧被跳过）
+    """
+
+    def __init__(self, fps=TARGET_FPS, max_lag=0.25):
+        self.fps = fps
+        self.period = 1.0 / fps
+        self.max_lag = max_lag  # 落后超过该秒数时直接重新对齐，避免追帧风暴
+
+        # 效果把 static 置为 True 表示参数变化前画面不会再变，时钟随即停止逐帧调度
+        self.static = False
+
+        self.frame_count = 0
+        self.late_frames = 0
+        self.dropped_frames = 0
+
+        self._start = None
+        self._first = None  # 第一帧的时刻，帧率从这里算起
+        self._last = None
+        self._deadline = None
+
+    def reset(self):
+        """以当前时刻为 t=0 重新开始计时，第一帧在一个周期之后"""
+        now = time.monotonic()
+        self._start = now
+        self._first = None
+        self._last = now
+        self._deadline = now + self.period
+
+    def tick(self, stop_event=None):
+        """等待到下一帧的截止时间，返回 (t, dt)
+        t: 从开始计时到本帧的秒数
+        dt: 距上一帧的秒数
+        """
+        if self._start is None:
+            self.reset()
+
+        now = time.monotonic()
+        delay = self._deadline - now
+        if delay > 0:
+            # 用 stop_event.wait 代替 sleep，停止时可以立即返回
+            if stop_event is not None:
+                stop_event.wait(delay)
+            else:
+                time.sleep(delay)
+            now = time.monotonic()
+        else:
+            lag = -delay
+            self.late_frames += 1
+            if lag > self.max_lag:
+                # 严重落后（如系统挂起），放弃追赶，从当前时刻重新对齐
+                self.dropped_frames += int(lag / self.period)
+                self._deadline = now
+            elif lag >= self.period:
+                # 跳过已经错过的整帧，保持原有的帧相位
+                missed = int(lag / self.period)
+                self.dropped_frames += missed
+                self._deadline += missed * self.period
+
+        self._deadline += self.period
+        self.frame_count += 1
+        if self._first is None:
+            self._first = now
+
+        t = now - self._start
+        dt = now - self._last
+        self._last = now
+        return t, dt
+
+    def frames(self, stop_event):
+        """逐帧迭代 (t, dt)，直到 stop_event 被置位
+        static 为 True 时不再产生新帧，空闲等待到停止
+        """
+        while not stop_event.is_set():
+            if self.static:
+                stop_event.wait()
+                break
+            t, dt = self.tick(stop_event)
+            if stop_event.is_set():
+                break
+            yield t, dt
+
+    def stats(self):
+        """返回帧统计信息"""
+        # N 帧之间只有 N-1 个间隔
+        elapsed = (self._last - self._first) if self._first is not None else 0.0
+        return {
+            'fps': (self.frame_count - 1) / elapsed if elapsed > 0 else 0.0,
+            'frames': self.frame_count,
+            'late': self.late_frames,
+            'dropped': self.dropped_frames,
+        }
@@ -0,0 +1,208 @@
+import heapq
+import struct
+import threading
+import time
+
+import numpy as np
+
+from effect import Effect
+from device_log import get_logger
+
+log = get_logger('STREAM')
+
+# 二进制帧格式（小端）：版本 u8、通道 u8、起始像素 u16、序号 u32、时间戳 i64（发送端微秒，0 表示收到即播），
+# 之后是 RGB 像素数据，每像素 3 字节。一帧可以拆成多个包，同一时间戳的包属于同一帧。
+# 时间戳为 0 的包没有帧的概念：每次取帧时把已收到的全部按序号依次写出，
+# 同一起始像素上被后面的包完整覆盖的包不再写出，记为迟到丢弃
+FRAME_HEADER = struct.Struct('<BBHIq')
+FRAME_VERSION = 1
+
+DEFAULT_LATENCY = 0.05  # 缓冲延迟（秒），用来吸收网络抖动
+DEFAULT_CAPACITY = 16  # 缓冲中最多保留的包数，超出时丢弃最旧的
+CLOCK_RESET = 1.0  # 发送端时间戳倒退超过该秒数时视为重新开始串流
+OFFSET_DRIFT = 1e-5  # 每收到一包允许时钟偏移估计上调的秒数，用来跟踪两端时钟漂移
+
+
+def encode_frame(pixels, seq, timestamp_us=0, channel=0, start=0):
+    """把 (n, 3) 的 uint8 像素编码成一个串流包，供发送端使用"""
+    return FRAME_HEADER.pack(FRAME_VERSION, channel, start, seq & 0xFFFFFFFF, timestamp_us) + \
+        np.ascontiguousarray(pixels, dtype=np.uint8).tobytes()
+
+
+def _seq_before(a, b):
+    """序号 a 是否早于 b（按 u32 回绕比较）"""
+    return a != b and ((a - b) & 0xFFFFFFFF) > 0x7FFFFFFF
+
+
+class FrameStream:
+    """一个串流通道的抖动缓冲
+    网络线程 push() 收到的原始包，渲染线程每帧 pop() 到期的包。
+    播放时刻 = 发送端时间戳 + 时钟偏移 + 缓冲延迟，时钟偏移取观测到的最小值（即最短的网络延迟），
+    同一时刻有多帧到期时只播放最新的一帧，更早的作为迟到帧丢弃；比已播放的帧还旧的包直接丢弃。
+    时间戳为 0 的包收到即播，见包格式的说明
+    """
+
+    def __init__(self, latency=DEFAULT_LATENCY, capacity=DEFAULT_CAPACITY):
+        self.latency = latency
+        self.capacity = capacity
+        self._heap = []  # (时间戳, 序号, 包)
+        self._lock = threading.Lock()
+        self._offset = None  # 本地单调时钟 - 发送端时钟（秒）
+        self._last_seq = None  # 最近播放的序号
+        self._played_ts = None  # 最近播放的时间戳
+        self._last_ts = None  # 最近收到的时间戳
+
+        self.received = 0
+        self.played = 0
+        self.dropped_late = 0
+        self.dropped_overflow = 0
+        self.out_of_order = 0
+        self.malformed = 0
+
+    def push(self, data):
+        """放入一个原始包（bytes），不做拷贝"""
+        if len(data) < FRAME_HEADER.size or (len(data) - FRAME_HEADER.size) % 3:
+            self.malformed += 1
+            return
+        version, _, _, seq, ts = FRAME_HEADER.unpack_from(data)
+        if version != FRAME_VERSION:
+            self.malformed += 1
+            return
+        now = time.monotonic()
+        with self._lock:
+            self.received += 1
+            if self._last_seq is not None and not _seq_before(self._last_seq, seq):
+                if ts and self._played_ts is not None and ts > self._played_ts:
+                    # 序号回到更早但时间戳更新：发送端重新开始了串流
+                    self._reset()
+                else:
+                    self.out_of_order += 1
+                    return
+            if ts:
+                sent = ts / 1e6
+                if self._last_ts is not None and sent < self._last_ts - CLOCK_RESET:
+                    self._reset()
+                self._last_ts = sent
+                offset = now - sent
+                if self._offset is None or offset < self._offset:
+                    self._offset = offset
+                else:
+                    self._offset += OFFSET_DRIFT
+            heapq.heappush(self._heap, (ts, seq, data))
+            if len(self._heap) > self.capacity:
+                heapq.heappop(self._heap)
+                self.dropped_overflow += 1
+
+    def pop(self, now):
+        """取出要写出的包：时间戳为 0 的包在前，之后是已到播放时刻的最新一帧的全部包，
+        各自按序号排列；没有要写出的包时返回空列表
+        """
+        with self._lock:
+            immediate, due = [], []
+            while self._heap:
+                ts, seq, data = self._heap[0]
+                if ts and self._offset is not None and ts / 1e6 + self._offset + self.latency > now:
+                    break
+                heapq.heappop(self._heap)
+                if not ts:
+                    immediate.append((seq, data))
+                    continue
+                if due and due[-1][0] != ts:
+                    # 更新的一帧也已到期，之前的帧不再播放
+                    self.dropped_late += len(due)
+                    due = []
+                due.append((ts, seq, data))
+            if immediate:
+                immediate = self._drop_covered(immediate)
+                self._last_seq = immediate[-1][0]
+            if due:
+                self._played_ts, self._last_seq = due[-1][0], due[-1][1]
+            if immediate or due:
+                self.played += 1
+            return [data for _, data in immediate] + [data for _, _, data in due]
+
+    def _drop_covered(self, packets):
+        """去掉被后面同一起始像素、不短于它的包完整覆盖的包"""
+        kept = []
+        covered = {}  # 起始像素 -> 后面的包覆盖到的最大长度
+        for seq, data in reversed(packets):
+            start = FRAME_HEADER.unpack_from(data)[2]
+            length = len(data) - FRAME_HEADER.size
+            if covered.get(start, -1) >= length:
+                self.dropped_late += 1
+                continue
+            covered[start] = max(covered.get(start, 0), length)
+            kept.append((seq, data))
+        kept.reverse()
+        return kept
+
+    def _reset(self):
+        self._heap.clear()
+        self._offset = None
+        self._last_seq = None
+        self._played_ts = None
+
+    def stats(self):
+        with self._lock:
+            return {
+                'buffered': len(self._heap),
+                'received': self.received,
+                'played': self.played,
+                'dropped_late': self.dropped_late,
+                'dropped_overflow': self.dropped_overflow,
+                'out_of_order': self.out_of_order,
+                'malformed': self.malformed,
+            }
+
+
+_streams = {}
+_streams_lock = threading.Lock()
+
+
+def get_frame_stream(channel=0):
+    """获取指定通道的串流缓冲，首次使用时创建"""
+    stream = _streams.get(channel)
+    if stream is None:
+        with _streams_lock:
+            stream = _streams.setdefault(channel, FrameStream())
+    return stream
+
+
+def dispatch_frame(data):
+    """按包头中的通道号把收到的二进制包交给对应的串流缓冲"""
+    get_frame_stream(data[1] if len(data) > 1 else 0).push(data)
+
+
+def stream_stats():
+    """各串流通道的统计"""
+    return {channel: stream.stats() for channel, stream in list(_streams.items())}
+
+
+class StreamEffect(Effect):
+    """串流模式：播放外部推送的原始 RGB 帧
+    channel: 串流通道号，不同分段可以各自播放一路
+    latency_ms: 抖动缓冲延迟（毫秒）
+    """
+
+    def __init__(self, num_pixels, channel=0, latency_ms=DEFAULT_LATENCY * 1000):
+        super().__init__(num_pixels)
+        log.info("启动串流模式 通道:%s 缓冲:%sms", channel, latency_ms)
+        self.update(channel, latency_ms)
+
+    def update(self, channel=0, latency_ms=DEFAULT_LATENCY * 1000):
+        self.stream = get_frame_stream(int(channel))
+        self.stream.latency = latency_ms / 1000
+        return True
+
+    def render(self, frame, t, dt):
+        packets = self.stream.pop(time.monotonic())
+        for data in packets:
+            start = FRAME_HEADER.unpack_from(data)[2]
+            # 像素数据以 numpy 视图读取收到的 bytes，解析时不拷贝；写入效果自己的缓冲是第一次拷贝，
+            # 渲染线程再把它合成到灯带帧是第二次。包可能只更新部分像素，未更新的像素要沿用上一帧，
+            # 而灯带帧前后缓冲交替使用，所以不能跳过效果缓冲直接写灯带帧
+            pixels = np.frombuffer(data, dtype=np.uint8, offset=FRAME_HEADER.size).reshape(-1, 3)
+            count = min(len(pixels), self.num_pixels - start)
+            if count > 0:
+                frame[start:start + count] = pixels[:count]
+        return bool(packets)
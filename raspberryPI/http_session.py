@@ -0,0 +1,21 @@
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """进程内共享的 HTTP 会话
+    连接池保持 keep-alive，对同一服务器的后续请求复用已建立的 TLS 连接，不再每次重新握手
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=4))
+                _session = session
+    return _session
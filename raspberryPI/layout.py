@@ -0,0 +1,116 @@
+import config
+from strip_backends import create_backend, MultiChannelBackend
+
+
+class Segment:
+    """灯带上的一段连续像素，start/stop 为在整帧中的位置"""
+
+    def __init__(self, name, length, channel=0):
+        self.name = name
+        self.length = length
+        self.channel = channel
+        self.start = 0
+
+    @property
+    def stop(self):
+        return self.start + self.length
+
+    def __repr__(self):
+        return f"Segment({self.name!r}, {self.start}:{self.stop}, channel={self.channel})"
+
+
+class StripLayout:
+    """分段布局
+    所有分段拼成一帧，按通道分组排列，保证每个输出通道的像素在整帧中是连续的一段，
+    后端写出时直接取切片，不需要额外拷贝
+    """
+
+    def __init__(self, segments, channels):
+        if not segments:
+            raise ValueError("灯带布局至少需要一个分段")
+        names = [seg.name for seg in segments]
+        if len(set(names)) != len(names):
+            raise ValueError(f"分段名称重复: {names}")
+        for seg in segments:
+            if not 0 <= seg.channel < len(channels):
+                raise ValueError(f"分段 {seg.name} 的通道 {seg.channel} 不存在（共 {len(channels)} 个通道）")
+
+        # 同一通道内保持声明顺序（即实际的串联顺序）
+        self.segments = sorted(segments, key=lambda seg: seg.channel)
+        offset = 0
+        for seg in self.segments:
+            seg.start = offset
+            offset += seg.length
+        self.num_pixels = offset
+        self.channels = channels  # [(后端名, 选项), ...]
+        self._by_name = {seg.name: seg for seg in self.segments}
+
+    @classmethod
+    def single(cls, num_pixels, backend=config.STRIP_BACKEND):
+        """只有一个分段、一个通道的布局"""
+        return cls([Segment('main', num_pixels)], [(backend, {})])
+
+    def segment(self, name):
+        return self._by_name.get(name)
+
+    def resolve(self, names=None):
+        """分段名列表转为分段对象，None 表示全部分段；有未知名称时抛出 KeyError"""
+        if names is None:
+            return list(self.segments)
+        missing = [name for name in names if name not in self._by_name]
+        if missing:
+            raise KeyError(f"未知分段: {', '.join(map(str, missing))}")
+        return [self._by_name[name] for name in names]
+
+    def channel_ranges(self):
+        """每个通道在整帧中的 (start, stop)"""
+        ranges = []
+        for index in range(len(self.channels)):
+            segs = [seg for seg in self.segments if seg.channel == index]
+            if segs:
+                ranges.append((index, segs[0].start, segs[-1].stop))
+        return ranges
+
+    def create_backend(self):
+        """按通道创建输出后端；多个通道时组合成一个后端"""
+        if len(self.channels) == 1:
+            name, options = self.channels[0]
+            return create_backend(name, self.num_pixels, **options)
+        outputs = []
+        for index, start, stop in self.channel_ranges():
+            name, options = self.channels[index]
+            outputs.append((start, stop, create_backend(name, stop - start, **options)))
+        return MultiChannelBackend(self.num_pixels, outputs)
+
+
+def _parse_value(text):
+    try:
+        return int(text)
+    except ValueError:
+        return text
+
+
+def parse_channels(text, default_backend=config.STRIP_BACKEND):
+    """解析 "ws281x gpio=18;spi bus=1" 形式的通道配置"""
+    channels = []
+    for item in filter(None, (part.strip() for part in text.split(';'))):
+        name, *options = item.split()
+        channels.append((name, {key: _parse_value(value) for key, _, value in (opt.partition('=') for opt in options)}))
+    return channels or [(default_backend, {})]
+
+
+def parse_segments(text):
+    """解析 "left:300@0,right:300@1" 形式的分段配置"""
+    segments = []
+    for item in filter(None, (part.strip() for part in text.split(','))):
+        body, _, channel = item.partition('@')
+        name, _, length = body.partition(':')
+        segments.append(Segment(name, int(length), int(channel or 0)))
+    return segments
+
+
+def load_layout():
+    """按配置生成布局；没有配置分段时整条灯带为一个分段"""
+    channels = parse_channels(config.CHANNELS)
+    segments = parse_segments(config.SEGMENTS) or [Segment('main', config.NUM_PIXELS)]
+    return StripLayout(segments, channels)
@@ -0,0 +1,145 @@
+import asyncio
+import hmac
+import json
+import os
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+from websockets.asyncio.server import serve
+
+import config
+from state_store import atomic_write
+from device_log import get_logger
+
+log = get_logger('LOCAL')
+
+# 局域网内可以直接执行的消息类型，与云端下发的格式相同
+LOCAL_COMMANDS = ('MODE_UPDATE', 'PARAM_UPDATE', 'TELEMETRY_DUMP', 'LOG_DUMP')
+
+
+class LocalControlServer:
+    """局域网直连控制
+    App 与设备在同一局域网时直接连 ws://设备IP:端口/local，不经过云端，断网时也能控制。
+    握手时用绑定时下发的共享密钥鉴权（Authorization: Bearer 密钥，或 ?token=密钥），
+    之后收发的消息与云端 WebSocket 相同，交给 handler(message, reply) 走同一条命令通路，
+    reply(message) 把 ACK 等回复发回这个客户端；二进制串流帧同样支持
+    """
+
+    def __init__(self, handler, port=config.LOCAL_CONTROL_PORT, token_path=None):
+        self.handler = handler
+        self.port = port
+        self.token_path = token_path or os.path.join(config.DATA_DIR, 'local_token')
+        self.token = self._load_token()
+        self._server = None
+
+        self.clients = 0
+        self.rejected = 0
+        self.messages = 0
+
+    def _load_token(self):
+        try:
+            with open(self.token_path, encoding='utf-8') as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            log.warning("读取局域网控制密钥失败: %s", e)
+            return None
+
+    async def set_token(self, token):
+        """保存服务器下发的密钥，之后的连接按新密钥鉴权；第一次拿到密钥时启动监听。
+        token 为空表示绑定已解除：删除密钥并停止监听，已连接的客户端随之断开
+        """
+        if token == self.token:
+            return
+        if not token:
+            await self.revoke()
+            return
+        self.token = token
+        try:
+            atomic_write(self.token_path, token)
+            os.chmod(self.token_path, 0o600)
+        except OSError as e:
+            log.warning("保存局域网控制密钥失败: %s", e)
+        log.info("已更新局域网控制密钥")
+        await self.start()
+
+    async def revoke(self):
+        """删除密钥并停止监听"""
+        had_token, self.token = self.token is not None, None
+        try:
+            os.remove(self.token_path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            log.warning("删除局域网控制密钥失败: %s", e)
+        await self.stop()
+        if had_token:
+            log.info("绑定已解除，局域网控制已关闭")
+
+    async def start(self):
+        """有密钥时开始监听，没有密钥（尚未绑定）时不开放"""
+        if self._server is not None or not self.token or not self.port:
+            return
+        try:
+            self._server = await serve(self._handle, '0.0.0.0', self.port,
+                                       process_request=self._authorize, compression=None)
+        except OSError as e:
+            log.error("局域网控制端口 %s 监听失败: %s", self.port, e)
+            return
+        log.info("局域网控制已启动，端口: %s", self.port)
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    def _authorize(self, connection, request):
+        """握手阶段校验密钥，失败时直接返回 HTTP 错误，不建立连接"""
+        url = urlsplit(request.path)
+        if url.path != '/local':
+            return connection.respond(HTTPStatus.NOT_FOUND, "Not Found\n")
+        auth = request.headers.get('Authorization', '')
+        token = auth[7:] if auth.startswith('Bearer ') else parse_qs(url.query).get('token', [''])[0]
+        if not self.token or not hmac.compare_digest(token.encode(), self.token.encode()):
+            self.rejected += 1
+            log.warning("拒绝未授权的连接: %s", connection.remote_address)
+            return connection.respond(HTTPStatus.UNAUTHORIZED, "Unauthorized\n")
+        return None
+
+    async def _handle(self, ws):
+        self.clients += 1
+        log.info("局域网客户端已连接: %s", ws.remote_address)
+        outbox = asyncio.Queue()
+        sender = asyncio.create_task(self._sender(ws, outbox))
+        try:
+            async for message in ws:
+                self.messages += 1
+                if isinstance(message, bytes):
+                    self.handler(message, outbox.put_nowait)
+                    continue
+                try:
+                    kind = json.loads(message).get('type')
+                except (ValueError, AttributeError):
+                    kind = None
+                if kind not in LOCAL_COMMANDS:
+                    log.warning("不支持的消息类型: %s", kind)
+                    continue
+                self.handler(message, outbox.put_nowait)
+        finally:
+            sender.cancel()
+            log.info("局域网客户端已断开: %s", ws.remote_address)
+
+    async def _sender(self, ws, outbox):
+        while True:
+            await ws.send(json.dumps(await outbox.get()))
+
+    def stats(self):
+        return {
+            'listening': self._server is not None,
+            'port': self.port,
+            'clients': self.clients,
+            'rejected': self.rejected,
+            'messages': self.messages,
+        }
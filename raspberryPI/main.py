@@ -1,32 +1,59 @@
+import sys
 from network import DeviceNetwork
 from registration import DeviceRegistration
 from discoveryDevice import DeviceDiscovery
 from binding import DeviceBinding
-from Light import light
-import time
+from strip import get_strip
+from render_worker import get_render_worker
+from state_store import get_state_store
+from device_status import StatusCache, fetch_status
+import random
+import threading
 import signal
-import sys
-import threading  # 新增导入
-import board  # 新增导入（用于关灯操作）
-import neopixel  # 新增导入（用于关灯操作）
+import config
+from device_log import get_logger
+
+log = get_logger('MAIN')
+
+BIND_POLL_BASE = 10.0  # 没收到绑定推送时第一次轮询的间隔（秒）
+BIND_POLL_CAP = 300.0  # 轮询间隔上限（秒）
 
 class SmartLightDevice:
     def __init__(self, server_url):
+        # 先在主线程打开灯带输出，硬件后端需要root时在这里申请sudo
+        get_strip().open()
+        # 在任何网络请求之前恢复上次的灯光状态，断网时也能立即亮起
+        self.state_store = get_state_store()
+        self._restore_state()
+
         self.server_url = server_url
         self.network = DeviceNetwork(server_url)
         self.registration = DeviceRegistration(server_url)
         self.binding = DeviceBinding(server_url)
-        self.discovery = DeviceDiscovery()
+        # 发现应答中附带局域网控制端口，App 据此直连设备
+        self.discovery = DeviceDiscovery(capabilities={'local': config.LOCAL_CONTROL_PORT})
+        self.network.telemetry.add_source('discovery', self.discovery.stats)
+        self.status_cache = StatusCache()
+        self._bound = threading.Event()
+        self._pairing = False
+        self._pairing_lock = threading.Lock()
+        self.network.subscribe_binding(self._on_bind_status)
         self.device_id = self.network.device_id
         self._setup_signal_handlers()
 
-        self.light_thread = threading.Thread(
-            target=light,
-            kwargs={'color': '#FFFFFF', 'brightness': 1.0},
-            daemon=True
-        )
-        self.light_thread.start()
-        print(f"[INIT] 设备初始化完成，ID: {self.device_id}")
+        log.info("设备初始化完成，ID: %s", self.device_id)
+
+    def _restore_state(self):
+        """恢复本地保存的模式和参数，没有保存过时常亮白光；之后每次变化都写回本地"""
+        renderer = get_render_worker()
+        state = self.state_store.load()
+        if state and renderer.restore(state):
+            modes = [entry['mode'] for entry in state['slots']]
+            log.info("已恢复上次的灯光状态: %s", ', '.join(modes))
+        else:
+            # 由常驻渲染线程统一输出，收到新模式时在下一帧切换
+            renderer.switch_mode('solid', {'color': '#FFFFFF', 'brightness': 1.0})
+        renderer.subscribe(self.state_store.save)
 
     def _setup_signal_handlers(self):
         """设置信号处理程序"""
@@ -35,104 +62,131 @@ class SmartLightDevice:
 
     def _handle_exit(self, signum, frame):
         """处理退出信号"""
-        print(f"\n[SHUTDOWN] 收到终止信号({signum})，执行清理...")
-        self._turn_off_light()
+        log.info("收到终止信号(%s)，执行清理...", signum)
+        # 先把状态写盘并停止保存，退出时的熄灯不应覆盖上次的状态
+        self.state_store.close()
         self.discovery.stop()
         self.network.close()
+        self._turn_off_light()
 
-        # 新增：停止常亮模式线程
-        if hasattr(self, 'light_thread') and self.light_thread.is_alive():
-            self.light_thread.join(timeout=1)  # 等待线程结束
-
-        print("[SHUTDOWN] 清理完成，退出程序")
+        log.info("清理完成，退出程序")
         sys.exit(0)
 
     def _turn_off_light(self):
         """发送关灯命令"""
         try:
-            print("[CLEANUP] 正在关闭灯光...")
-            # 这里需要根据你的实际硬件接口实现关灯逻辑
-#            self.network.light.turn_off()
-            # 示例：通过HTTP请求发送关闭命令
-#            requests.post(
-#                f"{self.server_url}/api/device/command",
-#                json={
-#                    'deviceId': self.device_id,
-#                    'command': 'turn_off'
-#                },
-#                timeout=3
-#            )
-            print("[CLEANUP] 灯光已关闭")
+            log.info("正在关闭灯光...")
+            # 由渲染线程熄灯后退出，避免与正在输出的帧交错
+            get_render_worker().shutdown()
+            log.info("灯光已关闭")
         except Exception as e:
-            print(f"[ERROR] 关闭灯光失败: {str(e)}")
+            log.error("关闭灯光失败: %s", e)
 
     def start(self):
-        print("[START] 启动设备流程...")
+        log.info("启动设备流程...")
 
         try:
-            # 1. 检查注册状态
-            if not self._check_registered():
-                print("[REG] 设备未注册，尝试自动注册...")
-                if not self._register_device():
-                    print("[ERROR] 注册失败，终止启动")
-                    return False
-            print("[REG] 设备注册验证通过")
-
-            # 2. 检查绑定状态
-            if not self._check_binding():
-                print("[BIND] 设备未绑定，启动发现服务...")
+            status = self.status_cache.load(self.device_id)
+            if status and status.get('bound'):
+                # 本地缓存显示已绑定：直接连接 WebSocket，注册绑定状态在后台重新确认
+                log.info("本地缓存显示设备已绑定，直接连接服务器")
+                self._bound.set()
+                threading.Thread(target=self._recheck_status, name='status-check', daemon=True).start()
+            elif not self._check_status():
+                return False
+            if config.DISCOVERY_AFTER_BIND:
                 self.discovery.start()
-                while not self._check_binding():
-                    print("[BIND] 等待绑定完成...")
-                    time.sleep(5)
-                self.discovery.stop()
-                print("[BIND] 设备绑定成功")
-
-            # 3. 主连接循环
-            print("[MAIN] 进入主连接循环")
+
+            # 主连接循环；未绑定时也先连上，绑定完成由服务器推送
+            log.info("进入主连接循环")
             self._main_loop()
             
         except Exception as e:
-            print(f"[FATAL] 发生未捕获异常: {str(e)}")
+            log.critical("发生未捕获异常: %s", e)
             self._handle_exit(signal.SIGTERM, None)
             return False
             
         return True
 
-    def _check_registered(self):
-        print("[CHECK] 检查注册状态...")
-        registered = self.registration.check_registered(self.device_id)
-        print(f"[CHECK] 注册状态结果: {registered}")
-        return registered
+    def _check_status(self):
+        """一次请求取回注册和绑定状态，未注册时先注册，未绑定时在后台等待绑定"""
+        log.info("检查注册与绑定状态...")
+        status = fetch_status(self.registration.api_base, self.device_id) or {'registered': False, 'bound': False}
+        log.info("状态结果: %s", status)
+        if not status['registered']:
+            log.info("设备未注册，尝试自动注册...")
+            if not self._register_device():
+                log.error("注册失败，终止启动")
+                return False
+        log.info("设备注册验证通过")
+
+        if status['bound']:
+            self._bound.set()
+            self.status_cache.save(self.device_id, {'registered': True, 'bound': True})
+        else:
+            self._on_bind_status(False)
+        return True
+
+    def _recheck_status(self):
+        """后台确认缓存的状态；网络暂时不通时保留缓存"""
+        status = fetch_status(self.registration.api_base, self.device_id)
+        if status is None:
+            return
+        if status['registered'] and status['bound']:
+            self.status_cache.save(self.device_id, status)
+        else:
+            log.warning("服务器状态与本地缓存不符: %s", status)
+            self._on_bind_status(False)
+
+    def _on_bind_status(self, bound):
+        """服务器推送或查询得到的绑定状态，可能在网络事件循环中调用，不阻塞"""
+        if bound:
+            self._bound.set()
+            return
+        self._bound.clear()
+        with self._pairing_lock:
+            if self._pairing:
+                return
+            self._pairing = True
+        threading.Thread(target=self._wait_for_binding, name='pairing', daemon=True).start()
+
+    def _wait_for_binding(self):
+        """启动发现服务等待用户绑定；正常由服务器推送绑定完成，
+        推送没有到达（如 WebSocket 连不上）时按指数退避的间隔查询绑定状态兜底
+        """
+        self.status_cache.clear()
+        log.info("设备未绑定，启动发现服务，等待绑定...")
+        self.discovery.start()
+        attempt = 0
+        while not self._bound.wait(min(BIND_POLL_CAP, BIND_POLL_BASE * 2 ** attempt) * random.uniform(0.5, 1.0)):
+            attempt += 1
+            log.info("未收到绑定推送，查询绑定状态...")
+            if self._check_binding():
+                self._bound.set()
+        if not config.DISCOVERY_AFTER_BIND:
+            self.discovery.stop()
+        self.status_cache.save(self.device_id, {'registered': True, 'bound': True})
+        with self._pairing_lock:
+            self._pairing = False
+        log.info("设备绑定成功")
 
     def _register_device(self):
         ip = self.network._get_local_ip()
-        print(f"[REG] 获取本地IP: {ip}")
+        log.info("获取本地IP: %s", ip)
         return self.registration.register_device(self.device_id, ip)
 
     def _check_binding(self):
-        print("[BIND] 检查绑定状态...")
+        log.debug("检查绑定状态...")
         bound = self.binding.check_binding(self.device_id)
-        print(f"[BIND] 绑定状态结果: {bound}")
+        log.debug("绑定状态结果: %s", bound)
         return bound
 
     def _main_loop(self):
-        while True:
-            if not self.network.connect():
-                print("[NET] 连接服务器失败，5秒后重试...")
-                time.sleep(5)
-                continue
-                
-            try:
-                print("[NET] 连接成功，保持活跃状态...")
-                while True:
-                    time.sleep(1)
-            except ConnectionError as e:
-                self.network.close()
-                print(f"[NET] 连接异常: {str(e)}，尝试重新连接...")
+        # 网络事件循环在主线程运行，断线重连（带抖动的指数退避）由 network 内部处理
+        self.network.run_forever()
 
 if __name__ == "__main__":
-    print("=== 智能灯设备启动 ===")
+    log.info("=== 智能灯设备启动 ===")
     device = SmartLightDevice("wss://uphengbai77.xyz")
     if not device.start():
-        print("!!! 设备启动失败 !!!")
+        log.error("!!! 设备启动失败 !!!")
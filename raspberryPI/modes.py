@@ -0,0 +1,150 @@
+import importlib
+import threading
+from importlib import metadata
+
+from device_log import get_logger
+
+log = get_logger('MODES')
+
+# 第三方模式通过该入口点分组注册，值为 "模块:效果类"
+ENTRY_POINT_GROUP = 'lightingsystem.modes'
+
+
+class Param:
+    """模式参数描述：默认值 + 可选的换算函数"""
+
+    def __init__(self, default, convert=None):
+        self.default = default
+        self.convert = convert
+
+    def resolve(self, value):
+        return self.convert(value) if self.convert else value
+
+
+class ModeSpec:
+    """灯光模式的注册信息
+    target 为 "模块:效果类" 字符串或入口点对象，第一次使用时才导入，
+    导入后按 cls(num_pixels, **params) 创建效果对象（见 effect.Effect）
+    """
+
+    def __init__(self, name, target, schema=None, description=''):
+        self.name = name
+        self.target = target
+        self.schema = schema
+        self.description = description or name
+        self._func = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        """导入并返回效果类（只导入一次）"""
+        if self._func is None:
+            with self._lock:
+                if self._func is None:
+                    if isinstance(self.target, str):
+                        module_name, _, attr = self.target.partition(':')
+                        self._func = getattr(importlib.import_module(module_name), attr)
+                    elif hasattr(self.target, 'load'):
+                        self._func = self.target.load()  # 入口点
+                    else:
+                        self._func = self.target
+        return self._func
+
+    @property
+    def loaded(self):
+        return self._func is not None
+
+    def resolve_params(self, params):
+        """按参数表补齐默认值并换算；没有参数表时原样透传"""
+        params = params or {}
+        if self.schema is None:
+            return dict(params)
+        return {key: spec.resolve(params.get(key, spec.default)) for key, spec in self.schema.items()}
+
+
+_registry = {}
+_entry_points_loaded = False
+
+
+def register_mode(name, target, schema=None, description=''):
+    """注册一个灯光模式，同名模式会被覆盖"""
+    spec = ModeSpec(name, target, schema, description)
+    _registry[name] = spec
+    return spec
+
+
+def _load_entry_points():
+    """把通过入口点声明的第三方模式登记进来（此时不导入其模块）"""
+    global _entry_points_loaded
+    if _entry_points_loaded:
+        return
+    _entry_points_loaded = True
+    try:
+        eps = metadata.entry_points(group=ENTRY_POINT_GROUP)
+    except Exception as e:
+        log.error("读取模式入口点失败: %s", e)
+        return
+    for ep in eps:
+        if ep.name not in _registry:
+            register_mode(ep.name, ep)
+
+
+def get_mode(name):
+    """按名称查找模式，找不到返回 None"""
+    _load_entry_points()
+    return _registry.get(name)
+
+
+def available_modes():
+    """返回所有已注册的模式名"""
+    _load_entry_points()
+    return list(_registry)
+
+
+# --- 内置模式 ---
+register_mode('rainbow', 'LrainbowMarquee:MarqueeEffect', {
+    'speed': Param(0.5),
+    'tail_length': Param(9, lambda v: v * 20 + 5),  # 换算 tail_length
+}, '彩虹跑马模式')
+
+register_mode('twinkle', 'LstarTwinklingLight:TwinkleEffect', {
+    'color1': Param('#FFFFFF'),
+    'color2': Param('#FFFF00'),
+    'frequency': Param(0.1, lambda v: 1 - v),
+    'speed': Param(0.1),
+    'cycle_time': Param(3),
+}, '星星闪烁模式')
+
+register_mode('wave', 'LWaveLight:WaveEffect', {
+    'color': Param('#FFFFFF'),
+    'wave_speed': Param(0.5),
+    'wave_density': Param(3),
+    'brightness': Param(1.0),
+}, '波动模式')
+
+register_mode('flowing_rainbow', 'LrainbowFlowingLight:FlowingEffect', {
+    'speed': Param(0.5),
+    'tail_length': Param(9, lambda v: v * 600 + 5),  # 换算 tail_length
+    'brightness': Param(1.0),
+}, '彩虹流动模式')
+
+register_mode('breathing_rainbow', 'LrainbowBreathingLight:BreathingEffect', {
+    'cycle_duration': Param(3),
+    'steps': Param(60),
+    'spin_speed': Param(2),
+}, '彩虹呼吸效果')
+
+register_mode('ripple', 'LwaterRippleLamp:RippleEffect', {
+    'color': Param('#FFFFFF'),
+    'speed': Param(0.5),
+    'wave_length': Param(5),
+}, '水波纹效果')
+
+register_mode('solid', 'Light:SolidEffect', {
+    'color': Param('#FFFFFF'),
+    'brightness': Param(1.0),
+}, '常亮模式')
+
+register_mode('stream', 'frame_stream:StreamEffect', {
+    'channel': Param(0),
+    'latency_ms': Param(50),
+}, '串流模式')
@@ -1,81 +1,257 @@
 import json
-import socket
 import uuid
 import time
-import threading
-from websockets.sync.client import connect
+import random
+import asyncio
+from collections import OrderedDict
+from websockets.asyncio.client import connect
 import os
 import sys
-import board
-import neopixel
 
 # 将文件路径添加到系统路径中
 sys.path.append('/home/cxk/code')
 
-# 引入模式代码
-from LrainbowMarquee import rainbowMarquee
-from LstarTwinklingLight import starTwinklingLight
-from LWaveLight import WaveLight
-from LrainbowFlowingLight import rainbowFlowingLight
-from LrainbowBreathingLight import rainbowBreathingLight
-from LwaterRippleLamp import waterRippleLamp
-from Light import light  # 常亮模式
+# 模式注册表，模式代码按需导入
+from render_worker import get_render_worker
+from frame_stream import dispatch_frame, stream_stats
+from telemetry import get_telemetry
+from address_monitor import get_address_monitor
+from local_control import LocalControlServer
+from device_log import get_logger, dump_logs, log_stats
+
+log = get_logger('NET')
+
+HEARTBEAT_INTERVAL = 30  # 心跳间隔（秒）
+RECONNECT_BASE = 1.0  # 重连退避的初始上限（秒）
+RECONNECT_CAP = 60.0  # 重连退避的最大上限（秒）
+STABLE_CONNECTION = 30  # 连接保持超过该秒数才视为稳定，重置退避
+APPLY_TIMEOUT = 1.0  # 等待渲染线程应用命令的最长时间（秒）
+
+
+def reconnect_delay(attempt, base=RECONNECT_BASE, cap=RECONNECT_CAP):
+    """第 attempt 次重连前的等待时间：指数退避 + 全抖动
+    在 [0, min(cap, base*2^attempt)] 内均匀随机，隧道断开后整批设备的重连时间会被打散
+    """
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
 
 class DeviceNetwork:
     def __init__(self, server_url):
         self.server_url = server_url
         self.ws = None
+        self._loop = None
+        self._outbox = None
+        self._stopping = None
+        self._pending_updates = OrderedDict()  # 分段 -> 最新一条未应用的命令及待发的 ACK（回复函数, 类型）
+        self._updates_ready = None
         self._running = False
         self.device_id = self._get_mac_address()
-        self.current_mode_thread = None
-        self.stop_event = threading.Event()
+        self.renderer = get_render_worker()
         self.current_mode = None
+        self.addresses = get_address_monitor()
+        self.addresses.subscribe(self._on_address_change)
+        self.telemetry = get_telemetry()
+        self.telemetry.add_source('commands', self.command_stats)
+        self.telemetry.add_source('streams', stream_stats)
+        self._bind_callbacks = []
+        self.local = LocalControlServer(self._on_local_message)
+        self.telemetry.add_source('local', self.local.stats)
+        self.telemetry.add_source('log', log_stats)
+
+        self.updates_received = 0
+        self.updates_coalesced = 0  # 被更新的命令覆盖、没有应用的条数
+        self.updates_applied = 0
 
     def _get_mac_address(self):
         mac = uuid.getnode()
         return ':'.join(("%012X" % mac)[i:i+2] for i in range(0, 12, 2))
 
-    def connect(self):
-        try:
-            self.ws = connect(f"{self.server_url}/ws?deviceId={self.device_id}")
-            self._running = True
-
-            threading.Thread(target=self._heartbeat_loop, daemon=True).start()
-            threading.Thread(target=self._message_listener, daemon=True).start()
-
-            self.send_initial_status({
-                'mode': 'solid',
-                'ip': self._get_local_ip()
-            })
+    def run_forever(self):
+        """在当前线程运行网络事件循环，断线后自动重连，直到 close()"""
+        asyncio.run(self._run())
 
-            return True
-        except Exception as e:
-            print(f"[ERROR] 连接服务器失败: {e}")
-            return False
+    async def _run(self):
+        # 命令通路和局域网控制不依赖云端连接，断网重连期间照常工作
+        self._loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+        self._updates_ready = asyncio.Event()
+        self._running = True
+        commands = asyncio.create_task(self._command_loop())
+        await self.local.start()
+        try:
+            await self._connection_loop()
+        finally:
+            commands.cancel()
+            await asyncio.gather(commands, return_exceptions=True)
+            await self.local.stop()
 
-    def _message_listener(self):
+    async def _connection_loop(self):
+        attempt = 0
         while self._running:
+            connected_at = None
             try:
-                message = self.ws.recv()
-                self.on_message(message)
+                async with connect(f"{self.server_url}/ws?deviceId={self.device_id}") as ws:
+                    connected_at = time.monotonic()
+                    log.info("连接成功")
+                    await self._serve(ws)
+                log.info("连接已断开")
+            except asyncio.CancelledError:
+                break
             except Exception as e:
-                print(f"[ERROR] 消息接收异常: {e}")
-                self._running = False
+                log.error("连接服务器失败: %s", e)
 
-    def _heartbeat_loop(self):
-        while self._running:
+            if not self._running:
+                break
+            # 连接稳定过一段时间后再断开，说明服务器是好的，从头开始退避
+            if connected_at is not None and time.monotonic() - connected_at > STABLE_CONNECTION:
+                attempt = 0
+            delay = reconnect_delay(attempt)
+            attempt += 1
+            log.info("%.1f 秒后重连（第 %d 次）", delay, attempt)
             try:
-                self.send_heartbeat()
-                time.sleep(30)
-            except Exception as e:
-                print(f"[ERROR] 心跳发送异常: {e}")
-                self._running = False
+                # close() 会立即打断等待
+                await asyncio.wait_for(self._stopping.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _serve(self, ws):
+        """一次连接的生命周期：接收、心跳、发送作为同一事件循环上的任务，任一结束即视为断线"""
+        self._outbox = asyncio.Queue()
+        self.ws = ws
+        # 上报实际运行的模式（可能是开机时从本地恢复的），而不是固定的常亮白光；
+        # 先等渲染线程应用完已排队的命令，避免刚开机时读到还没生效的状态
+        await self._sync_renderer()
+        self.send_initial_status(self._initial_status())
+        tasks = [
+            asyncio.create_task(self._message_listener(ws)),
+            asyncio.create_task(self._heartbeat_loop()),
+            asyncio.create_task(self._sender(ws)),
+        ]
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if not task.cancelled() and task.exception():
+                    log.error("连接任务异常: %s", task.exception())
+        finally:
+            self.ws = None
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _initial_status(self):
+        status = {'segments': self.renderer.segment_modes(), 'ip': self._get_local_ip()}
+        mode, params = self.renderer.current()
+        # 熄灯或刚开机还没有模式时不上报，服务器保留记录的模式，不被 null 覆盖
+        if mode is not None:
+            status.update(mode=mode, params=params)
+        return status
+
+    async def _message_listener(self, ws):
+        # 连接关闭时迭代立即结束，不必等下一次心跳才发现断线
+        async for message in ws:
+            if isinstance(message, bytes):
+                # 串流帧直接交给抖动缓冲，不解析 JSON、不打印日志
+                dispatch_frame(message)
+            else:
+                self.on_message(message)
+
+    async def _heartbeat_loop(self):
+        while True:
+            self.send_heartbeat()
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+
+    def _queue_update(self, data, ack_type='MODE_UPDATE_ACK', reply=None):
+        """合并阶段：同一组分段只保留最新一条，整条灯带的模式命令覆盖所有未应用的命令
+        只带参数的命令（没有 mode）合并进同一组分段上未应用的命令，字段新值覆盖旧值
+        reply 为发回 ACK 的函数，缺省发给云端；云端和局域网的命令在这里一起合并
+        """
+        ack = (reply or self._send_message, ack_type)
+        segments = data.get('segments')
+        key = tuple(segments) if segments else None
+        self.updates_received += 1
+        pending = self._pending_updates.get(key)
+        if not data.get('mode') and pending is not None:
+            pending['data']['params'] = {**pending['data'].get('params', {}), **data.get('params', {})}
+            pending['acks'].add(ack)
+            self.updates_coalesced += 1
+            self._updates_ready.set()
+            return
+        if key is None and data.get('mode'):
+            dropped = list(self._pending_updates.values())
+            self._pending_updates.clear()
+        else:
+            dropped = [pending] if self._pending_updates.pop(key, None) is not None else []
+        self.updates_coalesced += len(dropped)
+        # 被覆盖的命令仍要答复，服务器按消息类型匹配 ACK
+        acks = {ack}.union(*(entry['acks'] for entry in dropped))
+        self._pending_updates[key] = {'data': dict(data), 'acks': acks}
+        self._updates_ready.set()
+
+    async def _command_loop(self):
+        """逐条应用合并后的命令：等渲染线程真正画出上一条，再取下一条
+        等待期间到达的新命令会覆盖旧命令，控制延迟不超过一帧，也不会在灯带上排队
+        """
+        while True:
+            await self._updates_ready.wait()
+            self._updates_ready.clear()
+            while self._pending_updates:
+                _, entry = self._pending_updates.popitem(last=False)
+                success = await self._apply_update(entry['data'])
+                self.updates_applied += 1
+                # 一条 ACK 即可答复同一来源被合并的同类命令
+                for reply, ack_type in sorted(entry['acks'], key=lambda ack: ack[1]):
+                    reply({
+                        'type': ack_type,
+                        'data': {'success': success}
+                    })
+
+    async def _apply_update(self, data):
+        loop = asyncio.get_running_loop()
+        applied = loop.create_future()
+
+        def on_applied(ok):
+            loop.call_soon_threadsafe(lambda: applied.done() or applied.set_result(ok))
+
+        if data.get('mode'):
+            # 与当前模式相同时渲染线程会原地更新参数，不会重启效果
+            if not self.start_mode(data['mode'], data.get('params', {}), data.get('segments'), on_applied):
+                return False
+        else:
+            self.renderer.update_params(data.get('params', {}), data.get('segments'), on_applied)
+        try:
+            return await asyncio.wait_for(applied, APPLY_TIMEOUT)
+        except asyncio.TimeoutError:
+            log.error("渲染线程未在 %s 秒内应用命令 %s", APPLY_TIMEOUT, data.get('mode') or '参数更新')
+            return False
+
+    async def _sync_renderer(self):
+        loop = asyncio.get_running_loop()
+        synced = loop.create_future()
+        self.renderer.sync(lambda ok: loop.call_soon_threadsafe(lambda: synced.done() or synced.set_result(ok)))
+        try:
+            await asyncio.wait_for(synced, APPLY_TIMEOUT)
+        except asyncio.TimeoutError:
+            log.error("渲染线程未在 %s 秒内响应", APPLY_TIMEOUT)
+
+    def command_stats(self):
+        return {
+            'received': self.updates_received,
+            'coalesced': self.updates_coalesced,
+            'applied': self.updates_applied,
+        }
+
+    async def _sender(self, ws):
+        while True:
+            message = await self._outbox.get()
+            await ws.send(json.dumps(message))
+            log.debug("已发送: %s", message)
 
     def send_heartbeat(self):
         ip = self._get_local_ip()
         self._send_message({
             'type': 'HEARTBEAT',
-            'data': {'ip': ip}
+            # 附带精简的性能摘要，详细数据通过 TELEMETRY_DUMP 按需查询
+            'data': {'ip': ip, 'stats': self.telemetry.summary()}
         })
 
     def send_initial_status(self, mode_params):
@@ -85,137 +261,99 @@ class DeviceNetwork:
         })
 
     def _send_message(self, message):
-        if self.ws:
-            print(f"[DEBUG] 准备发送消息: {message}")
-            try:
-                self.ws.send(json.dumps(message))
-                print("[DEBUG] 消息发送成功")
-            except Exception as e:
-                print(f"[ERROR] 消息发送失败: {e}")
+        """把消息放进当前连接的发送队列，可从任意线程调用；未连接时丢弃"""
+        if self.ws is None or self._loop is None:
+            log.warning("未连接，丢弃消息: %s", message.get('type'))
+            return
+        self._loop.call_soon_threadsafe(self._outbox.put_nowait, message)
+
+    def _on_local_message(self, message, reply):
+        if isinstance(message, bytes):
+            dispatch_frame(message)
+        else:
+            self.on_message(message, reply)
 
-    def on_message(self, message):
-        print(f"[DEBUG] 收到服务器消息: {message}")
+    def on_message(self, message, reply=None):
+        """处理一条 JSON 消息；reply 为发回回复的函数，缺省发给云端"""
+        log.debug("收到消息: %s", message)
+        reply = reply or self._send_message
         try:
             msg = json.loads(message)
             if msg.get('type') == 'MODE_UPDATE':
-                mode = msg.get('data', {}).get('mode')
-                params = msg.get('data', {}).get('params', {})
-
-                if mode:
-                    self._stop_current_mode()
-
-                    self.current_mode = mode
-                    self.stop_event.clear()
-
-                    self.current_mode_thread = threading.Thread(
-                        target=self._run_mode,
-                        args=(mode, params),
-                        daemon=True
-                    )
-                    self.current_mode_thread.start()
+                data = msg.get('data', {})
+                # segments 缺省为整条灯带
 
-                    self._send_message({
-                        'type': 'MODE_UPDATE_ACK',
-                        'data': {'success': True}
-                    })
+                if data.get('mode'):
+                    # 交给合并阶段，连续拖动滑块时只应用并答复最新的一条
+                    self._queue_update(data, reply=reply)
+                else:
+                    log.error("未指定模式")
+            elif msg.get('type') == 'TELEMETRY_DUMP':
+                reply({
+                    'type': 'TELEMETRY_DUMP_ACK',
+                    'data': self.telemetry.dump()
+                })
+            elif msg.get('type') == 'LOG_DUMP':
+                # 最近的日志事件，可按级别过滤、限制条数
+                data = msg.get('data') or {}
+                try:
+                    if not isinstance(data, dict):
+                        raise ValueError(f"data 应为对象: {data!r}")
+                    events = dump_logs(data.get('level'), data.get('limit'))
+                except ValueError as e:
+                    reply({'type': 'LOG_DUMP_ACK', 'data': {'success': False, 'error': f"参数无效: {e}"}})
                 else:
-                    print("[ERROR] 未指定模式")
+                    reply({
+                        'type': 'LOG_DUMP_ACK',
+                        'data': {'success': True, 'stats': log_stats(), 'events': events}
+                    })
+            elif msg.get('type') == 'PARAM_UPDATE':
+                # 只修改当前模式的参数，保留动画相位，拖动滑块时使用
+                self._queue_update(msg.get('data', {}), 'PARAM_UPDATE_ACK', reply)
+            elif msg.get('type') == 'BIND_STATUS':
+                # 连接建立时和用户完成绑定时由服务器推送
+                bound = bool(msg.get('data', {}).get('isBound'))
+                # 绑定时生成的局域网控制密钥随绑定状态下发，解绑后不再接受旧密钥
+                token = msg.get('data', {}).get('localToken') if bound else None
+                asyncio.ensure_future(self.local.set_token(token))
+                for callback in list(self._bind_callbacks):
+                    callback(bound)
             else:
-                print(f"[ERROR] 不支持的消息类型: {msg.get('type')}")
+                log.warning("不支持的消息类型: %s", msg.get('type'))
         except Exception as e:
-            print(f"[ERROR] 消息处理异常: {e}")
+            log.exception("消息处理异常: %s", e)
 
-    def _run_mode(self, mode, params={}):
-        try:
-            if mode == 'rainbow':
-                print("[COMMAND] 启动彩虹跑马模式")
-                tail_length = params.get('tail_length', 9) * 20 + 5  # 换算 tail_length
-                rainbowMarquee(
-                    self.stop_event,
-                    speed=params.get('speed', 0.5),
-                    tail_length=tail_length
-                )
-            elif mode == 'twinkle':
-                print("[COMMAND] 启动星星闪烁模式")
-                starTwinklingLight(
-                    self.stop_event,
-                    color1=params.get('color1', '#FFFFFF'),
-                    color2=params.get('color2', '#FFFF00'),
-                    frequency=1 - params.get('frequency', 0.1),
-                    speed=params.get('speed', 0.1),
-                    cycle_time=params.get('cycle_time', 3)
-                )
-            elif mode == 'wave':
-                print("[COMMAND] 启动波动模式")
-                WaveLight(
-                    self.stop_event,
-                    color=params.get('color', '#FFFFFF'),
-                    wave_speed=params.get('wave_speed', 0.5),
-                    wave_density=params.get('wave_density', 3),
-                    brightness=params.get('brightness', 1.0)
-                )
-            elif mode == 'flowing_rainbow':
-                print("[COMMAND] 启动彩虹流动模式")
-                tail_length = params.get('tail_length', 9) * 600 + 5  # 换算 tail_length
-                rainbowFlowingLight(
-                    self.stop_event,
-                    speed=params.get('speed', 0.5),
-                    tail_length=tail_length,
-                    brightness=params.get('brightness', 1.0)
-                )
-            elif mode == 'breathing_rainbow':
-                print("[COMMAND] 启动彩虹呼吸效果")
-                rainbowBreathingLight(
-                    self.stop_event,
-                    cycle_duration=params.get('cycle_duration', 3),
-                    steps=params.get('steps', 60),
-                    spin_speed=params.get('spin_speed', 2)
-                )
-            elif mode == 'ripple':
-                print("[COMMAND] 启动水波纹效果")
-                waterRippleLamp(
-                    self.stop_event,
-                    color=params.get('color', '#FFFFFF'),
-                    speed=params.get('speed', 0.5),
-                    wave_length=params.get('wave_length', 5)
-                )
-            elif mode == 'solid':
-                print("[COMMAND] 启动常亮模式")
-                # 只传递color和brightness，避免重复传递brightness
-                light(
-                    color=params.get('color', '#FFFFFF'),
-                    brightness=params.get('brightness', 1.0)
-                )
-            else:
-                print(f"[ERROR] 未知模式: {mode}")
-        except Exception as e:
-            print(f"[ERROR] 模式执行异常: {e}")
+    def subscribe_binding(self, callback):
+        """收到绑定状态推送时调用 callback(is_bound)，在网络事件循环中执行，不要在回调里阻塞"""
+        self._bind_callbacks.append(callback)
 
-    def _stop_current_mode(self):
-        if self.current_mode_thread and self.current_mode_thread.is_alive():
-            print("[DEBUG] 停止当前模式线程")
-            self.stop_event.set()
-            self.current_mode_thread.join(timeout=2)
-            print("[DEBUG] 当前模式线程已停止")
+    def start_mode(self, mode, params={}, segments=None, on_applied=None):
+        """通知渲染线程把指定分段切换到该模式，在下一帧生效；模式或分段未知时返回 False"""
+        if not self.renderer.switch_mode(mode, params, segments, on_applied):
+            return False
+        self.current_mode = mode
+        return True
 
-        try:
-            pixels = neopixel.NeoPixel(board.D18, 60)
-            pixels.fill((0, 0, 0))
-            pixels.show()
-            print("[DEBUG] 灯带已清空")
-        except Exception as e:
-            print(f"[ERROR] 灯带清空失败: {e}")
+    def _stop_current_mode(self):
+        self.renderer.blank()
+        log.debug("灯带已清空")
 
     def _get_local_ip(self):
-        s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        try:
-            s.connect(('8.8.8.8', 80))
-            return s.getsockname()[0]
-        finally:
-            s.close()
+        """本机地址取自地址监视器的缓存，不再每次建 socket 探测"""
+        return self.addresses.address
+
+    def _on_address_change(self, ip):
+        # DHCP 换了地址时立即上报，不等下一次心跳
+        if self.ws is not None:
+            self.send_heartbeat()
 
     def close(self):
+        """停止重连并断开当前连接，可从任意线程（包括信号处理函数）调用"""
         self._running = False
         self._stop_current_mode()
-        if self.ws:
-            self.ws.close()
+        ws, loop = self.ws, self._loop
+        if loop is None or not loop.is_running():
+            return
+        loop.call_soon_threadsafe(self._stopping.set)
+        if ws is not None:
+            loop.call_soon_threadsafe(lambda: asyncio.ensure_future(ws.close()))
@@ -1,4 +1,8 @@
-import requests
+from http_session import get_session
+from device_log import get_logger
+
+log = get_logger('REG')
+
 
 class DeviceRegistration:
     def __init__(self, api_base):
@@ -7,34 +11,34 @@ class DeviceRegistration:
     def check_registered(self, device_id):
         """检查设备是否已注册（正确解析服务器响应）"""
         try:
-            resp = requests.post(
+            resp = get_session().post(
                 f"{self.api_base}/api/device/check-registered",
                 json={'deviceId': device_id},
                 timeout=5
             )
             resp.raise_for_status()  # 检查HTTP错误
             resp_data = resp.json()
-            print(f"[DEBUG] 注册检查响应: {resp.status_code}, 内容: {resp.text}")
+            log.debug("注册检查响应: %s, 内容: %s", resp.status_code, resp.text)
             return resp_data.get('data', {}).get('isRegistered', False)
         except Exception as e:
-            print(f"[ERROR] 注册检查失败: {str(e)}")
+            log.error("注册检查失败: %s", e)
             return False
 
     def register_device(self, device_id, ip):
         """注册新设备（增加详细日志和错误处理）"""
         try:
-            print(f"[DEBUG] 尝试注册设备: MAC={device_id}, IP={ip}")
-            resp = requests.post(
+            log.debug("尝试注册设备: MAC=%s, IP=%s", device_id, ip)
+            resp = get_session().post(
                 f"{self.api_base}/api/device/piregister",
                 json={'mac': device_id, 'ip': ip},
                 timeout=5
             )
             resp.raise_for_status()
-            print(f"[DEBUG] 注册响应: {resp.status_code}, 内容: {resp.text}")
+            log.debug("注册响应: %s, 内容: %s", resp.status_code, resp.text)
             
             # 验证注册是否真正成功
             resp_data = resp.json()
             return resp_data.get('code', 0) == 200 and 'data' in resp_data
         except Exception as e:
-            print(f"[ERROR] 注册失败: {str(e)}")
+            log.error("注册失败: %s", e)
             return False
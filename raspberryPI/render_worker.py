@@ -0,0 +1,409 @@
+import queue
+import threading
+import time
+
+import numpy as np
+
+from frame_clock import FrameClock
+from modes import get_mode
+from strip import get_strip
+from telemetry import get_telemetry
+from frame_cache import get_frame_cache
+from device_log import get_logger
+
+log = get_logger('RENDER')
+
+# 命令类型
+SWITCH = 'switch'
+PARAMS = 'params'
+BLANK = 'blank'
+SYNC = 'sync'
+SHUTDOWN = 'shutdown'
+
+
+class _Slot:
+    """一个正在运行的效果及其输出位置
+    group 为效果坐标系覆盖的分段（按顺序拼接，效果的像素数为它们之和），
+    targets 为仍由该效果输出的分段。部分分段被别的模式占用后，
+    剩下的分段继续显示共享效果中各自的那一段
+    """
+
+    def __init__(self, spec, params, effect, group, started):
+        self.spec = spec
+        self.params = params
+        self.effect = effect
+        self.group = group
+        self.targets = list(group)
+        self.started = started  # 效果的 t=0（单调时钟）
+        self.buffer = np.zeros((effect.num_pixels, 3), dtype=np.uint8)  # 效果最近一帧的画面
+        self.last_t = None
+        self.last_step = None
+        self.drawn = False
+        self._update_blits()
+
+    def _update_blits(self):
+        # 每个输出分段在 buffer 中的来源区间和在整帧中的目标区间
+        offset = 0
+        self.blits = []
+        for seg in self.group:
+            if seg in self.targets:
+                self.blits.append((seg.start, seg.stop, offset, offset + seg.length))
+            offset += seg.length
+
+    def release(self, segments):
+        """把这些分段交给别的效果，返回是否还有输出的分段"""
+        self.targets = [seg for seg in self.targets if seg not in segments]
+        self._update_blits()
+        return bool(self.targets)
+
+    def render(self, now, clock_fps):
+        """到了效果自己的帧时刻就画一帧，返回画面是否变化"""
+        effect = self.effect
+        t = now - self.started
+        if effect.fps < clock_fps:
+            # 效果帧率低于渲染线程时只在自己的帧边界上画
+            step = int(t * effect.fps)
+            if step == self.last_step:
+                return False
+            self.last_step = step
+        dt = 0.0 if self.last_t is None else t - self.last_t
+        self.last_t = t
+        self.drawn = True
+        return effect.render(self.buffer, t, dt)
+
+    @property
+    def idle(self):
+        return self.drawn and self.effect.static
+
+
+class RenderWorker:
+    """常驻渲染线程
+    进程内只有这一个线程写灯带。切换模式、修改参数、熄灯、退出都以命令形式放进队列，
+    渲染线程在帧边界取出并应用；等待下一帧时命令到达会立即唤醒，切换不必等满一帧，
+    也不再为每次切换创建和 join 线程。
+    灯带按布局分成若干分段，每个分段可以运行独立的模式，也可以几个分段共享一个模式；
+    各效果画在自己的缓冲里，每帧按分段偏移合成到灯带的整帧缓冲。
+    切换延迟 = 命令入队到新画面第一次写出灯带的时间
+    """
+
+    def __init__(self, strip=None):
+        self.strip = strip or get_strip()
+        self.layout = self.strip.layout
+        self._queue = queue.Queue()
+        self._wake = threading.Event()
+        self._thread = None
+
+        self._slots = []
+        self._clock = None
+        self._dirty = False  # 分段归属变化，需要重新合成并输出
+        self._pending = []  # 等待新画面写出的命令：(入队时间, 回调, 是否成功)
+        self._state_changed = False
+        self._listeners = []
+
+        self.mode = None
+        self._queue_depth = 0  # 最近一次取命令前队列中的命令数
+        self.telemetry = get_telemetry()
+        self.telemetry.add_source('render', self.stats)
+        self.telemetry.add_source('strip', self.strip.stats)
+        self.telemetry.add_source('frame_cache', get_frame_cache().stats)
+        self.commands = 0
+        self.hot_updates = 0  # 原地更新参数的次数
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='render', daemon=True)
+            self._thread.start()
+
+    # --- 命令接口（任意线程调用，不阻塞） ---
+
+    def switch_mode(self, mode, params=None, segments=None, on_applied=None):
+        """把指定分段（None 为全部）切换到一个共享的模式；模式或分段未知时返回 False
+        on_applied(ok) 在新画面第一次写出后由渲染线程调用
+        """
+        if get_mode(mode) is None:
+            log.error("未知模式: %s", mode)
+            return False
+        try:
+            self.layout.resolve(segments)
+        except KeyError as e:
+            log.error("%s", e.args[0])
+            return False
+        self._submit(SWITCH, (mode, dict(params or {}), segments), on_applied)
+        return True
+
+    def update_params(self, params, segments=None, on_applied=None):
+        """修改指定分段（None 为全部）上模式的参数，未给出的参数保持不变"""
+        self._submit(PARAMS, (dict(params or {}), segments), on_applied)
+
+    def blank(self, segments=None):
+        """熄灭指定分段（None 为整条灯带）"""
+        self._submit(BLANK, segments)
+
+    def sync(self, on_applied):
+        """队列中之前的命令都应用后调用 on_applied(True)，用于在读取 current() 等状态前等待"""
+        self._submit(SYNC, None, on_applied)
+
+    def shutdown(self, timeout=1.0):
+        """熄灯并结束渲染线程"""
+        self._submit(SHUTDOWN)
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _submit(self, kind, payload=None, on_applied=None):
+        self.start()
+        self._queue.put((kind, payload, time.monotonic(), on_applied))
+        self._wake.set()
+
+    def subscribe(self, callback):
+        """模式、参数或分段归属变化并写出后调用 callback(state)，在渲染线程中执行，不要在回调里阻塞"""
+        self._listeners.append(callback)
+
+    def state(self):
+        """当前各效果的模式、参数和分段（可 JSON 序列化），按创建顺序排列，restore() 按同样顺序重放"""
+        return {'slots': [
+            {
+                'mode': slot.spec.name,
+                'params': slot.params,
+                'group': [seg.name for seg in slot.group],
+                'targets': [seg.name for seg in slot.targets],
+            }
+            for slot in list(self._slots)
+        ]}
+
+    def restore(self, state):
+        """重放 state() 保存的状态，返回是否恢复了至少一个模式"""
+        restored = False
+        owned = set()
+        for entry in state.get('slots', []):
+            if self.switch_mode(entry['mode'], entry.get('params'), entry.get('group')):
+                restored = True
+                owned.update(entry.get('targets') or [])
+        # 之后被熄灭的分段不会因为重放共享模式而重新亮起
+        unowned = [seg.name for seg in self.layout.segments if seg.name not in owned]
+        if restored and unowned:
+            self.blank(unowned)
+        return restored
+
+    def current(self):
+        """最近启动的模式及其参数，没有运行的模式时返回 (None, {})"""
+        slots = list(self._slots)
+        if not slots:
+            return None, {}
+        return slots[-1].spec.name, dict(slots[-1].params)
+
+    def segment_modes(self):
+        """各分段当前运行的模式名"""
+        modes = {seg.name: None for seg in self.layout.segments}
+        for slot in list(self._slots):
+            for seg in slot.targets:
+                modes[seg.name] = slot.spec.name
+        return modes
+
+    # --- 渲染线程 ---
+
+    def _run(self):
+        while True:
+            if not self._dirty and all(slot.idle for slot in self._slots):
+                # 没有需要逐帧刷新的画面，阻塞等待下一条命令
+                if not self._apply(self._queue.get()):
+                    return
+            if not self._drain():
+                return
+            if not self._slots and not self._dirty:
+                # 没有画面要写出，等待中的命令（如没有目标的参数修改）直接回调
+                self._flush_pending()
+                continue
+
+            if not self._fresh():
+                self._clock.tick(self._wake)
+                # 等待期间有新命令，先应用再画这一帧
+                if self._wake.is_set() and not self._drain():
+                    return
+            self._render_frame()
+
+    def _fresh(self):
+        """有刚换上的效果时立即画，不等下一帧"""
+        return self._dirty or any(not slot.drawn for slot in self._slots)
+
+    def _drain(self):
+        """应用队列中已有的全部命令，收到退出命令时返回 False"""
+        self._wake.clear()
+        self._queue_depth = self._queue.qsize()
+        while True:
+            try:
+                command = self._queue.get_nowait()
+            except queue.Empty:
+                return True
+            if not self._apply(command):
+                return False
+
+    def _apply(self, command):
+        kind, payload, enqueued, on_applied = command
+        if kind == SYNC:
+            on_applied(True)
+            return True
+        self.commands += 1
+        ok = True
+        try:
+            if kind == SWITCH:
+                mode, params, segments = payload
+                self._start_effect(get_mode(mode), params, self.layout.resolve(segments))
+            elif kind == PARAMS:
+                params, segments = payload
+                if not self._update_params(params, segments):
+                    log.warning("没有运行中的模式可以修改参数: %s", segments)
+                    ok = False
+            elif kind == BLANK:
+                self._release(self.layout.resolve(payload))
+            elif kind == SHUTDOWN:
+                self._release(self.layout.segments)
+                self.strip.blank()
+                return False
+            self._state_changed = self._state_changed or ok
+        except Exception as e:
+            log.error("渲染命令 %s 执行失败: %s", kind, e)
+            ok = False
+            self._dirty = True  # 照常走一帧，让等待结果的一方拿到回调
+        self._pending.append((enqueued, on_applied, ok))
+        return True
+
+    def _create_slot(self, spec, params, group, started):
+        # 效果类在第一次使用时才导入
+        num_pixels = sum(seg.length for seg in group)
+        effect = spec.load()(num_pixels, **spec.resolve_params(params))
+        return _Slot(spec, params, effect, group, started)
+
+    def _start_effect(self, spec, params, group):
+        for slot in self._slots:
+            if slot.spec is spec and slot.group == group and slot.targets == group:
+                # 同一组分段上的同一个模式只是参数变了，原地更新，不重置动画
+                self._reconfigure(slot, params)
+                return
+        slot = self._create_slot(spec, params, group, time.monotonic())
+        log.info("启动%s", spec.description)
+        self._release(group)
+        self._slots.append(slot)
+        self.mode = spec.name
+        self._update_clock()
+
+    def _update_params(self, params, segments):
+        """返回是否有效果被修改"""
+        targets = None if segments is None else set(self.layout.resolve(segments))
+        updated = False
+        for slot in list(self._slots):
+            if targets is not None and targets.isdisjoint(slot.targets):
+                continue
+            self._reconfigure(slot, {**slot.params, **params})
+            updated = True
+        return updated
+
+    def _reconfigure(self, slot, params):
+        """把新参数交给正在运行的效果，下一帧生效；效果不支持热更新时才重新创建"""
+        if slot.effect.update(**slot.spec.resolve_params(params)):
+            slot.params = params
+            slot.drawn = False  # 静止的效果也要按新参数重画一帧
+            self.hot_updates += 1
+            return
+        new = self._create_slot(slot.spec, params, slot.group, slot.started)
+        new.release([seg for seg in slot.group if seg not in slot.targets])
+        self._slots[self._slots.index(slot)] = new
+        self._update_clock()
+
+    def _release(self, segments):
+        """让这些分段不再由原来的效果输出；没有效果的分段显示为黑"""
+        self._slots = [slot for slot in self._slots if slot.release(segments)]
+        self._dirty = True
+        if not self._slots:
+            self.mode = None
+        self._update_clock()
+
+    def _update_clock(self):
+        # 渲染线程按当前效果中最高的帧率调度
+        fps = max((slot.effect.fps for slot in self._slots), default=None)
+        if fps is None:
+            self._clock = None
+        elif self._clock is None or self._clock.fps != fps:
+            self._clock = FrameClock(fps)
+
+    def _render_frame(self):
+        now = time.monotonic()
+        started = time.perf_counter()
+        show_time = None
+        fps = self._clock.fps if self._clock else 0
+        changed = self._dirty
+        for slot in list(self._slots):
+            try:
+                changed = slot.render(now, fps) or changed
+            except Exception as e:
+                log.error("模式执行异常 %s: %s", slot.spec.name, e)
+                self._release(slot.targets)
+                changed = True
+
+        if changed:
+            if self._slots:
+                # 按分段偏移把各效果的画面合成到整帧
+                frame = self.strip.frame
+                frame[:] = 0
+                for slot in self._slots:
+                    for dst_start, dst_stop, src_start, src_stop in slot.blits:
+                        frame[dst_start:dst_stop] = slot.buffer[src_start:src_stop]
+                composed = time.perf_counter()
+                self.strip.show()
+                show_time = time.perf_counter() - composed
+                compute_time = composed - started
+            else:
+                self.strip.blank()
+        self._dirty = False
+        if show_time is None:
+            compute_time = time.perf_counter() - started
+        self.telemetry.record_frame(now, compute_time, show_time, self._queue_depth)
+        self._flush_pending()
+
+        if self._state_changed:
+            self._state_changed = False
+            state = self.state()
+            for callback in list(self._listeners):
+                try:
+                    callback(state)
+                except Exception as e:
+                    log.error("状态变化回调异常: %s", e)
+
+    def _flush_pending(self):
+        """通知等待的命令已经生效（或失败）"""
+        if not self._pending:
+            return
+        done = time.monotonic()
+        for enqueued, on_applied, ok in self._pending:
+            self.telemetry.switch_latency.append(done - enqueued)
+            if on_applied is not None:
+                on_applied(ok)
+        self._pending.clear()
+
+    def stats(self):
+        latencies = self.telemetry.switch_latency.values()
+        return {
+            'mode': self.mode,
+            'segments': self.segment_modes(),
+            'commands': self.commands,
+            'hot_updates': self.hot_updates,
+            'switches': self.telemetry.switch_latency.count,
+            'last_switch_ms': latencies[-1] * 1000 if len(latencies) else None,
+            'max_switch_ms': latencies.max() * 1000 if len(latencies) else None,
+            'avg_switch_ms': latencies.mean() * 1000 if len(latencies) else None,
+            'clock': self._clock.stats() if self._clock else None,
+        }
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def get_render_worker():
+    """获取全局唯一的渲染线程，首次调用时创建并启动"""
+    global _worker
+    if _worker is None:
+        with _worker_lock:
+            if _worker is None:
+                _worker = RenderWorker()
+                _worker.start()
+    return _worker
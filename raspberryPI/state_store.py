@@ -0,0 +1,152 @@
+import json
+import os
+import threading
+import time
+
+import config
+from device_log import get_logger
+
+log = get_logger('STATE')
+
+STATE_VERSION = 1
+DEBOUNCE = 2.0  # 最后一次变化后等待多久再写盘（秒）
+MAX_DELAY = 10.0  # 持续变化时最迟多久写一次（秒）
+
+
+def atomic_write(path, data):
+    """先写临时文件并 fsync，再 rename 覆盖，断电时文件要么是旧内容要么是新内容"""
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    # rename 本身也要落盘
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class StateStore:
+    """灯光状态的本地持久化
+    save() 只记下最新状态并立即返回，由后台线程在状态稳定 DEBOUNCE 秒后写盘，
+    持续变化（如拖动滑块）时最迟 MAX_DELAY 秒写一次；内容与上次写入相同时不写，减少 SD 卡磨损
+    """
+
+    def __init__(self, path=None, debounce=DEBOUNCE, max_delay=MAX_DELAY):
+        self.path = path or os.path.join(config.DATA_DIR, 'state.json')
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._pending = None
+        self._first_change = None
+        self._due = None
+        self._closed = False
+        self._written = None  # 上一次写入的内容
+        self._thread = None
+
+        self.writes = 0
+        self.skipped = 0
+
+    def load(self):
+        """读取上次保存的状态，没有或损坏时返回 None"""
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = f.read()
+            state = json.loads(data)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            log.warning("读取保存的状态失败: %s", e)
+            return None
+        if state.get('version') != STATE_VERSION:
+            return None
+        self._written = data
+        return state
+
+    def save(self, state):
+        """记下最新状态，稍后由后台线程写盘"""
+        with self._cond:
+            if self._closed:
+                return
+            now = time.monotonic()
+            self._pending = state
+            if self._first_change is None:
+                self._first_change = now
+            self._due = min(now + self.debounce, self._first_change + self.max_delay)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='state-store', daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def flush(self):
+        """立即写出尚未落盘的状态"""
+        with self._cond:
+            state = self._take()
+        if state is not None:
+            self._write(state)
+
+    def close(self):
+        """写出未落盘的状态，之后的 save() 不再生效（关机熄灯不应覆盖用户的场景）"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self.flush()
+
+    def _take(self):
+        state, self._pending = self._pending, None
+        self._first_change = None
+        return state
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._pending is None and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                # 等到状态稳定（或到达最长延迟）
+                while self._pending is not None and not self._closed:
+                    remaining = self._due - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                state = self._take()
+            if state is not None:
+                self._write(state)
+
+    def _write(self, state):
+        data = json.dumps({'version': STATE_VERSION, **state}, ensure_ascii=False, sort_keys=True)
+        with self._write_lock:
+            if data == self._written:
+                self.skipped += 1
+                return
+            try:
+                atomic_write(self.path, data)
+            except OSError as e:
+                log.warning("保存状态失败: %s", e)
+                return
+            self._written = data
+            self.writes += 1
+
+    def stats(self):
+        return {'path': self.path, 'writes': self.writes, 'skipped': self.skipped}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_state_store():
+    """获取全局状态存储"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = StateStore()
+    return _store
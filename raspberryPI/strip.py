@@ -0,0 +1,115 @@
+import threading
+import numpy as np
+
+import config
+from layout import StripLayout, load_layout
+from device_log import get_logger
+
+log = get_logger('STRIP')
+
+
+class LedStrip:
+    """灯带输出服务
+    整个进程中唯一持有灯带驱动的对象。内部预分配前后两块 bytearray 帧缓冲，
+    渲染方通过 frame（零拷贝的 numpy 视图）直接写后缓冲，show() 交换前后缓冲
+    后把整帧交给输出后端一次性写出，渲染过程中不持有任何锁。
+    show() 会与上一次写出的帧比较：完全相同时跳过写出，否则只把变化的像素区间告诉后端
+    """
+
+    def __init__(self, num_pixels=config.NUM_PIXELS, backend=None, layout=None):
+        self.layout = layout or StripLayout.single(num_pixels)
+        if self.layout.num_pixels != num_pixels:
+            raise ValueError(f"布局共 {self.layout.num_pixels} 个像素，与灯带的 {num_pixels} 不一致")
+        self.num_pixels = num_pixels
+        self.backend = backend or self.layout.create_backend()
+
+        self._buffers = [bytearray(num_pixels * 3), bytearray(num_pixels * 3)]
+        self._views = [np.frombuffer(buf, dtype=np.uint8).reshape(num_pixels, 3) for buf in self._buffers]
+        self._back = 0
+        self._blank = np.zeros((num_pixels, 3), dtype=np.uint8)  # 熄灭用的全零帧
+        self._front_valid = False  # 前缓冲是否就是灯带上正在显示的内容
+
+        self.shown_frames = 0
+        self.skipped_frames = 0
+        self.dirty_range = None  # 最近一次写出时变化的像素区间 (start, stop)
+
+        self._opened = False
+        self._write_lock = threading.Lock()  # 只串行化硬件写入，不阻塞渲染
+
+    @property
+    def frame(self):
+        """当前后缓冲的 (num_pixels, 3) RGB 视图，渲染直接写入这里"""
+        return self._views[self._back]
+
+    def open(self):
+        """打开输出后端；硬件后端需要 root 时会在这里申请 sudo，应在主线程尽早调用"""
+        with self._write_lock:
+            if not self._opened:
+                log.info("使用 %s 后端，LED 数量: %s", self.backend.name, self.num_pixels)
+                self.backend.open()
+                self._opened = True
+
+    def fill(self, color):
+        """用同一种颜色填满后缓冲"""
+        self.frame[:] = color
+
+    def show(self):
+        """发布后缓冲并写入灯带；与上一帧相同时跳过，返回是否真正写出"""
+        back = self._back
+        dirty = None
+        if self._front_valid:
+            # bytearray 比较是一次 memcmp，画面不变时代价极小
+            if self._buffers[back] == self._buffers[back ^ 1]:
+                self.skipped_frames += 1
+                return False
+            changed = np.flatnonzero((self._views[back] != self._views[back ^ 1]).any(axis=1))
+            dirty = (int(changed[0]), int(changed[-1]) + 1)
+
+        # 交换前后缓冲：引用切换是原子的，下一帧随即开始写另一块
+        self._back ^= 1
+        self.dirty_range = dirty
+        self._write(self._views[back], dirty)
+        self._front_valid = True
+        self.shown_frames += 1
+        return True
+
+    def blank(self):
+        """熄灭灯带，不占用渲染缓冲"""
+        self._front_valid = False
+        self._write(self._blank)
+
+    def stats(self):
+        return {
+            'backend': self.backend.name,
+            'num_pixels': self.num_pixels,
+            'shown': self.shown_frames,
+            'skipped': self.skipped_frames,
+            'dirty_range': self.dirty_range,
+        }
+
+    def close(self):
+        with self._write_lock:
+            if self._opened:
+                self.backend.close()
+                self._opened = False
+
+    def _write(self, frame, dirty=None):
+        if not self._opened:
+            self.open()
+        with self._write_lock:
+            self.backend.write(frame, dirty)
+
+
+_strip = None
+_strip_lock = threading.Lock()
+
+
+def get_strip():
+    """获取全局唯一的灯带对象，首次调用时按配置的分段布局创建"""
+    global _strip
+    if _strip is None:
+        with _strip_lock:
+            if _strip is None:
+                layout = load_layout()
+                _strip = LedStrip(layout.num_pixels, layout=layout)
+    return _strip
@@ -0,0 +1,307 @@
+import os
+import sys
+import time
+import ctypes
+from collections import deque
+
+import numpy as np
+
+import config
+from device_log import get_logger
+
+log = get_logger('STRIP')
+
+
+def require_root():
+    """驱动 PWM/DMA 需要 root，不是 root 时自动用 sudo 重新执行当前程序"""
+    if os.geteuid() != 0:
+        # exec 之后进程被替换，队列中的日志来不及写出，这里直接输出
+        print("正在自动请求sudo权限...")
+        os.execvp("sudo", ["sudo", sys.executable] + sys.argv)
+
+
+def _channel_order(color_order):
+    """颜色顺序字符串转为通道下标，如 GRB -> (1, 0, 2)"""
+    return tuple('RGB'.index(c) for c in color_order)
+
+
+class StripBackend:
+    """灯带输出后端
+    write() 接收 (num_pixels, 3) 的 RGB uint8 帧，一次写出整条灯带；
+    dirty 为 (start, stop) 时表示只有这段像素相对上一次写出有变化，
+    后端可以只更新这段的编码缓冲，为 None 时整帧更新
+    """
+
+    name = 'base'
+
+    def __init__(self, num_pixels):
+        self.num_pixels = num_pixels
+
+    def open(self):
+        pass
+
+    def write(self, frame, dirty=None):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class Ws281xBackend(StripBackend):
+    """直接调用 rpi_ws281x（PWM + DMA）
+    整帧先向量化打包成 0x00RRGGBB，再一次 memmove 到驱动的 LED 缓冲并渲染
+    """
+
+    name = 'ws281x'
+
+    def __init__(self, num_pixels, gpio=config.LED_GPIO, freq_hz=config.LED_FREQ_HZ,
+                 dma=config.LED_DMA, channel=config.LED_CHANNEL, color_order=config.COLOR_ORDER):
+        super().__init__(num_pixels)
+        self.gpio = gpio
+        self.freq_hz = freq_hz
+        self.dma = dma
+        self.channel_num = channel
+        self.color_order = color_order
+        self._packed = np.zeros(num_pixels, dtype=np.uint32)
+        self._shifted = np.zeros(num_pixels, dtype=np.uint32)
+        self._leds = None
+        self._channel = None
+        self._leds_addr = None
+
+    def open(self):
+        require_root()
+        import _rpi_ws281x as ws
+
+        self._ws = ws
+        self._leds = ws.new_ws2811_t()
+        # 两个通道都先清零，再配置实际使用的通道
+        for num in range(2):
+            chan = ws.ws2811_channel_get(self._leds, num)
+            ws.ws2811_channel_t_count_set(chan, 0)
+            ws.ws2811_channel_t_gpionum_set(chan, 0)
+            ws.ws2811_channel_t_invert_set(chan, 0)
+            ws.ws2811_channel_t_brightness_set(chan, 0)
+
+        self._channel = ws.ws2811_channel_get(self._leds, self.channel_num)
+        ws.ws2811_channel_t_count_set(self._channel, self.num_pixels)
+        ws.ws2811_channel_t_gpionum_set(self._channel, self.gpio)
+        ws.ws2811_channel_t_invert_set(self._channel, 0)
+        ws.ws2811_channel_t_brightness_set(self._channel, 255)
+        ws.ws2811_channel_t_strip_type_set(self._channel, getattr(ws, f'WS2811_STRIP_{self.color_order}'))
+        ws.ws2811_t_freq_set(self._leds, self.freq_hz)
+        ws.ws2811_t_dmanum_set(self._leds, self.dma)
+
+        resp = ws.ws2811_init(self._leds)
+        if resp != 0:
+            raise RuntimeError(f"ws2811_init 失败: {ws.ws2811_get_return_t_str(resp)}")
+
+        # LED 缓冲在 init 之后才分配；SWIG 指针可以转成地址时走 memmove 快速路径
+        try:
+            self._leds_addr = int(ws.ws2811_channel_t_leds_get(self._channel))
+        except (TypeError, ValueError):
+            self._leds_addr = None
+
+    def write(self, frame, dirty=None):
+        ws = self._ws
+        start, stop = dirty or (0, self.num_pixels)
+        # 只打包并拷贝变化的一段，驱动缓冲中其余像素保持上一帧的值
+        frame = frame[start:stop]
+        packed = self._packed[start:stop]
+        shifted = self._shifted[start:stop]
+        # 颜色字节顺序由驱动按 strip_type 处理，这里统一按 RGB 打包
+        np.left_shift(frame[:, 0], 16, out=packed, dtype=np.uint32)
+        np.left_shift(frame[:, 1], 8, out=shifted, dtype=np.uint32)
+        packed |= shifted
+        packed |= frame[:, 2]
+        if self._leds_addr:
+            ctypes.memmove(self._leds_addr + start * 4, packed.ctypes.data, packed.nbytes)
+        else:
+            for i, color in enumerate(packed.tolist(), start):
+                ws.ws2811_led_set(self._channel, i, color)
+        resp = ws.ws2811_render(self._leds)
+        if resp != 0:
+            raise RuntimeError(f"ws2811_render 失败: {ws.ws2811_get_return_t_str(resp)}")
+
+    def close(self):
+        if self._leds is not None:
+            self._ws.ws2811_fini(self._leds)
+            self._ws.delete_ws2811_t(self._leds)
+            self._leds = None
+
+
+class SpiBackend(StripBackend):
+    """通过 SPI MOSI 输出 WS2812 时序
+    SPI 时钟 6.4MHz 时 8 个 SPI 位对应 1 个 WS2812 位：0 -> 11000000，1 -> 11111000，
+    每个数据字节查表展开成 8 个 SPI 字节，帧尾补低电平作为复位信号
+    """
+
+    name = 'spi'
+    SPI_HZ = 6400000
+    RESET_BYTES = 64
+
+    def __init__(self, num_pixels, bus=config.SPI_BUS, device=config.SPI_DEVICE, color_order=config.COLOR_ORDER):
+        super().__init__(num_pixels)
+        self.bus = bus
+        self.device = device
+        self._order = _channel_order(color_order)
+        self._wire = np.zeros((num_pixels, 3), dtype=np.uint8)
+        self._encoded = np.zeros(num_pixels * 3 * 8 + self.RESET_BYTES, dtype=np.uint8)
+        self._encoded_view = self._encoded[:num_pixels * 3 * 8].reshape(num_pixels * 3, 8)
+        self._table = self._build_table()
+        self._spi = None
+
+    @staticmethod
+    def _build_table():
+        bits = (np.arange(256)[:, None] >> np.arange(7, -1, -1)) & 1
+        return np.where(bits == 1, 0b11111000, 0b11000000).astype(np.uint8)
+
+    def open(self):
+        import spidev
+
+        self._spi = spidev.SpiDev()
+        self._spi.open(self.bus, self.device)
+        self._spi.max_speed_hz = self.SPI_HZ
+        self._spi.mode = 0
+
+    def write(self, frame, dirty=None):
+        start, stop = dirty or (0, self.num_pixels)
+        # 只重新编码变化的一段，WS2812 协议本身仍需整条灯带重发
+        wire = self._wire[start:stop]
+        np.take(frame[start:stop], self._order, axis=1, out=wire)
+        np.take(self._table, wire.reshape(-1), axis=0, out=self._encoded_view[start * 3:stop * 3])
+        self._spi.writebytes2(self._encoded)
+
+    def close(self):
+        if self._spi is not None:
+            self._spi.close()
+            self._spi = None
+
+
+class BlinkaBackend(StripBackend):
+    """Adafruit Blinka 的 neopixel_write，整帧一次写出"""
+
+    name = 'blinka'
+
+    def __init__(self, num_pixels, pin=config.LED_PIN, color_order=config.COLOR_ORDER):
+        super().__init__(num_pixels)
+        self.pin_name = pin
+        self._order = _channel_order(color_order)
+        self._wire = bytearray(num_pixels * 3)
+        self._wire_view = np.frombuffer(self._wire, dtype=np.uint8).reshape(num_pixels, 3)
+        self._pin = None
+
+    def open(self):
+        require_root()
+        import board
+        import digitalio
+        from neopixel_write import neopixel_write
+
+        self._pin = digitalio.DigitalInOut(getattr(board, self.pin_name))
+        self._pin.direction = digitalio.Direction.OUTPUT
+        self._neopixel_write = neopixel_write
+
+    def write(self, frame, dirty=None):
+        start, stop = dirty or (0, self.num_pixels)
+        np.take(frame[start:stop], self._order, axis=1, out=self._wire_view[start:stop])
+        self._neopixel_write(self._pin, self._wire)
+
+    def close(self):
+        if self._pin is not None:
+            self._pin.deinit()
+            self._pin = None
+
+
+class SimulatorBackend(StripBackend):
+    """内存模拟灯带：记录最近写出的帧及时间戳，用于离线调试和性能分析"""
+
+    name = 'sim'
+
+    def __init__(self, num_pixels, history=config.SIM_HISTORY):
+        super().__init__(num_pixels)
+        self.frames = deque(maxlen=history)  # (monotonic 时间, (n,3) 帧拷贝)
+        self.dirty_ranges = deque(maxlen=history)
+        self.write_count = 0
+
+    def write(self, frame, dirty=None):
+        self.frames.append((time.monotonic(), frame.copy()))
+        self.dirty_ranges.append(dirty)
+        self.write_count += 1
+
+    @property
+    def last_frame(self):
+        return self.frames[-1][1] if self.frames else None
+
+
+class NullBackend(StripBackend):
+    """丢弃所有输出，只计数"""
+
+    name = 'null'
+
+    def __init__(self, num_pixels):
+        super().__init__(num_pixels)
+        self.write_count = 0
+
+    def write(self, frame, dirty=None):
+        self.write_count += 1
+
+
+class MultiChannelBackend(StripBackend):
+    """把一帧按通道切片分发到多个后端，每个通道对应整帧中连续的一段
+    有变化区间时只写出与之相交的通道，其余通道保持不动
+    """
+
+    name = 'multi'
+
+    def __init__(self, num_pixels, outputs):
+        super().__init__(num_pixels)
+        self.outputs = outputs  # [(start, stop, backend), ...]
+
+    def open(self):
+        for start, stop, backend in self.outputs:
+            log.info("通道 %s: 像素 %s-%s", backend.name, start, stop - 1)
+            backend.open()
+
+    def write(self, frame, dirty=None):
+        lo, hi = dirty or (0, self.num_pixels)
+        for start, stop, backend in self.outputs:
+            if hi <= start or lo >= stop:
+                continue
+            local = None if dirty is None else (max(lo, start) - start, min(hi, stop) - start)
+            backend.write(frame[start:stop], local)
+
+    def close(self):
+        for _, _, backend in self.outputs:
+            backend.close()
+
+
+BACKENDS = {
+    backend.name: backend
+    for backend in (Ws281xBackend, SpiBackend, BlinkaBackend, SimulatorBackend, NullBackend)
+}
+
+
+def _auto_backend_name():
+    """依次尝试 rpi_ws281x、Blinka，都不可用时退回模拟灯带"""
+    try:
+        import _rpi_ws281x  # noqa: F401
+        return 'ws281x'
+    except ImportError:
+        pass
+    try:
+        import board  # noqa: F401
+        import neopixel_write  # noqa: F401
+        return 'blinka'
+    except (ImportError, NotImplementedError):
+        pass
+    return 'sim'
+
+
+def create_backend(name=config.STRIP_BACKEND, num_pixels=config.NUM_PIXELS, **options):
+    """按名称创建后端，name 为 auto 时自动选择"""
+    if name == 'auto':
+        name = _auto_backend_name()
+    try:
+        backend_class = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"未知的灯带后端: {name}（可选: auto, {', '.join(BACKENDS)}）")
+    return backend_class(num_pixels, **options)
@@ -0,0 +1,187 @@
+import threading
+import time
+
+import numpy as np
+
+SAMPLE_INTERVAL = 5.0  # CPU 与温度的采样间隔（秒）
+FPS_WINDOW = 5.0  # 统计帧率的时间窗口（秒）
+THERMAL_PATH = '/sys/class/thermal/thermal_zone0/temp'
+
+
+class RingBuffer:
+    """定长环形缓冲，预分配 float64 数组，写入不分配内存"""
+
+    def __init__(self, size):
+        self._data = np.zeros(size, dtype=np.float64)
+        self._index = 0
+        self.count = 0  # 累计写入次数
+
+    def append(self, value):
+        self._data[self._index] = value
+        self._index = (self._index + 1) % len(self._data)
+        self.count += 1
+
+    def values(self):
+        """按写入顺序返回缓冲中的数据（拷贝）"""
+        if self.count < len(self._data):
+            return self._data[:self.count].copy()
+        return np.roll(self._data, -self._index)
+
+    @property
+    def last(self):
+        return self._data[self._index - 1] if self.count else None
+
+    def percentiles(self, *qs):
+        values = self._data[:min(self.count, len(self._data))]
+        if not len(values):
+            return [None] * len(qs)
+        return [float(v) for v in np.percentile(values, qs)]
+
+
+def _ms(value):
+    return None if value is None else round(value * 1000, 2)
+
+
+def read_cpu_times(path='/proc/stat'):
+    """返回 (总时间, 空闲时间)，单位为 jiffies"""
+    with open(path) as f:
+        fields = [int(v) for v in f.readline().split()[1:]]
+    idle = fields[3] + (fields[4] if len(fields) > 4 else 0)  # idle + iowait
+    return sum(fields), idle
+
+
+def read_soc_temperature(path=THERMAL_PATH):
+    """SoC 温度（摄氏度），读不到时返回 None"""
+    try:
+        with open(path) as f:
+            return int(f.read().strip()) / 1000
+    except (OSError, ValueError):
+        return None
+
+
+class Telemetry:
+    """设备性能指标
+    渲染线程每帧写入计算耗时、show() 耗时、命令队列深度，切换模式时写入切换延迟；
+    后台线程定期采样 CPU 占用和 SoC 温度。所有指标保存在定长环形缓冲中，
+    summary() 给心跳附带的精简摘要，dump() 给按需查询的详细数据
+    """
+
+    def __init__(self, size=600, system_size=120):
+        self.frame_times = RingBuffer(size)  # 效果计算 + 合成耗时（秒）
+        self.show_times = RingBuffer(size)  # strip.show() 耗时（秒）
+        self.frame_stamps = RingBuffer(size)  # 每帧的单调时钟时刻，用于算帧率
+        self.switch_latency = RingBuffer(100)  # 命令入队到画面写出（秒）
+        self.queue_depth = RingBuffer(size)  # 每帧开始时渲染命令队列中的命令数
+        self.cpu_load = RingBuffer(system_size)  # 0~100
+        self.soc_temp = RingBuffer(system_size)  # 摄氏度
+
+        self._cpu_last = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._sources = {}
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._sample_loop, name='telemetry', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def add_source(self, name, stats):
+        """登记一个详细数据来源，dump() 时调用 stats() 取其当前统计"""
+        self._sources[name] = stats
+
+    def record_frame(self, stamp, compute, show=None, queue_depth=0):
+        self.frame_stamps.append(stamp)
+        self.frame_times.append(compute)
+        if show is not None:
+            self.show_times.append(show)
+        self.queue_depth.append(queue_depth)
+
+    def sample_system(self):
+        try:
+            total, idle = read_cpu_times()
+        except OSError:
+            total = idle = None
+        if total is not None and self._cpu_last is not None:
+            d_total = total - self._cpu_last[0]
+            if d_total > 0:
+                self.cpu_load.append(100.0 * (1 - (idle - self._cpu_last[1]) / d_total))
+        if total is not None:
+            self._cpu_last = (total, idle)
+        temperature = read_soc_temperature()
+        if temperature is not None:
+            self.soc_temp.append(temperature)
+
+    def _sample_loop(self):
+        self.sample_system()
+        while not self._stop.wait(SAMPLE_INTERVAL):
+            self.sample_system()
+
+    def fps(self, window=FPS_WINDOW, now=None):
+        """最近 window 秒内实际写出的帧率"""
+        now = time.monotonic() if now is None else now
+        stamps = self.frame_stamps.values()
+        return len(stamps[stamps > now - window]) / window
+
+    def summary(self):
+        """心跳附带的精简摘要，毫秒取两位小数"""
+        frame_p50, frame_p99 = self.frame_times.percentiles(50, 99)
+        show_p50, show_p99 = self.show_times.percentiles(50, 99)
+        switch_p50, = self.switch_latency.percentiles(50)
+        queue_max = self.queue_depth.values().max() if self.queue_depth.count else 0
+        return {
+            'fps': round(self.fps(), 1),
+            'frame_ms': [_ms(frame_p50), _ms(frame_p99)],
+            'show_ms': [_ms(show_p50), _ms(show_p99)],
+            'switch_ms': _ms(switch_p50),
+            'queue_max': int(queue_max),
+            'cpu': None if self.cpu_load.last is None else round(self.cpu_load.last, 1),
+            'temp': self.soc_temp.last,
+        }
+
+    def dump(self):
+        """按需查询的详细数据：各指标的分位数和近期序列，以及登记来源的统计"""
+        def describe(ring, scale=1.0):
+            p50, p90, p99, top = ring.percentiles(50, 90, 99, 100)
+            return {
+                'count': ring.count,
+                'p50': None if p50 is None else round(p50 * scale, 3),
+                'p90': None if p90 is None else round(p90 * scale, 3),
+                'p99': None if p99 is None else round(p99 * scale, 3),
+                'max': None if top is None else round(top * scale, 3),
+            }
+
+        detail = {
+            'fps': round(self.fps(), 2),
+            'frame_ms': describe(self.frame_times, 1000),
+            'show_ms': describe(self.show_times, 1000),
+            'switch_ms': describe(self.switch_latency, 1000),
+            'queue_depth': describe(self.queue_depth),
+            'cpu': describe(self.cpu_load),
+            'temp': describe(self.soc_temp),
+            'cpu_history': [round(v, 1) for v in self.cpu_load.values().tolist()],
+            'temp_history': [round(v, 1) for v in self.soc_temp.values().tolist()],
+        }
+        for name, stats in self._sources.items():
+            try:
+                detail[name] = stats()
+            except Exception as e:
+                detail[name] = {'error': str(e)}
+        return detail
+
+
+_telemetry = None
+_telemetry_lock = threading.Lock()
+
+
+def get_telemetry():
+    """获取全局性能指标，首次调用时开始采样 CPU 与温度"""
+    global _telemetry
+    if _telemetry is None:
+        with _telemetry_lock:
+            if _telemetry is None:
+                _telemetry = Telemetry()
+                _telemetry.start()
+    return _telemetry
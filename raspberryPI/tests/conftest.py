@@ -0,0 +1,12 @@
+import os
+import sys
+import tempfile
+
+# 测试不驱动硬件、不写真实的数据目录、不开放局域网控制端口，须在导入设备模块之前设置
+os.environ.setdefault('LIGHT_STRIP_BACKEND', 'null')
+os.environ.setdefault('LIGHT_DATA_DIR', tempfile.mkdtemp(prefix='light_test_'))
+os.environ['LIGHT_LOCAL_PORT'] = '0'
+os.environ.setdefault('LIGHT_LOG_LEVEL', 'WARNING')
+
+# 设备代码是平铺在 raspberryPI/ 下的模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,53 @@
+import selectors
+import time
+
+import address_monitor
+from address_monitor import AddressMonitor
+
+
+class CountingSelector(selectors.DefaultSelector):
+    calls = []
+
+    def select(self, timeout=None):
+        CountingSelector.calls.append(timeout)
+        return super().select(timeout)
+
+
+def test_netlink_thread_blocks_until_stopped(monkeypatch):
+    CountingSelector.calls = []
+    monkeypatch.setattr(address_monitor.selectors, 'DefaultSelector', CountingSelector)
+    reads = []
+    monkeypatch.setattr(address_monitor, 'read_address', lambda: reads.append(1) or '192.0.2.1')
+
+    monitor = AddressMonitor()
+    monitor.start()
+    time.sleep(1.5)
+    assert monitor.source == 'netlink'
+    # 没有网络变化时只进入一次不带超时的等待，不会定期醒来
+    assert CountingSelector.calls == [None]
+    assert len(reads) == 1
+
+    started = time.monotonic()
+    monitor.stop()
+    monitor._thread.join(1.0)
+    assert not monitor._thread.is_alive()
+    assert time.monotonic() - started < 0.5
+
+
+def test_falls_back_to_polling_without_netlink(monkeypatch):
+    real_socket = address_monitor.socket.socket
+
+    def no_netlink(family=-1, *args, **kwargs):
+        if family == address_monitor.socket.AF_NETLINK:
+            raise OSError('netlink disabled')
+        return real_socket(family, *args, **kwargs)
+
+    monkeypatch.setattr(address_monitor.socket, 'socket', no_netlink)
+    monkeypatch.setattr(address_monitor, 'read_address', lambda: '192.0.2.1')
+    monitor = AddressMonitor(poll_interval=0.05)
+    monitor.start()
+    time.sleep(0.2)
+    assert monitor.source == 'poll'
+    monitor.stop()
+    monitor._thread.join(1.0)
+    assert not monitor._thread.is_alive()
@@ -0,0 +1,77 @@
+import asyncio
+import json
+import threading
+import time
+
+from device_status import StatusCache
+from main import SmartLightDevice
+from network import DeviceNetwork
+
+
+class FakeDiscovery:
+    def __init__(self):
+        self.started = 0
+        self.stopped = 0
+
+    def start(self):
+        self.started += 1
+
+    def stop(self):
+        self.stopped += 1
+
+
+def pairing_device(tmp_path):
+    """只带配网流程所需属性的设备，不打开灯带也不连网"""
+    device = SmartLightDevice.__new__(SmartLightDevice)
+    device.device_id = 'dev-1'
+    device.discovery = FakeDiscovery()
+    device.status_cache = StatusCache(str(tmp_path / 'status.json'))
+    device._bound = threading.Event()
+    device._pairing = False
+    device._pairing_lock = threading.Lock()
+    device.polls = 0
+
+    def check_binding():
+        device.polls += 1
+        return False
+
+    device._check_binding = check_binding
+    return device
+
+
+def wait_until(predicate, timeout=1.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_bind_status_push_reaches_subscribers():
+    net = DeviceNetwork('ws://127.0.0.1:9')
+    received = []
+    net.subscribe_binding(received.append)
+
+
+    async def push():
+        # 消息处理在网络事件循环中执行
+        net.on_message(json.dumps({'type': 'BIND_STATUS', 'data': {'isBound': False}}))
+        net.on_message(json.dumps({'type': 'BIND_STATUS', 'data': {'isBound': True}}))
+        await asyncio.sleep(0)
+
+    asyncio.run(push())
+    assert received == [False, True]
+
+
+def test_pushed_bind_completes_pairing_without_polling(tmp_path):
+    device = pairing_device(tmp_path)
+    device.status_cache.save('dev-1', {'registered': True, 'bound': True})
+    device._on_bind_status(False)
+    device._on_bind_status(False)  # 重复的未绑定推送不再启动第二个配网线程
+    wait_until(lambda: device.discovery.started == 1)
+    assert device.status_cache.load('dev-1') is None
+
+    device._on_bind_status(True)
+    wait_until(lambda: not device._pairing)
+    assert device.discovery.started == 1
+    assert device.polls == 0
+    assert device.status_cache.load('dev-1')['bound'] is True
@@ -0,0 +1,51 @@
+import colorsys
+
+import numpy as np
+import pytest
+
+from colors import HSV_HUES, WHEEL_TABLE, hex_to_rgb, hsv_to_rgb, wheel, wheel_palette
+
+
+def reference_wheel(pos):
+    """查表之前逐次计算的彩虹色"""
+    if pos < 85:
+        return (255 - pos * 3, pos * 3, 0)
+    if pos < 170:
+        pos -= 85
+        return (0, 255 - pos * 3, pos * 3)
+    pos -= 170
+    return (pos * 3, 0, 255 - pos * 3)
+
+
+def test_wheel_table_matches_formula():
+    for pos in range(256):
+        assert wheel(pos) == reference_wheel(pos)
+    assert wheel(256 + 10) == wheel(10)
+
+
+@pytest.mark.parametrize('v', [0.0, 0.25, 0.5, 1.0])
+def test_hsv_table_matches_colorsys(v):
+    for hue in range(HSV_HUES):
+        h = hue / HSV_HUES
+        expected = np.array(colorsys.hsv_to_rgb(h, 1.0, v)) * 255
+        # 查表按 256 级明度取整，误差不超过一级
+        assert np.abs(np.array(hsv_to_rgb(h, 1.0, v)) - expected).max() <= 1
+
+
+def test_unsaturated_hsv_falls_back_to_colorsys():
+    r, g, b = colorsys.hsv_to_rgb(0.3, 0.5, 0.8)
+    assert hsv_to_rgb(0.3, 0.5, 0.8) == (int(r * 255), int(g * 255), int(b * 255))
+
+
+def test_hex_to_rgb_applies_brightness():
+    assert hex_to_rgb('#FF8000') == (255, 128, 0)
+    assert hex_to_rgb('FF8000', 0.5) == (127, 64, 0)
+    assert hex_to_rgb((10, 20, 30), 0.5) == (5, 10, 15)
+
+
+def test_wheel_palette_is_scaled_and_read_only():
+    palette = wheel_palette(0.5)
+    assert np.array_equal(palette, (WHEEL_TABLE * 0.5).astype(np.uint8))
+    assert wheel_palette(0.5) is palette
+    with pytest.raises(ValueError):
+        palette[0] = 0
@@ -0,0 +1,72 @@
+import json
+import logging
+
+import pytest
+
+from device_log import RING_SIZE, RingBufferHandler
+from network import DeviceNetwork
+
+
+def record(level, msg):
+    return logging.LogRecord('light.TEST', level, __file__, 0, msg, None, None)
+
+
+@pytest.fixture
+def ring():
+    handler = RingBufferHandler()
+    for i in range(RING_SIZE):
+        handler.emit(record(logging.WARNING if i % 2 else logging.INFO, f"event {i}"))
+    return handler
+
+
+def test_dump_filters_by_level(ring):
+    assert len(ring.dump('warning')) == RING_SIZE // 2
+    assert len(ring.dump(logging.WARNING)) == RING_SIZE // 2
+    assert len(ring.dump('error')) == 0
+
+
+def test_level_names_do_not_need_python_311(ring, monkeypatch):
+    # 较旧的 Pi OS 上的解释器没有 logging.getLevelNamesMapping
+    monkeypatch.delattr(logging, 'getLevelNamesMapping', raising=False)
+    assert len(ring.dump('Warning')) == RING_SIZE // 2
+
+
+@pytest.mark.parametrize('level', ['bogus', 'Level 30', ['WARNING'], {'level': 'WARNING'}, 1.5, True])
+def test_unknown_level_is_rejected(ring, level):
+    with pytest.raises(ValueError):
+        ring.dump(level)
+
+
+def test_limit_is_coerced_and_clamped(ring):
+    assert [e['msg'] for e in ring.dump(limit='2')] == [f"event {RING_SIZE - 2}", f"event {RING_SIZE - 1}"]
+    assert len(ring.dump(limit=10 ** 9)) == RING_SIZE
+    assert ring.dump(limit=0) == []
+    assert ring.dump('warning', limit='0') == []
+
+
+@pytest.mark.parametrize('limit', ['many', [1], -1, '-5'])
+def test_invalid_limit_is_rejected(ring, limit):
+    with pytest.raises(ValueError):
+        ring.dump(limit=limit)
+
+
+@pytest.mark.parametrize('data, success', [
+    ({'level': 'warning', 'limit': 5}, True),
+    ({'level': 'ERROR', 'limit': '5'}, True),
+    ({'level': 'LOUD', 'limit': 5}, False),
+    ({'limit': 'many'}, False),
+    ({'limit': -1}, False),
+    ('not an object', False),
+    (['WARNING'], False),
+])
+def test_log_dump_always_replies(data, success):
+    replies = []
+    net = DeviceNetwork('ws://127.0.0.1:9')
+    net.on_message(json.dumps({'type': 'LOG_DUMP', 'data': data}), replies.append)
+    assert len(replies) == 1
+    assert replies[0]['type'] == 'LOG_DUMP_ACK'
+    assert replies[0]['data']['success'] is success
+    if success:
+        assert len(replies[0]['data']['events']) <= 5
+    else:
+        assert 'error' in replies[0]['data']
@@ -0,0 +1,91 @@
+import device_status
+from device_status import StatusCache, fetch_status
+
+
+class FakeClock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class FakeResponse:
+    status_code = 200
+    text = ''
+
+    def __init__(self, data):
+        self._data = data
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {'data': self._data}
+
+
+class FakeSession:
+    def __init__(self, data=None, error=None):
+        self.data = data
+        self.error = error
+        self.calls = []
+
+    def post(self, url, json=None, timeout=None):
+        self.calls.append((url, json))
+        if self.error:
+            raise self.error
+        return FakeResponse(self.data)
+
+
+def make_cache(tmp_path, ttl=60):
+    clock = FakeClock()
+    return StatusCache(str(tmp_path / 'status.json'), ttl=ttl, clock=clock), clock
+
+
+def test_cached_status_expires_after_ttl(tmp_path):
+    cache, clock = make_cache(tmp_path)
+    cache.save('dev-1', {'registered': True, 'bound': True})
+    clock.now += 60
+    assert cache.load('dev-1')['bound'] is True
+    clock.now += 1
+    assert cache.load('dev-1') is None
+
+
+def test_cache_is_keyed_by_device_id(tmp_path):
+    cache, _ = make_cache(tmp_path)
+    cache.save('dev-1', {'registered': True, 'bound': False})
+    assert cache.load('dev-2') is None
+    status = cache.load('dev-1')
+    assert status['registered'] is True and status['bound'] is False
+
+    # 换了设备 ID 后重新保存，旧 ID 的缓存随之失效
+    cache.save('dev-2', {'registered': False, 'bound': False})
+    assert cache.load('dev-1') is None
+    assert cache.load('dev-2')['registered'] is False
+
+
+def test_clear_invalidates_the_cache(tmp_path):
+    cache, _ = make_cache(tmp_path)
+    cache.save('dev-1', {'registered': True, 'bound': True})
+    cache.clear()
+    assert cache.load('dev-1') is None
+    cache.clear()  # 没有缓存时也不报错
+
+
+def test_corrupt_cache_is_ignored(tmp_path):
+    cache, _ = make_cache(tmp_path)
+    (tmp_path / 'status.json').write_text('{not json', encoding='utf-8')
+    assert cache.load('dev-1') is None
+
+
+def test_fetch_status_reads_both_flags(monkeypatch):
+    session = FakeSession({'isRegistered': True, 'isBound': False})
+    monkeypatch.setattr(device_status, 'get_session', lambda: session)
+    assert fetch_status('https://api.example', 'dev-1') == {'registered': True, 'bound': False}
+    assert session.calls == [('https://api.example/api/device/check-registered', {'deviceId': 'dev-1'})]
+
+
+def test_fetch_status_failure_returns_none(monkeypatch):
+    session = FakeSession(error=OSError('unreachable'))
+    monkeypatch.setattr(device_status, 'get_session', lambda: session)
+    assert fetch_status('https://api.example', 'dev-1') is None
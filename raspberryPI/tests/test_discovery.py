@@ -0,0 +1,40 @@
+import discoveryDevice
+from discoveryDevice import REPLY_INTERVAL, REQUEST, DeviceDiscovery
+
+
+class FakeSocket:
+    """按顺序交出排队的数据报，之后像非阻塞套接字一样抛 BlockingIOError"""
+
+    def __init__(self, datagrams):
+        self.datagrams = list(datagrams)
+        self.sent = []
+
+    def recvfrom(self, size):
+        if not self.datagrams:
+            raise BlockingIOError
+        return self.datagrams.pop(0)
+
+    def sendto(self, data, address):
+        self.sent.append((data, address))
+
+
+def test_burst_from_one_ip_is_throttled_per_source(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(discoveryDevice.time, 'monotonic', lambda: now[0])
+    discovery = DeviceDiscovery()
+    noisy = ('192.168.1.10', 40000)
+    quiet = ('192.168.1.20', 40001)
+    sock = FakeSocket([(REQUEST, noisy)] * 20 + [(b'garbage', quiet), (REQUEST, quiet)])
+
+    discovery._handle_requests(sock, b'response')
+    assert [address for _, address in sock.sent] == [noisy, quiet]
+    assert discovery.requests == 21
+    assert discovery.replies == 2
+    assert discovery.throttled == 19
+
+    # 间隔过后同一来源可以再次得到应答
+    now[0] += REPLY_INTERVAL
+    sock.datagrams = [(REQUEST, noisy)]
+    discovery._handle_requests(sock, b'response')
+    assert sock.sent[-1] == (b'response', noisy)
+    assert discovery.replies == 3
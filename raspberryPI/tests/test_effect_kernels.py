@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from LWaveLight import wave_frame, wave_frame_reference
+from LwaterRippleLamp import ripple_frame, ripple_frame_reference
+from LrainbowBreathingLight import breathing_frame, breathing_frame_reference
+
+COLORS = [(255, 255, 255), (0, 255, 0), (255, 128, 7), (13, 0, 200)]
+PIXELS = [1, 7, 60, 300]
+PHASES = [0.0, 0.03, 1.7, 12.345, 100.0]
+
+
+def assert_close(kernel, reference):
+    kernel = np.asarray(kernel, dtype=np.int16)
+    reference = np.asarray(reference, dtype=np.int16).reshape(-1, 3)
+    assert kernel.shape == reference.shape
+    assert np.abs(kernel - reference).max() <= 1
+
+
+@pytest.mark.parametrize('num_pixels', PIXELS)
+@pytest.mark.parametrize('color', COLORS)
+@pytest.mark.parametrize('density', [1, 2.5, 5])
+def test_wave_kernel_matches_reference(num_pixels, color, density):
+    for phase in PHASES:
+        assert_close(wave_frame(color, phase, density, num_pixels),
+                     wave_frame_reference(color, phase, density, num_pixels))
+
+
+@pytest.mark.parametrize('num_pixels', PIXELS)
+@pytest.mark.parametrize('color', COLORS)
+@pytest.mark.parametrize('wave_factor', [1, 3, 5, 10])
+def test_ripple_kernel_matches_reference(num_pixels, color, wave_factor):
+    for phase in PHASES:
+        assert_close(ripple_frame(color, phase, wave_factor, num_pixels),
+                     ripple_frame_reference(color, phase, wave_factor, num_pixels))
+
+
+@pytest.mark.parametrize('num_pixels', PIXELS)
+@pytest.mark.parametrize('brightness', [0.0, 0.01, 0.37, 0.5, 0.99, 1.0])
+def test_breathing_kernel_matches_reference(num_pixels, brightness):
+    for offset in (0, 1, 77, 255, 1000):
+        assert_close(breathing_frame(brightness, offset, num_pixels),
+                     breathing_frame_reference(brightness, offset, num_pixels))
@@ -0,0 +1,86 @@
+import time
+
+import numpy as np
+
+from frame_cache import FrameCache
+from LWaveLight import WaveEffect, wave_frame
+
+PIXELS = 10
+FRAMES = 8
+ENTRY_BYTES = FRAMES * PIXELS * 3
+
+
+def solid(value):
+    return lambda k: np.full((PIXELS, 3), (value + k) % 256, dtype=np.uint8)
+
+
+def build(cache, key, render_frame=None, frames=FRAMES, timeout=2.0):
+    """未命中时等待后台生成完成，返回缓存的周期帧"""
+    render_frame = render_frame or solid(len(key))
+    deadline = time.monotonic() + timeout
+    while True:
+        result = cache.lookup(key, frames, PIXELS, render_frame)
+        if result is not None:
+            return result
+        assert time.monotonic() < deadline, f"{key} 没有生成"
+        time.sleep(0.01)
+
+
+def cached_keys(cache):
+    return list(cache._entries)
+
+
+def test_hit_returns_the_same_frames():
+    cache = FrameCache(ENTRY_BYTES * 4)
+    render_frame = solid(7)
+    frames = build(cache, ('a',), render_frame)
+    hits = cache.stats()['hits']
+    again = cache.lookup(('a',), FRAMES, PIXELS, render_frame)
+    assert again is frames
+    assert cache.stats()['hits'] == hits + 1
+    for k in range(FRAMES):
+        assert np.array_equal(frames[k], render_frame(k))
+    assert not frames.flags.writeable
+
+
+def test_exceeding_the_budget_evicts_least_recently_used():
+    cache = FrameCache(ENTRY_BYTES * 2)
+    build(cache, ('a',))
+    build(cache, ('b',))
+    build(cache, ('a',))  # 命中，a 变为最近使用
+    build(cache, ('c',))
+    assert cached_keys(cache) == [('a',), ('c',)]
+    assert cache.stats()['evictions'] == 1
+    assert cache.stats()['bytes'] == ENTRY_BYTES * 2
+
+
+def test_period_larger_than_budget_is_not_cached():
+    cache = FrameCache(ENTRY_BYTES - 1)
+    assert cache.lookup(('a',), FRAMES, PIXELS, solid(0)) is None
+    time.sleep(0.05)
+    assert cached_keys(cache) == []
+
+
+def test_disabled_cache_never_builds():
+    cache = FrameCache(0)
+    assert cache.lookup(('a',), FRAMES, PIXELS, solid(0)) is None
+    assert cache.stats()['misses'] == 0
+
+
+def test_param_change_invalidates_the_entry():
+    effect = WaveEffect(PIXELS, color='#FF0000', wave_speed=0.5)
+    effect.cache = FrameCache(effect.period * PIXELS * 3 * 4)
+    red_key = effect.cache_key
+    red = build(effect.cache, red_key, effect._render_cached, effect.period)
+
+    effect.update(color='#0000FF', wave_speed=0.5)
+    assert effect.cache_key != red_key
+    # 新参数第一次查找未命中，旧参数的帧不会被回放
+    frame = np.zeros((PIXELS, 3), dtype=np.uint8)
+    effect.render(frame, 0.0, 0.0)
+    assert np.array_equal(frame, wave_frame(effect.rgb_color, effect.phase, effect.density_factor, PIXELS))
+    assert not frame[:, 0].any()
+
+    blue = build(effect.cache, effect.cache_key, effect._render_cached, effect.period)
+    assert blue is not red
+    assert not blue[..., 0].any() and blue[..., 2].any()
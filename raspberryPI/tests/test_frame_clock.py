@@ -0,0 +1,45 @@
+import frame_clock
+from frame_clock import FrameClock
+
+
+class FakeTime:
+    """替换 frame_clock 中的 time：sleep 立即把时钟拨到目标时刻，render 模拟每帧的计算耗时"""
+
+    def __init__(self, render=0.0):
+        self.now = 100.0
+        self.render = render
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def run(monkeypatch, frames, render=0.0, fps=60):
+    fake = FakeTime(render)
+    monkeypatch.setattr(frame_clock, 'time', fake)
+    clock = FrameClock(fps)
+    for _ in range(frames):
+        clock.tick()
+        fake.now += fake.render
+    return clock
+
+
+def test_first_tick_is_not_late(monkeypatch):
+    clock = run(monkeypatch, 1)
+    assert clock.late_frames == 0
+    assert clock.dropped_frames == 0
+
+
+def test_fps_matches_target(monkeypatch):
+    stats = run(monkeypatch, 120, render=0.005).stats()
+    assert abs(stats['fps'] - 60) < 0.01
+    assert stats['late'] == 0
+    assert stats['frames'] == 120
+
+
+def test_slow_frames_are_counted_late(monkeypatch):
+    stats = run(monkeypatch, 30, render=1.5 / 60).stats()
+    assert stats['late'] > 0
+    assert stats['dropped'] > 0
@@ -0,0 +1,125 @@
+import asyncio
+import time
+
+import numpy as np
+from websockets.asyncio.server import serve
+
+from frame_stream import FRAME_HEADER, encode_frame, get_frame_stream
+from network import DeviceNetwork
+
+STEP_US = 10000  # 相邻两帧的发送端时间间隔（微秒）
+
+
+def pixels(count=4, value=0):
+    return np.full((count, 3), value, dtype=np.uint8)
+
+
+def seqs(packets):
+    return [FRAME_HEADER.unpack_from(data)[3] for data in packets]
+
+
+async def wait_received(stream, count, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while stream.received < count:
+        assert time.monotonic() < deadline, f"只收到 {stream.received}/{count} 个包"
+        await asyncio.sleep(0.01)
+
+
+async def through_device(scenario):
+    """启动替身服务器和真实的 DeviceNetwork，scenario(send) 通过设备的云端连接下发二进制包"""
+    connected = asyncio.get_running_loop().create_future()
+
+    async def handler(ws):
+        if not connected.done():
+            connected.set_result(ws)
+        async for _ in ws:
+            pass  # INITIAL_STATUS、心跳等文本消息不需要回应
+
+    async with serve(handler, '127.0.0.1', 0) as server:
+        port = server.sockets[0].getsockname()[1]
+        net = DeviceNetwork(f"ws://127.0.0.1:{port}")
+        device = asyncio.create_task(net._run())
+        try:
+            ws = await asyncio.wait_for(connected, 2.0)
+            await scenario(ws.send)
+        finally:
+            net.close()
+            await asyncio.wait_for(device, 2.0)
+
+
+def due_at(stream, ts_us):
+    """发送端时间戳 ts_us 的帧在本地的播放时刻"""
+    return ts_us / 1e6 + stream._offset + stream.latency
+
+
+def test_reordered_frames_play_in_timestamp_order():
+    stream = get_frame_stream(11)
+    base = 1_000_000_000
+
+    async def scenario(send):
+        for seq in (2, 1, 3):
+            await send(encode_frame(pixels(), seq, base + seq * STEP_US, channel=11))
+        await wait_received(stream, 3)
+
+    asyncio.run(through_device(scenario))
+    played = []
+    for seq in (1, 2, 3):
+        played += seqs(stream.pop(due_at(stream, base + seq * STEP_US) + 0.001))
+    assert played == [1, 2, 3]
+    assert stream.stats()['played'] == 3
+    assert stream.stats()['dropped_late'] == 0
+
+
+def test_late_frames_are_dropped_for_the_newest_due_frame():
+    stream = get_frame_stream(12)
+    base = 2_000_000_000
+
+    async def scenario(send):
+        for seq in (1, 2, 3, 4):
+            await send(encode_frame(pixels(), seq, base + seq * STEP_US, channel=12))
+        await wait_received(stream, 4)
+
+    asyncio.run(through_device(scenario))
+    assert seqs(stream.pop(due_at(stream, base + 4 * STEP_US) + 0.001)) == [4]
+    assert stream.stats()['dropped_late'] == 3
+
+    # 比已播放的帧还旧的包不再播放
+    stream.push(encode_frame(pixels(), 3, base + 3 * STEP_US, channel=12))
+    assert stream.pop(due_at(stream, base + 10 * STEP_US)) == []
+    assert stream.stats()['out_of_order'] == 1
+
+
+def test_overflow_drops_the_oldest_packets():
+    stream = get_frame_stream(13)
+    stream.capacity = 4
+    base = 3_000_000_000
+
+    async def scenario(send):
+        for seq in range(1, 7):
+            await send(encode_frame(pixels(), seq, base + seq * STEP_US, channel=13))
+        await wait_received(stream, 6)
+
+    asyncio.run(through_device(scenario))
+    assert stream.stats()['dropped_overflow'] == 2
+    assert stream.stats()['buffered'] == 4
+    played = []
+    for seq in range(1, 7):
+        played += seqs(stream.pop(due_at(stream, base + seq * STEP_US) + 0.001))
+    assert played == [3, 4, 5, 6]
+
+
+def test_untimed_packets_play_immediately_and_later_ones_overwrite():
+    stream = get_frame_stream(14)
+
+    async def scenario(send):
+        await send(encode_frame(pixels(8, 1), 1, channel=14))
+        await send(encode_frame(pixels(8, 2), 2, channel=14))
+        await send(encode_frame(pixels(2, 3), 3, channel=14, start=5))
+        await wait_received(stream, 3)
+
+    asyncio.run(through_device(scenario))
+    # 整帧 1 被整帧 2 完整覆盖；从第 5 个像素开始的局部包仍要写出
+    assert seqs(stream.pop(time.monotonic())) == [2, 3]
+    assert stream.stats()['dropped_late'] == 1
+    assert stream.stats()['played'] == 1
+    assert stream.pop(time.monotonic()) == []
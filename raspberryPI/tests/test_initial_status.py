@@ -0,0 +1,47 @@
+import threading
+
+from layout import Segment, StripLayout
+from network import DeviceNetwork
+from render_worker import RenderWorker
+from strip import LedStrip
+
+
+def network_with_worker():
+    layout = StripLayout([Segment('main', 10)], [('null', {})])
+    net = DeviceNetwork('ws://127.0.0.1:9')
+    net.renderer = RenderWorker(LedStrip(layout.num_pixels, layout=layout))
+    return net
+
+
+def settle(worker):
+    done = threading.Event()
+    worker.sync(lambda ok: done.set())
+    assert done.wait(1.0)
+
+
+def test_initial_status_omits_mode_when_nothing_runs():
+    net = network_with_worker()
+    try:
+        settle(net.renderer)
+        status = net._initial_status()
+        assert 'mode' not in status and 'params' not in status
+        assert status['segments'] == {'main': None}
+
+        net.renderer.switch_mode('solid', {'color': '#123456'})
+        net.renderer.blank()
+        settle(net.renderer)
+        assert 'mode' not in net._initial_status()
+    finally:
+        net.renderer.shutdown()
+
+
+def test_initial_status_reports_running_mode():
+    net = network_with_worker()
+    try:
+        net.renderer.switch_mode('solid', {'color': '#123456'})
+        settle(net.renderer)
+        status = net._initial_status()
+        assert status['mode'] == 'solid'
+        assert status['params'] == {'color': '#123456'}
+    finally:
+        net.renderer.shutdown()
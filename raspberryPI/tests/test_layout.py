@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from layout import Segment, StripLayout, parse_channels, parse_segments
+from strip import LedStrip
+from strip_backends import MultiChannelBackend
+
+
+def two_channel_layout():
+    # 声明顺序与通道顺序不同：整帧按通道排列，同一通道内保持声明顺序
+    segments = [Segment('a', 4, 1), Segment('b', 3, 0), Segment('c', 2, 1)]
+    return StripLayout(segments, [('sim', {}), ('sim', {})])
+
+
+def test_segments_are_grouped_by_channel():
+    layout = two_channel_layout()
+    assert [(seg.name, seg.start, seg.stop) for seg in layout.segments] == [('b', 0, 3), ('a', 3, 7), ('c', 7, 9)]
+    assert layout.num_pixels == 9
+    assert layout.channel_ranges() == [(0, 0, 3), (1, 3, 9)]
+
+
+def test_each_channel_receives_its_slice():
+    layout = two_channel_layout()
+    strip = LedStrip(layout.num_pixels, layout=layout)
+    assert isinstance(strip.backend, MultiChannelBackend)
+    (_, _, first), (_, _, second) = strip.backend.outputs
+    assert (first.num_pixels, second.num_pixels) == (3, 6)
+
+    strip.frame[:] = np.arange(9, dtype=np.uint8)[:, None]
+    strip.show()
+    assert first.last_frame[:, 0].tolist() == [0, 1, 2]
+    assert second.last_frame[:, 0].tolist() == [3, 4, 5, 6, 7, 8]
+
+
+def test_dirty_range_only_reaches_overlapping_channels():
+    layout = two_channel_layout()
+    strip = LedStrip(layout.num_pixels, layout=layout)
+    (_, _, first), (_, _, second) = strip.backend.outputs
+    strip.show()
+
+    # 只改通道 1 中 'c' 分段的第一个像素（整帧第 7 个）
+    strip.frame[:] = 0
+    strip.frame[7] = 255
+    strip.show()
+    assert first.write_count == 1
+    assert second.write_count == 2
+    assert second.dirty_ranges[-1] == (4, 5)
+
+
+def test_invalid_layouts_are_rejected():
+    with pytest.raises(ValueError):
+        StripLayout([Segment('a', 1), Segment('a', 1)], [('null', {})])
+    with pytest.raises(ValueError):
+        StripLayout([Segment('a', 1, 2)], [('null', {})])
+    with pytest.raises(KeyError):
+        two_channel_layout().resolve(['a', 'z'])
+
+
+def test_parse_layout_config():
+    segments = parse_segments('left:300@0, right:200@1,top:50')
+    assert [(seg.name, seg.length, seg.channel) for seg in segments] == [
+        ('left', 300, 0), ('right', 200, 1), ('top', 50, 0)]
+    assert parse_channels('ws281x gpio=18 color=GRB;spi bus=1') == [
+        ('ws281x', {'gpio': 18, 'color': 'GRB'}), ('spi', {'bus': 1})]
+    assert parse_channels('', 'null') == [('null', {})]
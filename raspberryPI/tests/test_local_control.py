@@ -0,0 +1,67 @@
+import asyncio
+import json
+import os
+import socket
+
+import pytest
+from websockets.asyncio.client import connect
+from websockets.exceptions import ConnectionClosed, InvalidStatus
+
+from local_control import LocalControlServer
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+async def revoke_scenario(tmp_path, revoke):
+    token_path = str(tmp_path / 'local_token')
+    received = []
+    server = LocalControlServer(lambda message, reply: received.append(message), free_port(), token_path)
+    url = f"ws://127.0.0.1:{server.port}/local"
+    await server.set_token('secret')
+    assert os.path.exists(token_path)
+    try:
+        async with connect(url, additional_headers={'Authorization': 'Bearer secret'}) as ws:
+            await ws.send(json.dumps({'type': 'TELEMETRY_DUMP'}))
+            await revoke(server)
+            # 已连接的客户端被断开
+            with pytest.raises(ConnectionClosed):
+                await asyncio.wait_for(ws.recv(), 2.0)
+        assert received
+
+        assert server.token is None
+        assert not os.path.exists(token_path)
+        assert not server.stats()['listening']
+        with pytest.raises(OSError):
+            await connect(url, additional_headers={'Authorization': 'Bearer secret'})
+    finally:
+        await server.stop()
+
+    # 重启后不会从文件恢复旧密钥
+    assert LocalControlServer(None, 0, token_path).token is None
+
+
+@pytest.mark.parametrize('token', [None, ''])
+def test_unbind_revokes_token(tmp_path, token):
+    asyncio.run(revoke_scenario(tmp_path, lambda server: server.set_token(token)))
+
+
+def test_rebind_with_new_token_rejects_old_one(tmp_path):
+    async def scenario():
+        server = LocalControlServer(lambda message, reply: None, free_port(), str(tmp_path / 'local_token'))
+        url = f"ws://127.0.0.1:{server.port}/local"
+        try:
+            await server.set_token('old')
+            await server.set_token(None)
+            await server.set_token('new')
+            with pytest.raises(InvalidStatus):
+                await connect(url, additional_headers={'Authorization': 'Bearer old'})
+            async with connect(url, additional_headers={'Authorization': 'Bearer new'}):
+                pass
+        finally:
+            await server.stop()
+
+    asyncio.run(scenario())
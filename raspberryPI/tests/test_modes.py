@@ -0,0 +1,67 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import modes
+from layout import Segment, StripLayout
+from render_worker import RenderWorker
+from strip import LedStrip
+
+RASPBERRY_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    """测试中注册的模式不留在全局注册表里"""
+    monkeypatch.setattr(modes, '_registry', dict(modes._registry))
+    return modes._registry
+
+
+def test_builtin_modes_are_not_imported_at_startup():
+    code = (
+        "import sys, modes\n"
+        "assert 'wave' in modes.available_modes()\n"
+        "print(','.join(m for m in ('LWaveLight', 'Light', 'LrainbowMarquee') if m in sys.modules))\n"
+    )
+    out = subprocess.run([sys.executable, '-c', code], cwd=RASPBERRY_DIR, env=os.environ,
+                         capture_output=True, text=True, check=True).stdout
+    assert out.strip() == ''
+
+
+def test_mode_module_is_imported_on_first_load(registry, tmp_path, monkeypatch):
+    (tmp_path / 'lazy_mode_fixture.py').write_text('class LazyEffect:\n    pass\n', encoding='utf-8')
+    monkeypatch.syspath_prepend(str(tmp_path))
+    spec = modes.register_mode('lazy', 'lazy_mode_fixture:LazyEffect')
+    try:
+        assert 'lazy_mode_fixture' not in sys.modules
+        assert not spec.loaded
+        assert modes.get_mode('lazy') is spec
+        cls = spec.load()
+        assert cls.__name__ == 'LazyEffect'
+        assert spec.loaded and spec.load() is cls
+    finally:
+        sys.modules.pop('lazy_mode_fixture', None)
+
+
+def test_params_are_filled_and_converted():
+    spec = modes.ModeSpec('demo', 'x:y', {
+        'speed': modes.Param(0.5),
+        'tail': modes.Param(9, lambda v: v * 20 + 5),
+    })
+    assert spec.resolve_params(None) == {'speed': 0.5, 'tail': 185}
+    assert spec.resolve_params({'tail': 1, 'extra': True}) == {'speed': 0.5, 'tail': 25}
+    assert modes.ModeSpec('raw', 'x:y').resolve_params({'a': 1}) == {'a': 1}
+
+
+def test_unknown_mode_is_rejected():
+    assert modes.get_mode('no-such-mode') is None
+    assert 'no-such-mode' not in modes.available_modes()
+    layout = StripLayout([Segment('all', 10)], [('null', {})])
+    worker = RenderWorker(LedStrip(layout.num_pixels, layout=layout))
+    try:
+        assert worker.switch_mode('no-such-mode') is False
+        assert worker.mode is None
+    finally:
+        worker.shutdown()
@@ -0,0 +1,121 @@
+import threading
+import time
+
+from layout import Segment, StripLayout
+from render_worker import RenderWorker
+from strip import LedStrip
+
+
+def make_worker():
+    layout = StripLayout([Segment('left', 10), Segment('right', 10)], [('null', {})])
+    return RenderWorker(LedStrip(layout.num_pixels, layout=layout))
+
+
+def applied(worker, submit, *args):
+    """提交一条命令并等待 on_applied 的结果，超时返回 None"""
+    done = threading.Event()
+    result = []
+
+    def on_applied(ok):
+        result.append(ok)
+        done.set()
+
+    submit(*args, on_applied=on_applied)
+    done.wait(0.5)
+    return result[0] if result else None
+
+
+def test_params_without_running_mode_is_rejected():
+    worker = make_worker()
+    try:
+        assert applied(worker, worker.update_params, {'color': '#FF0000'}) is False
+    finally:
+        worker.shutdown()
+
+
+def test_params_after_blank_is_rejected():
+    worker = make_worker()
+    try:
+        assert applied(worker, worker.switch_mode, 'solid', {'color': '#00FF00'}) is True
+        worker.blank()
+        assert applied(worker, worker.update_params, {'color': '#FF0000'}) is False
+    finally:
+        worker.shutdown()
+
+
+def test_params_for_segment_without_mode_is_rejected():
+    worker = make_worker()
+    try:
+        assert applied(worker, worker.switch_mode, 'solid', {'color': '#00FF00'}, ['left']) is True
+        assert applied(worker, worker.update_params, {'color': '#FF0000'}, ['right']) is False
+        assert applied(worker, worker.update_params, {'color': '#FF0000'}, ['left']) is True
+        assert worker.state()['slots'][0]['params']['color'] == '#FF0000'
+    finally:
+        worker.shutdown()
+
+
+def running_wave(worker):
+    """启动波动模式并等它画过几帧，返回效果实例"""
+    assert applied(worker, worker.switch_mode, 'wave', {'color': '#00FF00', 'wave_speed': 1.0}) is True
+    effect = worker._slots[0].effect
+    deadline = time.monotonic() + 1.0
+    while effect.phase == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert effect.phase > 0
+    return effect
+
+
+def test_param_update_keeps_effect_and_phase():
+    worker = make_worker()
+    try:
+        effect = running_wave(worker)
+        phase = effect.phase
+        assert applied(worker, worker.update_params, {'color': '#FF0000'}) is True
+        assert worker._slots[0].effect is effect
+        assert effect.phase >= phase
+        assert effect.rgb_color[0] > 0 and effect.rgb_color[1] == 0
+        assert worker.hot_updates == 1
+    finally:
+        worker.shutdown()
+
+
+def test_switch_to_same_mode_keeps_effect_and_phase():
+    worker = make_worker()
+    try:
+        effect = running_wave(worker)
+        phase = effect.phase
+        assert applied(worker, worker.switch_mode, 'wave', {'color': '#0000FF', 'wave_speed': 1.0}) is True
+        assert len(worker._slots) == 1
+        assert worker._slots[0].effect is effect
+        assert effect.phase >= phase
+        assert worker.hot_updates == 1
+    finally:
+        worker.shutdown()
+
+
+def make_sim_worker():
+    layout = StripLayout([Segment('left', 10), Segment('right', 10)], [('sim', {})])
+    return RenderWorker(LedStrip(layout.num_pixels, layout=layout))
+
+
+def test_switch_is_written_before_on_applied():
+    worker = make_sim_worker()
+    backend = worker.strip.backend
+    seen = []
+    try:
+        assert applied(worker, worker.switch_mode, 'solid', {'color': '#FF0000'}) is True
+        thread = worker._thread
+        # 回调执行时新画面已经写出灯带
+        worker.switch_mode('solid', {'color': '#00FF00'}, ['right'],
+                           on_applied=lambda ok: seen.append(backend.last_frame.copy()))
+        assert applied(worker, worker.sync) is True
+        assert len(seen) == 1
+        assert (seen[0][:10] == (255, 0, 0)).all()
+        assert (seen[0][10:] == (0, 255, 0)).all()
+        # 切换在常驻线程里完成，不新建线程
+        assert worker._thread is thread
+        assert worker.segment_modes() == {'left': 'solid', 'right': 'solid'}
+    finally:
+        worker.shutdown()
+    assert not worker._thread.is_alive()
+    assert not backend.last_frame.any()
@@ -0,0 +1,96 @@
+import json
+import os
+import time
+
+import pytest
+
+import state_store
+from state_store import StateStore, atomic_write
+
+
+def wait_until(predicate, timeout=1.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def read(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_rapid_saves_are_written_once(tmp_path):
+    store = StateStore(str(tmp_path / 'state.json'), debounce=0.1, max_delay=5.0)
+    for value in range(10):
+        store.save({'mode': 'solid', 'value': value})
+    assert store.writes == 0
+    wait_until(lambda: store.writes == 1)
+    time.sleep(0.2)
+    assert store.writes == 1
+    assert read(store.path)['value'] == 9
+    assert store.load()['version'] == state_store.STATE_VERSION
+
+
+def test_continuous_changes_are_written_by_max_delay(tmp_path):
+    store = StateStore(str(tmp_path / 'state.json'), debounce=0.1, max_delay=0.2)
+    started = time.monotonic()
+    value = 0
+    # 每 20ms 变化一次，防抖永远等不到，靠最长延迟写出
+    while store.writes == 0:
+        assert time.monotonic() - started < 1.0
+        store.save({'value': value})
+        value += 1
+        time.sleep(0.02)
+    store.close()
+
+
+def test_unchanged_state_is_not_rewritten(tmp_path):
+    store = StateStore(str(tmp_path / 'state.json'))
+    store.save({'mode': 'solid'})
+    store.flush()
+    store.save({'mode': 'solid'})
+    store.flush()
+    assert (store.writes, store.skipped) == (1, 1)
+
+    # 重启后读到的内容也算作已写入
+    restarted = StateStore(store.path)
+    restarted.load()
+    restarted.save({'mode': 'solid'})
+    restarted.flush()
+    assert (restarted.writes, restarted.skipped) == (0, 1)
+
+
+def test_close_flushes_and_ignores_later_saves(tmp_path):
+    store = StateStore(str(tmp_path / 'state.json'), debounce=10.0)
+    store.save({'mode': 'wave'})
+    store.close()
+    assert read(store.path)['mode'] == 'wave'
+    store.save({'mode': None})
+    store.flush()
+    assert read(store.path)['mode'] == 'wave'
+
+
+def test_interrupted_write_keeps_previous_file(tmp_path, monkeypatch):
+    path = str(tmp_path / 'state.json')
+    atomic_write(path, '{"old": true}')
+
+    def power_loss(src, dst):
+        raise OSError('power loss')
+
+    monkeypatch.setattr(state_store.os, 'replace', power_loss)
+    with pytest.raises(OSError):
+        atomic_write(path, '{"new": true}')
+    # 新内容只写到了临时文件，原文件完整
+    assert read(path) == {'old': True}
+    assert read(path + '.tmp') == {'new': True}
+
+
+def test_corrupt_or_old_state_is_ignored(tmp_path):
+    path = tmp_path / 'state.json'
+    store = StateStore(str(path))
+    path.write_text('{"mode": ', encoding='utf-8')
+    assert store.load() is None
+    path.write_text(json.dumps({'version': 0, 'mode': 'wave'}), encoding='utf-8')
+    assert store.load() is None
+    assert not os.path.exists(str(path) + '.tmp')
@@ -0,0 +1,61 @@
+import numpy as np
+
+from strip import LedStrip
+from strip_backends import SimulatorBackend
+
+
+def make_strip(num_pixels=16):
+    return LedStrip(num_pixels, backend=SimulatorBackend(num_pixels))
+
+
+def test_identical_frame_is_not_written():
+    strip = make_strip()
+    strip.fill((10, 20, 30))
+    assert strip.show()
+    writes = strip.backend.write_count
+    # 渲染方写入与上一帧相同的内容
+    strip.fill((10, 20, 30))
+    assert not strip.show()
+    assert strip.backend.write_count == writes
+    assert strip.skipped_frames == 1
+
+
+def test_first_frame_is_written_in_full():
+    strip = make_strip()
+    assert strip.show()
+    assert strip.dirty_range is None
+    assert strip.backend.dirty_ranges[-1] is None
+
+
+def test_dirty_range_covers_exactly_the_changed_pixels():
+    strip = make_strip()
+    strip.fill((1, 1, 1))
+    strip.show()
+
+    frame = strip.frame
+    frame[:] = (1, 1, 1)
+    frame[3] = (255, 0, 0)
+    frame[9] = (0, 0, 7)
+    assert strip.show()
+    assert strip.dirty_range == (3, 10)
+    assert strip.backend.dirty_ranges[-1] == (3, 10)
+    expected = np.full((16, 3), 1, dtype=np.uint8)
+    expected[3] = (255, 0, 0)
+    expected[9] = (0, 0, 7)
+    assert np.array_equal(strip.backend.last_frame, expected)
+
+    # 只改最后一个像素的一个通道
+    strip.frame[:] = expected
+    strip.frame[15, 2] = 2
+    assert strip.show()
+    assert strip.dirty_range == (15, 16)
+
+
+def test_blank_forces_a_full_write():
+    strip = make_strip()
+    strip.fill((5, 5, 5))
+    strip.show()
+    strip.blank()
+    strip.fill((5, 5, 5))
+    assert strip.show()
+    assert strip.dirty_range is None
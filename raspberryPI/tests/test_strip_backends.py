@@ -0,0 +1,47 @@
+import sys
+
+import numpy as np
+import pytest
+
+from strip_backends import BACKENDS, NullBackend, SimulatorBackend, create_backend
+
+
+def test_create_backend_by_name():
+    backend = create_backend('sim', 8, history=4)
+    assert isinstance(backend, SimulatorBackend)
+    assert backend.num_pixels == 8
+    assert isinstance(create_backend('null', 8), NullBackend)
+    assert set(BACKENDS) == {'ws281x', 'spi', 'blinka', 'sim', 'null'}
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        create_backend('laser', 8)
+
+
+def test_auto_falls_back_to_simulator(monkeypatch):
+    # sys.modules 中为 None 的模块导入时抛出 ImportError，模拟没有硬件库的机器
+    for module in ('_rpi_ws281x', 'board', 'neopixel_write'):
+        monkeypatch.setitem(sys.modules, module, None)
+    assert isinstance(create_backend('auto', 8), SimulatorBackend)
+
+
+def test_simulator_keeps_copies_of_recent_frames():
+    backend = SimulatorBackend(4, history=2)
+    frame = np.zeros((4, 3), dtype=np.uint8)
+    for value in (1, 2, 3):
+        frame[:] = value
+        backend.write(frame, (0, value))
+    # 写出后调用方继续改写自己的缓冲，不影响已记录的帧
+    frame[:] = 99
+    assert backend.write_count == 3
+    assert [int(f[0, 0]) for _, f in backend.frames] == [2, 3]
+    assert list(backend.dirty_ranges) == [(0, 2), (0, 3)]
+    assert int(backend.last_frame.max()) == 3
+
+
+def test_null_backend_only_counts():
+    backend = NullBackend(4)
+    backend.write(np.zeros((4, 3), dtype=np.uint8))
+    backend.write(np.zeros((4, 3), dtype=np.uint8), (1, 2))
+    assert backend.write_count == 2
@@ -0,0 +1,47 @@
+from telemetry import RingBuffer, Telemetry, read_cpu_times
+
+
+def test_ring_buffer_wraps_in_write_order():
+    ring = RingBuffer(4)
+    assert ring.last is None
+    assert ring.values().tolist() == []
+    assert ring.percentiles(50) == [None]
+    for value in range(1, 4):
+        ring.append(value)
+    assert ring.values().tolist() == [1, 2, 3]
+
+    for value in range(4, 11):
+        ring.append(value)
+    # 只保留最近 4 个，按写入顺序返回
+    assert ring.values().tolist() == [7, 8, 9, 10]
+    assert ring.last == 10
+    assert ring.count == 10
+    assert ring.percentiles(0, 100) == [7.0, 10.0]
+
+
+def test_values_is_a_copy():
+    ring = RingBuffer(2)
+    ring.append(1)
+    ring.values()[0] = 99
+    assert ring.values().tolist() == [1]
+
+
+def test_summary_from_recorded_frames():
+    telemetry = Telemetry(size=8)
+    for i in range(20):
+        telemetry.record_frame(100 + i * 0.1, 0.002, 0.001 if i % 2 else None, queue_depth=i % 3)
+    assert telemetry.frame_times.count == 20
+    assert telemetry.show_times.count == 10
+    # 缓冲只剩最近 8 帧（101.2~101.9），更早的帧即使在窗口内也不再计入
+    assert telemetry.fps(window=2.0, now=102.0) == 4.0
+    summary = telemetry.summary()
+    assert summary['frame_ms'] == [2.0, 2.0]
+    assert summary['show_ms'] == [1.0, 1.0]
+    assert summary['queue_max'] == 2
+    assert summary['switch_ms'] is None
+
+
+def test_read_cpu_times(tmp_path):
+    stat = tmp_path / 'stat'
+    stat.write_text('cpu  10 0 5 80 5 0 0 0\ncpu0 1 2 3 4\n')
+    assert read_cpu_times(str(stat)) == (100, 85)
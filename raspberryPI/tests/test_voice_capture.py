@@ -0,0 +1,153 @@
+import time
+
+import numpy as np
+import pytest
+
+from voice_capture import HANGOVER, PREROLL, Resampler, StreamingCapture
+
+RATE = 16000
+CHUNK = 256
+
+
+def noise(seconds, rng):
+    return rng.normal(0, 60, int(seconds * RATE))
+
+
+def speech(seconds):
+    """带音节起伏的浊音"""
+    t = np.arange(int(seconds * RATE)) / RATE
+    return 6000 * (0.6 + 0.4 * np.sin(2 * np.pi * 4 * t)) * np.sin(2 * np.pi * 220 * t)
+
+
+def clip(*parts):
+    return np.clip(np.concatenate(parts), -32768, 32767).astype(np.int16)
+
+
+class FakeStream:
+    """伪装成 PyAudio 输入流，按块返回录好的音频；realtime 时按采样率节奏返回，
+    并记下每块交出的时刻，用来计算说话结束到拿到结果的延迟
+    """
+
+    def __init__(self, samples, realtime=False):
+        self.samples = samples
+        self.position = 0
+        self.realtime = realtime
+        self.started = time.monotonic()
+        self.delivered = {}  # 累计采样位置 -> 交出这一块的时刻
+
+    def read(self, num_frames, exception_on_overflow=True):
+        if self.realtime:
+            time.sleep(max(0.0, self.started + (self.position + num_frames) / RATE - time.monotonic()))
+        chunk = self.samples[self.position:self.position + num_frames]
+        self.position += len(chunk)
+        self.delivered[self.position] = time.monotonic()
+        return chunk.tobytes()
+
+
+def test_utterance_boundaries():
+    rng = np.random.default_rng(0)
+    audio = clip(noise(1.0, rng), speech(0.8), noise(2.0, rng))
+    capture = StreamingCapture(RATE, CHUNK)
+    result = capture.capture(FakeStream(audio))
+
+    speech_start, speech_end = int(1.0 * RATE), int(1.8 * RATE)
+    start, end = capture.last_span
+    # 起点带上前导，误差在一个块以内
+    assert abs(start - (speech_start - int(PREROLL * RATE))) <= CHUNK
+    # 终点在说话结束后保留半个拖尾
+    assert abs(end - (speech_end + int(HANGOVER * RATE) // 2)) <= CHUNK
+    assert len(result) == (end - start) * 2
+    assert np.array_equal(np.frombuffer(result, dtype=np.int16), audio[start:end])
+
+
+def test_end_of_speech_latency_is_under_one_second():
+    rng = np.random.default_rng(1)
+    audio = clip(noise(0.3, rng), speech(0.5), noise(1.5, rng))
+    stream = FakeStream(audio, realtime=True)
+    capture = StreamingCapture(RATE, CHUNK)
+    assert capture.capture(stream) is not None
+    returned = time.monotonic()
+
+    speech_end = int(0.8 * RATE)
+    spoken = stream.delivered[min(pos for pos in stream.delivered if pos >= speech_end)]
+    assert HANGOVER * 0.8 <= returned - spoken < 1.0
+    assert capture.last_endpoint < 1.0
+
+
+def test_noise_floor_is_calibrated_once_across_utterances():
+    rng = np.random.default_rng(2)
+    capture = StreamingCapture(RATE, CHUNK)
+    calls = []
+    calibrate = capture.vad.calibrate
+    capture.vad.calibrate = lambda samples: (calls.append(len(samples)), calibrate(samples))
+
+    stream = FakeStream(clip(noise(0.5, rng), speech(0.5), noise(1.0, rng),
+                             speech(0.5), noise(1.0, rng)))
+    first = capture.capture(stream)
+    first_read = stream.position
+    second = capture.capture(stream)
+    assert first is not None and second is not None
+    assert len(calls) == 1
+    assert capture.utterances == 2
+    # 第二句从上一句结束处开始听，前导不会跨到上一句
+    assert capture.last_span[0] >= first_read
+    assert abs(capture.last_span[0] - (int(2.0 * RATE) - int(PREROLL * RATE))) <= CHUNK
+
+
+def test_silence_times_out():
+    rng = np.random.default_rng(3)
+    capture = StreamingCapture(RATE, CHUNK, listen_timeout=1.0)
+    assert capture.capture(FakeStream(clip(noise(3.0, rng)))) is None
+    assert capture.timeouts == 1
+
+
+ASR_RATE = 16000
+
+
+def tone(freq, rate, seconds=1.0, amplitude=10000):
+    t = np.arange(int(seconds * rate)) / rate
+    return (amplitude * np.sin(2 * np.pi * freq * t)).astype(np.int16)
+
+
+def resample_chunked(resampler, samples, chunk):
+    parts = [resampler.feed(samples[i:i + chunk]) for i in range(0, len(samples), chunk)]
+    return np.concatenate(parts + [resampler.flush()])
+
+
+def steady(samples, rate):
+    """去掉两端滤波器起止的过渡段"""
+    return samples[rate // 10:-rate // 10].astype(np.float64)
+
+
+@pytest.mark.parametrize('src', [48000, 44100])
+@pytest.mark.parametrize('chunk', [512, 1000, 4096])
+def test_resampled_length_across_chunked_calls(src, chunk):
+    samples = tone(1000, src, seconds=1.37)
+    resampler = Resampler(src, ASR_RATE)
+    out = resample_chunked(resampler, samples, chunk)
+    assert abs(len(out) - len(samples) * ASR_RATE / src) <= 1
+    # 分块处理与一次处理整段的结果相同（只差舍入）
+    assert np.abs(out.astype(int) - resampler(samples).astype(int)).max() <= 1
+
+
+@pytest.mark.parametrize('src', [48000, 44100])
+def test_passband_amplitude_is_preserved(src):
+    out = steady(resample_chunked(Resampler(src, ASR_RATE), tone(1000, src), 512), ASR_RATE)
+    t = (np.arange(len(out)) + ASR_RATE // 10) / ASR_RATE
+    # 与同相位的理想 1kHz 正弦比较：幅度和相位都保持
+    expected = 10000 * np.sin(2 * np.pi * 1000 * t)
+    assert np.abs(out - expected).max() < 10
+    assert abs(np.sqrt(np.mean(out ** 2)) / (10000 / np.sqrt(2)) - 1) < 0.001
+
+
+@pytest.mark.parametrize('src', [48000, 44100])
+@pytest.mark.parametrize('freq', [9000, 12000, 20000])
+def test_tones_above_nyquist_are_rejected(src, freq):
+    out = steady(resample_chunked(Resampler(src, ASR_RATE), tone(freq, src), 512), ASR_RATE)
+    # 折叠回 0~8kHz 的混叠分量至少衰减 60dB
+    assert np.sqrt(np.mean(out ** 2)) < 10000 / np.sqrt(2) * 1e-3
+
+
+def test_same_rate_is_passed_through():
+    samples = tone(1000, ASR_RATE)
+    assert Resampler(ASR_RATE, ASR_RATE)(samples) is samples
@@ -0,0 +1,340 @@
+"""流式录音与语音端点检测
+
+麦克风数据按块读入预分配的环形缓冲，每块用短时能量和过零率判断是否为语音：
+连续几块超过阈值视为开始说话（并带上之前一小段作为前导，避免吞掉首字），
+说话开始后静音持续 HANGOVER 秒视为说完，立即把这一句的 PCM 交给识别，不写 WAV 文件。
+噪声基底在开始说话前持续跟踪，能量阈值随环境噪声浮动。
+Resampler 把录音采样率的 PCM 转成识别服务要求的采样率（如 48k -> 16k），上传量按比例减少。
+
+用录好的音频检验端点检测：
+    python voice_capture.py 录音.wav [--realtime]
+"""
+import argparse
+import math
+import sys
+import time
+import wave
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from device_log import get_logger
+
+log = get_logger('VOICE')
+
+PREROLL = 0.3  # 开始说话前保留的音频（秒）
+HANGOVER = 0.5  # 静音持续多久视为说完（秒）
+MAX_UTTERANCE = 10.0  # 一句话的最长时长（秒），与原来的固定录音时长一致
+LISTEN_TIMEOUT = 10.0  # 一直没人说话时多久返回一次（秒），让调用方有机会检查退出；None 为一直等待
+START_CHUNKS = 3  # 连续多少块语音才算开始说话，滤掉咔哒声等短促噪声
+CALIBRATE = 0.2  # 开始时用于估计噪声基底的时长（秒）
+
+RESAMPLE_ZEROS = 16  # 重采样低通滤波器每侧的过零点数，越大过渡带越窄
+RESAMPLE_ROLLOFF = 0.9  # 截止频率占目标奈奎斯特频率的比例，留出过渡带防止混叠
+RESAMPLE_BETA = 8.6  # Kaiser 窗参数，阻带衰减约 80dB
+
+
+class AudioRing:
+    """定长 int16 环形缓冲，按累计采样位置读写，写入不分配内存"""
+
+    def __init__(self, capacity):
+        self._data = np.zeros(capacity, dtype=np.int16)
+        self.written = 0  # 累计写入的采样数
+
+    def write(self, samples):
+        capacity = len(self._data)
+        if len(samples) > capacity:
+            self.written += len(samples) - capacity
+            samples = samples[-capacity:]
+        index = self.written % capacity
+        first = min(len(samples), capacity - index)
+        self._data[index:index + first] = samples[:first]
+        self._data[:len(samples) - first] = samples[first:]
+        self.written += len(samples)
+
+    def since(self, start):
+        """累计位置 start 到当前的采样（拷贝），超出缓冲的部分已被覆盖，从最早可用处开始"""
+        capacity = len(self._data)
+        start = max(start, self.written - capacity, 0)
+        count = self.written - start
+        if count <= 0:
+            return np.zeros(0, dtype=np.int16)
+        index = start % capacity
+        if index + count <= capacity:
+            return self._data[index:index + count].copy()
+        return np.concatenate((self._data[index:], self._data[:index + count - capacity]))
+
+
+class VoiceActivityDetector:
+    """基于短时能量和过零率的语音检测
+    能量超过 噪声基底 × ratio（且不低于 min_rms）判为语音；能量只有阈值一半但过零率高的块
+    （"是""谢"之类的清擦音）也算语音，避免句尾被截断。非语音块用来缓慢更新噪声基底
+    """
+
+    def __init__(self, min_rms=300.0, ratio=3.0, zcr_threshold=0.25, adapt=0.05):
+        self.min_rms = min_rms
+        self.ratio = ratio
+        self.zcr_threshold = zcr_threshold
+        self.adapt = adapt
+        self.noise = None  # 噪声基底的 RMS
+
+    @property
+    def threshold(self):
+        return max(self.min_rms, (self.noise or 0.0) * self.ratio)
+
+    def calibrate(self, samples):
+        """用一段环境音初始化噪声基底"""
+        self.noise = float(np.sqrt(np.mean(np.square(samples, dtype=np.float64))))
+
+    def is_speech(self, samples, track_noise=True):
+        samples = samples.astype(np.float32)
+        rms = float(np.sqrt(np.mean(samples * samples)))
+        signs = np.signbit(samples)
+        zcr = np.count_nonzero(signs[1:] != signs[:-1]) / max(len(samples) - 1, 1)
+        threshold = self.threshold
+        speech = rms > threshold or (rms > threshold / 2 and zcr > self.zcr_threshold)
+        if not speech and track_noise:
+            self.noise = rms if self.noise is None else self.noise + self.adapt * (rms - self.noise)
+        return speech
+
+
+class StreamingCapture:
+    """从 PyAudio 输入流（或任何提供 read(块大小) 的对象）中切出一句话
+    同一个对象应在多句之间复用：噪声基底只在第一次录音时校准，之后持续跟踪
+    """
+
+    def __init__(self, rate, chunk_size, vad=None, preroll=PREROLL, hangover=HANGOVER,
+                 max_utterance=MAX_UTTERANCE, listen_timeout=LISTEN_TIMEOUT):
+        self.rate = rate
+        self.chunk_size = chunk_size
+        self.vad = vad or VoiceActivityDetector()
+        self.preroll = int(preroll * rate)
+        self.hangover = int(hangover * rate)
+        self.max_utterance = int(max_utterance * rate)
+        self.listen_timeout = None if listen_timeout is None else int(listen_timeout * rate)
+        self.ring = AudioRing(self.preroll + self.max_utterance + chunk_size)
+
+        self.utterances = 0
+        self.timeouts = 0
+        self.last_duration = None  # 最近一句的时长（秒）
+        self.last_span = None  # 最近一句在累计输入中的采样区间 (起, 止)
+        self.last_endpoint = None  # 最近一句从最后一块语音读入到交出结果的耗时（秒）
+
+    def _read(self, stream):
+        data = stream.read(self.chunk_size, exception_on_overflow=False)
+        samples = np.frombuffer(data, dtype=np.int16)
+        self.ring.write(samples)
+        return samples
+
+    def capture(self, stream):
+        """从 stream 读取，阻塞到说完一句话，返回这句话的 16 位单声道 PCM；超时无人说话或输入结束时返回 None"""
+        listen_start = self.ring.written
+        if self.vad.noise is None:
+            calibration = []
+            while self.ring.written - listen_start < CALIBRATE * self.rate:
+                samples = self._read(stream)
+                if not len(samples):
+                    return None
+                calibration.append(samples)
+            self.vad.calibrate(np.concatenate(calibration))
+
+        # 1. 等待开始说话
+        run = 0
+        while True:
+            samples = self._read(stream)
+            if not len(samples):
+                return None
+            run = run + 1 if self.vad.is_speech(samples) else 0
+            if run >= START_CHUNKS:
+                break
+            if self.listen_timeout is not None and self.ring.written - listen_start >= self.listen_timeout:
+                self.timeouts += 1
+                return None
+        speech_start = self.ring.written - run * len(samples)
+        start = max(speech_start - self.preroll, listen_start)
+
+        # 2. 等待说完：静音持续 hangover 或达到最长时长
+        last_speech = self.ring.written
+        last_speech_at = time.monotonic()
+        while self.ring.written - last_speech < self.hangover and \
+                self.ring.written - start < self.max_utterance:
+            samples = self._read(stream)
+            if not len(samples):
+                break
+            if self.vad.is_speech(samples, track_noise=False):
+                last_speech = self.ring.written
+                last_speech_at = time.monotonic()
+
+        # 句尾保留一点静音，识别对结尾更稳
+        end = min(self.ring.written, last_speech + self.hangover // 2)
+        audio = self.ring.since(start)[:end - start]
+        self.utterances += 1
+        self.last_span = (start, start + len(audio))
+        self.last_duration = len(audio) / self.rate
+        self.last_endpoint = time.monotonic() - last_speech_at
+        log.info("检测到语音 时长:%.2fs 端点延迟:%.0fms", self.last_duration, self.last_endpoint * 1000)
+        return audio.tobytes()
+
+    def stats(self):
+        return {
+            'utterances': self.utterances,
+            'timeouts': self.timeouts,
+            'noise_rms': None if self.vad.noise is None else round(self.vad.noise, 1),
+            'threshold': round(self.vad.threshold, 1),
+            'last_duration': self.last_duration,
+            'last_endpoint_ms': None if self.last_endpoint is None else round(self.last_endpoint * 1000, 1),
+        }
+
+
+class Resampler:
+    """有理数比例的多相重采样（src_rate -> dst_rate）
+    等价于先插零升采样 L 倍、用 Kaiser 窗 sinc 低通滤波（截止在两者奈奎斯特频率的较低者之下，防止混叠）、
+    再抽取 M 倍，但只计算需要输出的采样。输出点的滤波器相位以 L 为周期重复，同一相位的输出点
+    对应的输入窗口等间隔（间隔 M），因此每个相位用一次滑动窗口视图与系数做矩阵乘，没有逐点循环。
+    滤波器按采样率对预先算好，之后每次调用不再设计。
+    resampler(samples) 一次处理完整的一段；分块处理时依次 feed() 每一块、最后 flush()，
+    块与块之间保留滤波器需要的历史输入，输出与一次处理整段相同
+    """
+
+    def __init__(self, src_rate, dst_rate, zeros=RESAMPLE_ZEROS, rolloff=RESAMPLE_ROLLOFF, beta=RESAMPLE_BETA):
+        divisor = math.gcd(src_rate, dst_rate)
+        self.src_rate = src_rate
+        self.dst_rate = dst_rate
+        self.up = dst_rate // divisor
+        self.down = src_rate // divisor
+        if self.up == self.down:
+            return
+        # 在升采样后的采样率上设计低通滤波器
+        scale = max(self.up, self.down)
+        cutoff = rolloff / scale  # 相对升采样后的奈奎斯特频率
+        self.half = zeros * scale
+        n = np.arange(-self.half, self.half + 1)
+        taps = cutoff * np.sinc(cutoff * n) * np.kaiser(len(n), beta)
+        taps *= self.up / taps.sum()  # 补偿插零损失的能量，直流增益为 1
+        # 拆成 up 个相位，每个相位一行；行内倒序，与按时间顺序排列的输入窗口直接点积
+        self.width = -(-len(taps) // self.up)
+        phases = np.zeros(self.up * self.width)
+        phases[:len(taps)] = taps
+        self.phases = np.ascontiguousarray(phases.reshape(self.width, self.up).T[:, ::-1], dtype=np.float32)
+        self.reset()
+
+    def reset(self):
+        """丢弃分块处理的状态，开始新的一段"""
+        if self.up == self.down:
+            return
+        # 开头补 width 个零，第一个窗口也是完整的；_origin 为 _history[0] 对应的输入序号
+        self._history = np.zeros(self.width, dtype=np.float32)
+        self._origin = -self.width
+        self._received = 0  # 已输入的采样数
+        self._produced = 0  # 已输出的采样数
+
+    def __call__(self, samples):
+        """int16 采样 -> 目标采样率的 int16 采样"""
+        if self.up == self.down or not len(samples):
+            return samples
+        self.reset()
+        out = np.concatenate((self.feed(samples), self.flush()))
+        self.reset()
+        return out
+
+    def feed(self, samples):
+        """输入一块 int16 采样，返回输入已足够算出的输出；相对输入有滤波器半长的延迟"""
+        if self.up == self.down:
+            return samples
+        self._history = np.concatenate((self._history, samples.astype(np.float32)))
+        self._received += len(samples)
+        # 输出第 m 点的窗口以输入 (m*down + half) // up 结尾，该输入到了才能算
+        ready = (self._received * self.up - 1 - self.half) // self.down + 1
+        return self._produce(max(ready, self._produced))
+
+    def flush(self):
+        """输入结束：把末尾补零，输出剩下的采样，共 输入总数*up//down 个"""
+        if self.up == self.down:
+            return np.zeros(0, dtype=np.int16)
+        self._history = np.concatenate((self._history, np.zeros(self.width + self.half // self.up + 1,
+                                                                dtype=np.float32)))
+        return self._produce(self._received * self.up // self.down)
+
+    def _produce(self, stop):
+        """算出第 _produced 到 stop 个输出点，并丢掉之后不再需要的历史输入"""
+        start, count = self._produced, stop - self._produced
+        out = np.empty(max(count, 0), dtype=np.float32)
+        if 0 < count < 4 * self.up:
+            # 输出点少、相位多时（如 44.1k 分块）逐相位做矩阵乘得不偿失，一次按索引取出全部窗口
+            windows = sliding_window_view(self._history, self.width)
+            last, phase = np.divmod(np.arange(start, stop) * self.down + self.half, self.up)
+            out[:] = np.einsum('ij,ij->i', windows[last - self._origin - self.width + 1], self.phases[phase])
+            self._produced = stop
+        elif count > 0:
+            windows = sliding_window_view(self._history, self.width)
+            for first in range(min(self.up, count)):
+                # 输出第 m 点在升采样序列中的位置为 m*down，窗口以对应的最后一个输入采样结尾
+                last, phase = divmod((start + first) * self.down + self.half, self.up)
+                row = last - self._origin - self.width + 1
+                targets = out[first::self.up]
+                targets[:] = windows[row::self.down][:len(targets)] @ self.phases[phase]
+            self._produced = stop
+        # 下一个输出点的窗口起点之前的输入不再需要
+        keep = (self._produced * self.down + self.half) // self.up - self.width + 1 - self._origin
+        if keep > 0:
+            self._history = self._history[keep:]
+            self._origin += keep
+        return np.clip(np.rint(out), -32768, 32767).astype(np.int16)
+
+
+class WavStream:
+    """把 WAV 文件伪装成 PyAudio 输入流，用录好的音频检验端点检测
+    realtime=True 时按采样率节奏返回数据，端点延迟与真实麦克风一致
+    """
+
+    def __init__(self, path, realtime=False):
+        with wave.open(path, 'rb') as wf:
+            if wf.getsampwidth() != 2:
+                raise ValueError("只支持 16 位 PCM 的 WAV 文件")
+            self.rate = wf.getframerate()
+            channels = wf.getnchannels()
+            data = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+        # 多声道取第一个声道，与单声道麦克风一致
+        self._samples = np.ascontiguousarray(data.reshape(-1, channels)[:, 0])
+        self._position = 0
+        self.realtime = realtime
+        self._started = None
+
+    def read(self, num_frames, exception_on_overflow=True):
+        if self.realtime:
+            if self._started is None:
+                self._started = time.monotonic()
+            due = self._started + (self._position + num_frames) / self.rate
+            time.sleep(max(0.0, due - time.monotonic()))
+        chunk = self._samples[self._position:self._position + num_frames]
+        self._position += len(chunk)
+        return chunk.tobytes()
+
+    @property
+    def position(self):
+        """已读出的时长（秒）"""
+        return self._position / self.rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description='用录好的音频检验语音端点检测')
+    parser.add_argument('wav', help='16 位 PCM 的 WAV 文件')
+    parser.add_argument('--chunk', type=int, default=512, help='每次读取的帧数')
+    parser.add_argument('--realtime', action='store_true', help='按真实采样率节奏读取')
+    args = parser.parse_args()
+
+    stream = WavStream(args.wav, realtime=args.realtime)
+    capture = StreamingCapture(stream.rate, args.chunk, listen_timeout=None)
+    while True:
+        audio = capture.capture(stream)
+        if audio is None:
+            break
+        duration = len(audio) / 2 / stream.rate
+        print(f"[VAD] {stream.position - duration:7.2f}s - {stream.position:7.2f}s "
+              f"语音 {duration:.2f}s 端点延迟 {capture.last_endpoint * 1000:.1f}ms")
+    print(capture.stats())
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
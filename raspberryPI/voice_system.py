@@ -1,17 +1,21 @@
 import pyaudio
+import io
 import wave
 import os
 import sys
 import signal
 import requests
-from array import array
+import numpy as np
 from aip import AipSpeech
 
+import config
+from voice_capture import Resampler, StreamingCapture
+
 # 音频配置
 FORMAT = pyaudio.paInt16
 CHANNELS = 1
-#RATE = 16000
-RATE = 48000
+CAPTURE_RATES = (48000, 44100, 32000, 16000)  # 声卡没有可用的默认采样率时依次尝试
+ASR_RATE = 16000  # 识别服务要求的采样率，录音在本机重采样到该采样率后以原始 PCM 上传
 CHUNK_SIZE = 512
 
 # 百度语音配置
@@ -61,13 +65,32 @@ class VoiceSystem:
         self.input_device_index = self.input_device['index']
         self.output_device_index = self.output_device['index']
 
+        self.rate = self._negotiate_rate()
+        self.resampler = Resampler(self.rate, ASR_RATE)
+        # 跨多句复用，噪声基底只校准一次
+        self.capture = StreamingCapture(self.rate, CHUNK_SIZE)
+
+    def _negotiate_rate(self):
+        """选择录音采样率：配置指定的优先，其次声卡的默认采样率（通常是硬件原生采样率，
+        不经过 ALSA 的重采样），都不支持时依次尝试常见采样率"""
+        candidates = [config.VOICE_RATE] if config.VOICE_RATE else []
+        candidates += [int(self.input_device['defaultSampleRate']), *CAPTURE_RATES]
+        for rate in candidates:
+            try:
+                if self.pa.is_format_supported(rate, input_device=self.input_device_index,
+                                               input_channels=CHANNELS, input_format=FORMAT):
+                    return rate
+            except ValueError:
+                continue
+        return candidates[0]
+
 
     def _print_system_info(self):
         """打印系统音频信息"""
         print("\n===== 音频设备信息 =====")
         print(f"输入设备: {self.input_device['name']} (索引:{self.input_device['index']})")
         print(f"输出设备: {self.output_device['name']} (索引:{self.output_device['index']})")
-        print(f"采样率: {RATE}Hz, 位深: {FORMAT}, 声道数: {CHANNELS}")
+        print(f"采样率: {self.rate}Hz（识别 {ASR_RATE}Hz）, 位深: {FORMAT}, 声道数: {CHANNELS}")
         print(f"音频块大小: {CHUNK_SIZE} frames")
         print("="*30 + "\n")
 
@@ -78,10 +101,12 @@ class VoiceSystem:
         self.running = True
         try:
             while self.running:
-                print("\n等待说话（10秒自动结束）...")
-                self.record('input.wav')
+                print("\n等待说话（说完自动结束）...")
+                audio = self.record()
+                if audio is None:
+                    continue
                 
-                text = self.speech_to_text('input.wav')
+                text = self.speech_to_text(audio)
                 if not text:
                     continue
                     
@@ -98,54 +123,38 @@ class VoiceSystem:
         finally:
             self.pa.terminate()
 
-    def record(self, filename):
-        """录制5秒音频"""
-        
-        """修改录音时长（单位：秒）"""
-        RECORD_SECONDS = 10  # 改为需要的秒数，例如3秒
-        
+    def record(self):
+        """边录边检测，说完一句立即返回这句话识别采样率的 PCM，超时无人说话时返回 None"""
         stream = self.pa.open(
             format=FORMAT,
             channels=CHANNELS,
-            rate=RATE,
+            rate=self.rate,
             input=True,
             frames_per_buffer=CHUNK_SIZE,
             input_device_index=self.input_device_index,
             input_host_api_specific_stream_info=None
         )
-        
-        frames = []
-        for _ in range(0, int(RATE / CHUNK_SIZE * RECORD_SECONDS)):
-            data = stream.read(CHUNK_SIZE)
-            frames.append(data)
-            # 实时打印音量
-            vol = max(abs(s) for s in array('h', data))
-            # print(f"\r音量: {vol:4d}", end='')
-            
-        stream.stop_stream()
-        stream.close()
-        
-        with wave.open(filename, 'wb') as wf:
-            wf.setnchannels(CHANNELS)
-            wf.setsampwidth(self.pa.get_sample_size(FORMAT))
-            wf.setframerate(RATE)
-            wf.writeframes(b''.join(frames))
+        try:
+            audio = self.capture.capture(stream)
+        finally:
+            stream.stop_stream()
+            stream.close()
+        if audio is None:
+            return None
+        return self.resampler(np.frombuffer(audio, dtype=np.int16)).tobytes()
 
-    def say(self, text, filename='output.wav'):
+    def say(self, text):
         """语音合成"""
         audio = baidu_client.synthesis(text, 'zh', 1, {
             'vol': 5, 'per': 4, 'aue': 6
         })
         
         if isinstance(audio, bytes):
-            with open(filename, 'wb') as f:
-                f.write(audio)
-                
-            self.play(filename)
+            self.play(io.BytesIO(audio))
 
-    def play(self, filename):
-        """播放音频"""
-        wf = wave.open(filename, 'rb')
+    def play(self, source):
+        """播放音频，source 为文件名或文件对象"""
+        wf = wave.open(source, 'rb')
         stream = self.pa.open(
             format=self.pa.get_format_from_width(wf.getsampwidth()),
             channels=wf.getnchannels(),
@@ -162,21 +171,20 @@ class VoiceSystem:
         stream.stop_stream()
         stream.close()
 
-    def speech_to_text(self, filename):
-        """添加错误处理"""
+    def speech_to_text(self, audio):
+        """识别一句话的 PCM（ASR_RATE 采样率、16 位单声道），直接以原始 PCM 上传"""
         try:
-            with open(filename, 'rb') as f:
-                result = baidu_client.asr(f.read(), 'wav', 16000, {
-                    'dev_pid': 1536  # 普通话输入法模型
-                })
-                # print("API响应详情:", result)
-                if result['err_no'] == 3301:  # 配额不足
-                    return "语音服务额度已用完"
-                    
-                text = result.get('result', [''])[0]
-                
-                return text + '。' if text and not text.endswith(('。', '!', '?')) else text  # 自动补全标点
+            result = baidu_client.asr(audio, 'pcm', ASR_RATE, {
+                'dev_pid': 1536  # 普通话输入法模型
+            })
+            # print("API响应详情:", result)
+            if result['err_no'] == 3301:  # 配额不足
+                return "语音服务额度已用完"
                 
+            text = result.get('result', [''])[0]
+            
+            return text + '。' if text and not text.endswith(('。', '!', '?')) else text  # 自动补全标点
+            
         except Exception as e:
             print(f"识别错误: {e}")
             return None